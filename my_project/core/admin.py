@@ -2,14 +2,16 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     Empresa, Sucursal, LineaArticulo, GrupoArticulo, Articulo,
-    ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto,
-    DetalleOrdenCompraCliente, Usuario
+    ListaPrecio, PrecioArticulo, PrecioEfectivo, ReglaPrecio, CombinacionProducto,
+    DetalleOrdenCompraCliente, UsoReglaDiario, Usuario
 )
+from .admin_rendimiento import AdminRendimientoMixin, FiltroRelacionado, relaciones_str
 
 @admin.register(Usuario)
-class UsuarioAdmin(BaseUserAdmin):
+class UsuarioAdmin(AdminRendimientoMixin, BaseUserAdmin):
     list_display = ['username', 'email', 'first_name', 'last_name', 'empresa', 'rol', 'activo', 'is_staff']
     list_filter = ['activo', 'rol', 'empresa', 'is_staff', 'is_superuser']
+    list_select_related = relaciones_str(Empresa, 'empresa')
     search_fields = ['username', 'email', 'first_name', 'last_name', 'empresa__nombre']
     
     fieldsets = BaseUserAdmin.fieldsets + (
@@ -29,31 +31,34 @@ class UsuarioAdmin(BaseUserAdmin):
 #Password: admin
 
 @admin.register(Empresa)
-class EmpresaAdmin(admin.ModelAdmin):
+class EmpresaAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'ruc', 'telefono', 'activo', 'fecha_creacion']
     list_filter = ['activo', 'fecha_creacion']
     search_fields = ['nombre', 'ruc']
 
 
 @admin.register(Sucursal)
-class SucursalAdmin(admin.ModelAdmin):
+class SucursalAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'codigo', 'empresa', 'activo', 'fecha_creacion']
     list_filter = ['activo', 'empresa', 'fecha_creacion']
     search_fields = ['nombre', 'codigo']
+    list_select_related = relaciones_str(Empresa, 'empresa')
 
 
 @admin.register(LineaArticulo)
-class LineaArticuloAdmin(admin.ModelAdmin):
+class LineaArticuloAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'codigo', 'empresa', 'activo', 'fecha_creacion']
     list_filter = ['activo', 'empresa', 'fecha_creacion']
     search_fields = ['nombre', 'codigo', 'empresa__nombre']
+    list_select_related = relaciones_str(Empresa, 'empresa')
 
 
 @admin.register(GrupoArticulo)
-class GrupoArticuloAdmin(admin.ModelAdmin):
+class GrupoArticuloAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'codigo', 'empresa', 'linea', 'activo', 'fecha_creacion']
-    list_filter = ['activo', 'empresa', 'linea', 'fecha_creacion']
+    list_filter = ['activo', 'empresa', ('linea', FiltroRelacionado), 'fecha_creacion']
     search_fields = ['nombre', 'codigo', 'empresa__nombre']
+    list_select_related = relaciones_str(Empresa, 'empresa') + relaciones_str(LineaArticulo, 'linea')
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """Filtrar líneas por empresa en el formulario"""
@@ -64,10 +69,11 @@ class GrupoArticuloAdmin(admin.ModelAdmin):
 
 
 @admin.register(Articulo)
-class ArticuloAdmin(admin.ModelAdmin):
+class ArticuloAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['codigo', 'nombre', 'empresa', 'grupo', 'unidad_medida', 'ultimo_costo', 'activo']
-    list_filter = ['activo', 'empresa', 'grupo', 'fecha_creacion']
+    list_filter = ['activo', 'empresa', ('grupo', FiltroRelacionado), 'fecha_creacion']
     search_fields = ['codigo', 'nombre', 'empresa__nombre']
+    list_select_related = relaciones_str(Empresa, 'empresa') + relaciones_str(GrupoArticulo, 'grupo')
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """Filtrar grupos por empresa en el formulario"""
@@ -76,39 +82,68 @@ class ArticuloAdmin(admin.ModelAdmin):
                 kwargs["queryset"] = GrupoArticulo.objects.filter(empresa_id=request.GET.get('empresa'))
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
+
 @admin.register(ListaPrecio)
-class ListaPrecioAdmin(admin.ModelAdmin):
+class ListaPrecioAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'empresa', 'sucursal', 'tipo', 'canal', 'fecha_inicio', 'fecha_fin', 'activo']
     list_filter = ['activo', 'tipo', 'canal', 'empresa', 'fecha_inicio']
     search_fields = ['nombre']
     date_hierarchy = 'fecha_inicio'
+    list_select_related = relaciones_str(Empresa, 'empresa') + relaciones_str(Sucursal, 'sucursal')
 
 
 @admin.register(PrecioArticulo)
-class PrecioArticuloAdmin(admin.ModelAdmin):
+class PrecioArticuloAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['articulo', 'lista_precio', 'precio_base', 'bajo_costo', 'descuento_proveedor']
-    list_filter = ['bajo_costo', 'lista_precio', 'fecha_creacion']
+    list_filter = ['bajo_costo', ('lista_precio', FiltroRelacionado), 'fecha_creacion']
+    search_fields = ['articulo__nombre', 'articulo__codigo']
+    list_select_related = relaciones_str(Articulo, 'articulo') + relaciones_str(ListaPrecio, 'lista_precio')
+    autocomplete_fields = ['articulo', 'lista_precio']
+
+
+@admin.register(PrecioEfectivo)
+class PrecioEfectivoAdmin(AdminRendimientoMixin, admin.ModelAdmin):
+    list_display = ['articulo', 'lista_precio', 'precio_base', 'precio_final', 'bajo_costo', 'desactualizado', 'fecha_calculo']
+    list_filter = ['desactualizado', 'bajo_costo', ('lista_precio', FiltroRelacionado)]
     search_fields = ['articulo__nombre', 'articulo__codigo']
+    readonly_fields = ['fecha_calculo']
+    list_select_related = relaciones_str(Articulo, 'articulo') + relaciones_str(ListaPrecio, 'lista_precio')
+    autocomplete_fields = ['articulo', 'lista_precio']
 
 
 @admin.register(ReglaPrecio)
-class ReglaPrecioAdmin(admin.ModelAdmin):
+class ReglaPrecioAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'lista_precio', 'tipo_regla', 'tipo_ajuste', 'valor_ajuste', 'prioridad', 'activo']
-    list_filter = ['activo', 'tipo_regla', 'tipo_ajuste', 'lista_precio']
+    list_filter = ['activo', 'tipo_regla', 'tipo_ajuste', ('lista_precio', FiltroRelacionado)]
     search_fields = ['nombre']
+    list_select_related = relaciones_str(ListaPrecio, 'lista_precio')
+    autocomplete_fields = ['lista_precio', 'linea_articulo', 'grupo_articulo']
 
 
 @admin.register(CombinacionProducto)
-class CombinacionProductoAdmin(admin.ModelAdmin):
+class CombinacionProductoAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'lista_precio', 'cantidad_minima', 'tipo_descuento', 'valor_descuento', 'activo']
-    list_filter = ['activo', 'tipo_descuento', 'lista_precio']
+    list_filter = ['activo', 'tipo_descuento', ('lista_precio', FiltroRelacionado)]
     search_fields = ['nombre']
-    filter_horizontal = ['articulos']
+    list_select_related = relaciones_str(ListaPrecio, 'lista_precio')
+    # filter_horizontal cargaría todos los artículos en el formulario
+    autocomplete_fields = ['lista_precio', 'linea_articulo', 'grupo_articulo', 'articulos']
 
 
 @admin.register(DetalleOrdenCompraCliente)
-class DetalleOrdenCompraClienteAdmin(admin.ModelAdmin):
+class DetalleOrdenCompraClienteAdmin(AdminRendimientoMixin, admin.ModelAdmin):
     list_display = ['numero_orden', 'articulo', 'cantidad', 'precio_unitario', 'subtotal', 'bajo_costo', 'fecha_orden']
     list_filter = ['bajo_costo', 'empresa', 'fecha_orden']
     search_fields = ['numero_orden', 'articulo__nombre']
-    date_hierarchy = 'fecha_orden'
\ No newline at end of file
+    date_hierarchy = 'fecha_orden'
+    list_select_related = relaciones_str(Articulo, 'articulo')
+    autocomplete_fields = ['empresa', 'sucursal', 'articulo', 'lista_precio']
+
+
+@admin.register(UsoReglaDiario)
+class UsoReglaDiarioAdmin(AdminRendimientoMixin, admin.ModelAdmin):
+    list_display = ['fecha', 'tipo', 'referencia_id', 'nombre', 'empresa', 'sucursal', 'veces_aplicada', 'unidades', 'descuento_total', 'ingresos']
+    list_filter = ['tipo', 'empresa', 'fecha']
+    search_fields = ['nombre']
+    date_hierarchy = 'fecha'
+    list_select_related = relaciones_str(Empresa, 'empresa') + relaciones_str(Sucursal, 'sucursal')
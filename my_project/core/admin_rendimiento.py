@@ -0,0 +1,111 @@
+"""
+Piezas del admin para tablas grandes (precios, artículos, órdenes).
+
+- ConteoEstimadoPaginator: sin filtros, en PostgreSQL el total de filas se
+  toma de las estadísticas de pg_class en lugar de un COUNT(*) completo.
+- FiltroRelacionado: los filtros por clave foránea cargan en una consulta lo
+  que usa __str__ de cada opción (empresa, línea) en lugar de una por opción.
+- AdminRendimientoMixin: usa ese paginator, no pide el segundo COUNT(*) del
+  total sin filtrar y carga con cada objeto lo que usa su __str__ (también en
+  el autocompletado, que reemplaza a los desplegables de claves foráneas).
+
+RELACIONES_STR indica qué relaciones recorre __str__ de cada modelo; los
+list_select_related de core.admin se arman con relaciones_str() para que cada
+columna de clave foránea salga de la misma consulta que la página.
+"""
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import (
+    Articulo, GrupoArticulo, LineaArticulo, ListaPrecio, Sucursal, Usuario
+)
+
+
+# Relaciones que lee __str__ de cada modelo
+RELACIONES_STR = {
+    Usuario: ['empresa'],
+    Sucursal: ['empresa'],
+    LineaArticulo: ['empresa'],
+    GrupoArticulo: ['empresa', 'linea'],
+    Articulo: ['empresa'],
+    ListaPrecio: ['empresa'],
+}
+
+# Por debajo de esta estimación se cuenta exacto: es barato y la estimación
+# de una tabla pequeña o recién cargada puede estar muy desfasada
+MINIMO_ESTIMADO = 10000
+
+
+def relaciones_str(modelo, prefijo=''):
+    """
+    Relaciones para select_related que necesita str() de un modelo.
+
+    Args:
+        modelo: Clase del modelo
+        prefijo: Camino hasta el modelo, p. ej. 'articulo'
+
+    Returns:
+        list de caminos ('articulo', 'articulo__empresa', ...)
+    """
+    caminos = [prefijo] if prefijo else []
+    for relacion in RELACIONES_STR.get(modelo, []):
+        caminos.append(f'{prefijo}__{relacion}' if prefijo else relacion)
+    return caminos
+
+
+class ConteoEstimadoPaginator(Paginator):
+    """Paginator que estima el total de filas de una tabla sin filtrar."""
+
+    @cached_property
+    def count(self):
+        estimado = self._estimado()
+        if estimado is not None and estimado >= MINIMO_ESTIMADO:
+            return estimado
+        return super().count
+
+    def _estimado(self):
+        queryset = self.object_list
+        conexion = connections[queryset.db]
+        if conexion.vendor != 'postgresql' or queryset.query.where or queryset.query.distinct:
+            return None
+        with conexion.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                [conexion.ops.quote_name(queryset.model._meta.db_table)]
+            )
+            fila = cursor.fetchone()
+        # reltuples es -1 mientras la tabla no se haya analizado
+        if fila is None or fila[0] is None or fila[0] < 0:
+            return None
+        return fila[0]
+
+
+class FiltroRelacionado(admin.RelatedFieldListFilter):
+    """Filtro por clave foránea que arma sus opciones con una sola consulta."""
+
+    def field_choices(self, field, request, model_admin):
+        modelo = field.related_model
+        queryset = modelo._default_manager.select_related(*relaciones_str(modelo))
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return [(objeto.pk, str(objeto)) for objeto in queryset]
+
+
+class AdminRendimientoMixin:
+    """Changelist con conteo estimado y sin el COUNT(*) adicional del total."""
+
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # El autocompletado muestra str() de cada resultado y no usa list_select_related.
+        # No se hace en get_queryset: el changelist omite list_select_related si
+        # el queryset ya trae select_related
+        queryset, duplicados = super().get_search_results(request, queryset, search_term)
+        relaciones = relaciones_str(self.model)
+        if relaciones:
+            queryset = queryset.select_related(*relaciones)
+        return queryset, duplicados
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.uso_reglas import (
+    TAMANO_LOTE, ErrorAgregacion, reconstruir_uso_reglas, refrescar_uso_reglas
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Agrega el uso de reglas y combinaciones de las órdenes en la tabla '
+        'uso_regla_diario. Por defecto solo procesa las líneas nuevas desde la '
+        'última ejecución; pensado para ejecutarse periódicamente (cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo', action='store_true',
+            help='Vacía la tabla resumen y vuelve a agregar todas las órdenes'
+        )
+        parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+        parser.add_argument(
+            '--intervalo', type=int, default=0,
+            help='Segundos entre ejecuciones; con 0 se ejecuta una sola vez'
+        )
+
+    def handle(self, *args, **options):
+        if options['tamano_lote'] < 1:
+            raise CommandError('El tamaño de lote debe ser mayor que cero')
+
+        completo = options['completo']
+        while True:
+            self._ejecutar(completo, options['tamano_lote'])
+            completo = False
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
+
+    def _ejecutar(self, completo, tamano_lote):
+        inicio = time.perf_counter()
+        try:
+            if completo:
+                resultado = reconstruir_uso_reglas(tamano_lote=tamano_lote)
+            else:
+                resultado = refrescar_uso_reglas(tamano_lote=tamano_lote)
+        except ErrorAgregacion as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {resultado["filas"]} días de uso de reglas actualizados '
+            f'(órdenes hasta {resultado["hasta"]:%Y-%m-%d %H:%M:%S}, '
+            f'{time.perf_counter() - inicio:.2f} s)'
+        ))
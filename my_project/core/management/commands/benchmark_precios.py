@@ -0,0 +1,230 @@
+import json
+import random
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.models import ListaPrecio
+from core.services.cache_listas import invalidar_empresa
+from core.services.lista_compilada import invalidar_lista, obtener_lista_compilada
+from core.services.precio_service import PrecioService
+
+
+def percentil(valores_ordenados, porcentaje):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    indice = max(0, min(len(valores_ordenados) - 1, round(porcentaje / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+def lista_para_medir(lista_id=None):
+    """Lista indicada o, por defecto, la lista vigente con más precios."""
+    if lista_id:
+        try:
+            return ListaPrecio.objects.get(id=lista_id)
+        except ListaPrecio.DoesNotExist:
+            raise CommandError(f'No existe la lista de precios {lista_id}')
+    hoy = timezone.now().date()
+    lista = ListaPrecio.objects.filter(
+        Q(fecha_fin__isnull=True) | Q(fecha_fin__gte=hoy),
+        activo=True,
+        fecha_inicio__lte=hoy,
+    ).annotate(total_precios=Count('precios')).order_by('-total_precios', 'id').first()
+    if lista is None:
+        raise CommandError('No hay listas vigentes; genere datos con generar_datos_sinteticos')
+    return lista
+
+
+class ContadorConsultas:
+    """Envoltorio de ejecución (connection.execute_wrapper) que cuenta consultas."""
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (percentiles) y cantidad de consultas del cálculo de precios '
+        'y de los endpoints de listas; guarda el resultado en JSON y puede compararlo '
+        'contra una ejecución base'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lista', type=int,
+            help='Lista a usar; por defecto la lista vigente con más precios'
+        )
+        parser.add_argument('--iteraciones', type=int, default=100)
+        parser.add_argument(
+            '--iteraciones-api', type=int, default=10,
+            help='Iteraciones de los endpoints que devuelven listas completas'
+        )
+        parser.add_argument('--calentamiento', type=int, default=3)
+        parser.add_argument('--lineas-pedido', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', default='benchmark_precios.json', help='Archivo JSON de resultados')
+        parser.add_argument('--comparar', help='JSON de una ejecución base para detectar regresiones')
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.25,
+            help='Aumento relativo de la mediana aceptado frente a la base (0.25 = 25%%)'
+        )
+
+    def handle(self, *args, **options):
+        lista = lista_para_medir(options['lista'])
+        compilada = obtener_lista_compilada(lista)
+        articulo_ids = sorted(compilada.precios)
+        if not articulo_ids:
+            raise CommandError(f'La lista {lista.id} no tiene precios')
+
+        self.rnd = random.Random(options['semilla'])
+        self.calentamiento = options['calentamiento']
+        self.resultados = {}
+        empresa_id, sucursal_id, canal = lista.empresa_id, lista.sucursal_id, lista.canal
+        hoy = timezone.now().date()
+
+        self.stdout.write(
+            f'Lista {lista.id} "{lista.nombre}": {len(articulo_ids)} precios, '
+            f'{len(compilada.reglas)} reglas, {len(compilada.combinaciones)} combinaciones'
+        )
+
+        iteraciones = options['iteraciones']
+        self._medir('obtener_lista_vigente', iteraciones, lambda: PrecioService.obtener_lista_vigente(
+            empresa_id, sucursal_id, canal
+        ))
+        self._medir('obtener_lista_vigente_sin_cache', iteraciones, lambda: PrecioService._buscar_lista_vigente(
+            empresa_id, sucursal_id, canal, hoy
+        ))
+        self._medir('calcular_precio', iteraciones, lambda: PrecioService.calcular_precio(
+            empresa_id, sucursal_id, self.rnd.choice(articulo_ids), canal, self.rnd.randint(1, 100)
+        ))
+
+        def calcular_precio_frio():
+            # Descarta la instantánea local y la caché de lista vigente de la empresa
+            invalidar_lista(lista.id)
+            invalidar_empresa(empresa_id)
+            PrecioService.calcular_precio(
+                empresa_id, sucursal_id, self.rnd.choice(articulo_ids), canal, self.rnd.randint(1, 100)
+            )
+        self._medir('calcular_precio_frio', options['iteraciones_api'], calcular_precio_frio)
+
+        cliente = Client()
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for lineas in options['lineas_pedido']:
+                cuerpo = {
+                    'empresa_id': empresa_id,
+                    'sucursal_id': sucursal_id,
+                    'canal': canal,
+                    'items': [
+                        {'articulo_id': articulo_id, 'cantidad': self.rnd.randint(1, 100)}
+                        for articulo_id in self.rnd.choices(articulo_ids, k=lineas)
+                    ],
+                }
+                self._medir(
+                    f'calcular_pedido_{lineas}',
+                    iteraciones if lineas < 100 else options['iteraciones_api'],
+                    lambda: self._pedir(cliente.post(
+                        '/api/pedidos/calcular_pedido/', cuerpo, content_type='application/json'
+                    ))
+                )
+
+            self._medir('api_listas_precios', iteraciones, lambda: self._pedir(
+                cliente.get('/api/listas-precios/', {'empresa_id': empresa_id})
+            ))
+            self._medir('api_precios_articulos', iteraciones, lambda: self._pedir(
+                cliente.get('/api/precios-articulos/', {'lista_id': lista.id})
+            ))
+            self._medir('api_lista_precios_completa', options['iteraciones_api'], lambda: self._pedir(
+                cliente.get(f'/api/listas-precios/{lista.id}/precios/')
+            ))
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'motor': connection.vendor,
+            'django': django.get_version(),
+            'datos': {
+                'lista_id': lista.id,
+                'precios': len(articulo_ids),
+                'reglas': len(compilada.reglas),
+                'combinaciones': len(compilada.combinaciones),
+            },
+            'resultados': self.resultados,
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["salida"]}'))
+
+        if options['comparar']:
+            self._comparar(options['comparar'], options['tolerancia'])
+
+    def _pedir(self, respuesta):
+        if respuesta.status_code != 200:
+            raise CommandError(f'{respuesta.request["PATH_INFO"]} respondió {respuesta.status_code}')
+        return respuesta
+
+    def _medir(self, nombre, iteraciones, funcion):
+        for _ in range(self.calentamiento):
+            funcion()
+
+        tiempos = []
+        consultas = []
+        for _ in range(iteraciones):
+            contador = ContadorConsultas()
+            with connection.execute_wrapper(contador):
+                inicio = time.perf_counter()
+                funcion()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(contador.total)
+
+        tiempos.sort()
+        resultado = {
+            'iteraciones': iteraciones,
+            'media_ms': round(sum(tiempos) / len(tiempos), 3),
+            'p50_ms': round(percentil(tiempos, 50), 3),
+            'p95_ms': round(percentil(tiempos, 95), 3),
+            'p99_ms': round(percentil(tiempos, 99), 3),
+            'max_ms': round(tiempos[-1], 3),
+            'consultas_min': min(consultas),
+            'consultas_max': max(consultas),
+        }
+        self.resultados[nombre] = resultado
+        self.stdout.write(
+            f"{nombre:<34} p50 {resultado['p50_ms']:>9.2f} ms  p95 {resultado['p95_ms']:>9.2f} ms  "
+            f"p99 {resultado['p99_ms']:>9.2f} ms  consultas {resultado['consultas_min']}-{resultado['consultas_max']}"
+        )
+
+    def _comparar(self, ruta_base, tolerancia):
+        try:
+            with open(ruta_base, encoding='utf-8') as archivo:
+                base = json.load(archivo)['resultados']
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'No se pudo leer la ejecución base {ruta_base}: {error}')
+
+        regresiones = []
+        for nombre, actual in self.resultados.items():
+            anterior = base.get(nombre)
+            if anterior is None:
+                continue
+            if actual['consultas_max'] > anterior['consultas_max']:
+                regresiones.append(
+                    f"{nombre}: {anterior['consultas_max']} → {actual['consultas_max']} consultas"
+                )
+            if actual['p50_ms'] > anterior['p50_ms'] * (1 + tolerancia):
+                regresiones.append(
+                    f"{nombre}: mediana {anterior['p50_ms']} → {actual['p50_ms']} ms"
+                )
+
+        if regresiones:
+            for regresion in regresiones:
+                self.stdout.write(self.style.ERROR(f'✗ {regresion}'))
+            raise CommandError(f'{len(regresiones)} regresiones frente a {ruta_base}')
+        self.stdout.write(self.style.SUCCESS(f'✓ Sin regresiones frente a {ruta_base}'))
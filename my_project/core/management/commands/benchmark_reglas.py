@@ -0,0 +1,131 @@
+import random
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from core.services.lista_compilada import ListaCompilada, ArticuloCompilado, ReglaCompilada
+from core.services.precio_service import PrecioService
+
+
+class Command(BaseCommand):
+    help = 'Compara el índice de reglas contra el recorrido secuencial de reglas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reglas', type=int, nargs='+', default=[10, 100, 1000],
+            help='Cantidades de reglas a medir'
+        )
+        parser.add_argument(
+            '--consultas', type=int, default=5000,
+            help='Cálculos de reglas por medición'
+        )
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'reglas':>8} {'secuencial (µs)':>16} {'índice (µs)':>12} {'aceleración':>12}"
+        )
+        for total_reglas in options['reglas']:
+            rnd = random.Random(options['semilla'])
+            lista, articulos = self._lista_sintetica(rnd, total_reglas)
+            consultas = [
+                (
+                    rnd.choice(articulos),
+                    rnd.randint(1, 1000),
+                    Decimal(rnd.randint(0, 100000)),
+                )
+                for _ in range(options['consultas'])
+            ]
+
+            tiempo_secuencial = self._medir(PrecioService.aplicar_reglas_secuencial, lista, consultas)
+            tiempo_indice = self._medir(PrecioService.aplicar_reglas, lista, consultas)
+
+            # Ambos caminos deben devolver exactamente las mismas reglas
+            for articulo, cantidad, monto in consultas[:500]:
+                esperado = PrecioService.aplicar_reglas_secuencial(lista, articulo, cantidad, monto, 'TIENDA')
+                obtenido = PrecioService.aplicar_reglas(lista, articulo, cantidad, monto, 'TIENDA')
+                if esperado != obtenido:
+                    self.stderr.write(self.style.ERROR(
+                        f'Resultados distintos con {total_reglas} reglas: {esperado} != {obtenido}'
+                    ))
+                    return
+
+            por_consulta = 1_000_000 / len(consultas)
+            self.stdout.write(
+                f'{total_reglas:>8} {tiempo_secuencial * por_consulta:>16.1f} '
+                f'{tiempo_indice * por_consulta:>12.1f} {tiempo_secuencial / tiempo_indice:>11.1f}x'
+            )
+
+    def _medir(self, funcion, lista, consultas):
+        inicio = time.perf_counter()
+        for articulo, cantidad, monto in consultas:
+            funcion(lista, articulo, cantidad, monto, 'TIENDA')
+        return time.perf_counter() - inicio
+
+    def _lista_sintetica(self, rnd, total_reglas):
+        """Lista en memoria con escalas de unidades y monto repartidas por línea y grupo."""
+        lineas = list(range(1, 6))
+        grupos = {linea: [linea * 100 + g for g in range(1, 5)] for linea in lineas}
+        articulos = [
+            ArticuloCompilado(
+                id=i,
+                codigo=f'ART-{i}',
+                nombre=f'Artículo {i}',
+                ultimo_costo=Decimal(rnd.randint(1, 200)),
+                grupo_id=grupo,
+                linea_id=linea,
+            )
+            for i, (linea, grupo) in enumerate(
+                (linea, grupo) for linea in lineas for grupo in grupos[linea] for _ in range(5)
+            )
+        ]
+
+        reglas = []
+        tipos = ['ESCALA_UNIDADES', 'ESCALA_MONTO', 'MONTO_PEDIDO']
+        tramos = {}
+        for i in range(total_reglas):
+            tipo_regla = tipos[i % len(tipos)] if i % 10 else 'CANAL'
+            linea = rnd.choice(lineas + [None])
+            grupo = rnd.choice(grupos[linea]) if linea and rnd.random() < 0.5 else None
+            if grupo:
+                linea = None
+
+            # Tramos consecutivos por (tipo, línea, grupo): 1-10, 11-20, ...
+            desde = tramos.get((tipo_regla, linea, grupo), 0)
+            ancho = 10 if tipo_regla == 'ESCALA_UNIDADES' else 500
+            tramos[(tipo_regla, linea, grupo)] = desde + ancho
+            minimo, maximo = desde + 1, desde + ancho
+
+            es_cantidad = tipo_regla == 'ESCALA_UNIDADES'
+            es_monto = tipo_regla in ('ESCALA_MONTO', 'MONTO_PEDIDO')
+            reglas.append(ReglaCompilada(
+                id=i + 1,
+                nombre=f'Regla {i + 1}',
+                tipo_regla=tipo_regla,
+                tipo_ajuste='PORCENTAJE',
+                linea_articulo_id=linea,
+                grupo_articulo_id=grupo,
+                cantidad_minima=minimo if es_cantidad else None,
+                cantidad_maxima=maximo if es_cantidad else None,
+                monto_minimo=Decimal(minimo) if es_monto else None,
+                monto_maximo=Decimal(maximo) if es_monto else None,
+                valor_ajuste=Decimal(rnd.randint(1, 10)),
+                prioridad=rnd.randint(1, 5),
+            ))
+        reglas.sort(key=lambda regla: (regla.prioridad, regla.id))
+
+        lista_precio = SimpleNamespace(
+            id=0, nombre='Benchmark', canal='TODOS', empresa_id=0,
+            fecha_actualizacion=datetime.now()
+        )
+        lista = ListaCompilada(
+            lista_precio,
+            precios={},
+            articulos={articulo.id: articulo for articulo in articulos},
+            reglas=reglas,
+            combinaciones=[],
+        )
+        return lista, articulos
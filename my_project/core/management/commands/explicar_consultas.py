@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.models import (
+    Empresa, Sucursal, ListaPrecio, PrecioArticulo, ReglaPrecio,
+    CombinacionProducto, DetalleOrdenCompraCliente
+)
+from core.services.precio_service import PrecioService
+
+
+# Fragmentos del plan que indican que la consulta usa un índice
+MARCAS_INDICE = {
+    'postgresql': ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan'),
+    'sqlite': ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas críticas del cálculo de precios e indica si usan índices'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--estricto', action='store_true',
+            help='Termina con error si alguna consulta no usa un índice (para CI)'
+        )
+        parser.add_argument(
+            '--sin-seqscan', action='store_true',
+            help='En PostgreSQL desactiva enable_seqscan, útil con tablas pequeñas '
+                 'donde el planificador prefiere un recorrido secuencial'
+        )
+        parser.add_argument(
+            '--plan', action='store_true',
+            help='Muestra el plan completo de cada consulta'
+        )
+
+    def handle(self, *args, **options):
+        marcas = MARCAS_INDICE.get(connection.vendor)
+        if marcas is None:
+            raise CommandError(f'Motor de base de datos no soportado: {connection.vendor}')
+
+        if options['sin_seqscan'] and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+        sin_indice = []
+        for nombre, queryset in self._consultas():
+            plan = queryset.explain()
+            usa_indice = any(marca in plan for marca in marcas)
+            if usa_indice:
+                self.stdout.write(self.style.SUCCESS(f'✓ {nombre}: usa índice'))
+            else:
+                sin_indice.append(nombre)
+                self.stdout.write(self.style.ERROR(f'✗ {nombre}: NO usa índice'))
+            if options['plan'] or not usa_indice:
+                for linea in plan.splitlines():
+                    self.stdout.write(f'    {linea}')
+
+        if sin_indice and options['estricto']:
+            raise CommandError(f'Consultas sin índice: {", ".join(sin_indice)}')
+
+    def _consultas(self):
+        """Consultas críticas con parámetros tomados de los datos existentes."""
+        empresa_id = Empresa.objects.values_list('id', flat=True).first() or 1
+        sucursal_id = Sucursal.objects.filter(
+            empresa_id=empresa_id
+        ).values_list('id', flat=True).first() or 1
+        lista_id = ListaPrecio.objects.values_list('id', flat=True).first() or 1
+        numero_orden = DetalleOrdenCompraCliente.objects.values_list(
+            'numero_orden', flat=True
+        ).first() or 'OC-0001'
+        hoy = timezone.now().date()
+
+        lista_sucursal, lista_empresa = PrecioService.consultas_lista_vigente(
+            empresa_id, sucursal_id, 'TIENDA', hoy
+        )
+
+        return [
+            ('lista vigente de sucursal', lista_sucursal[:1]),
+            ('lista vigente de empresa', lista_empresa[:1]),
+            ('precios de una lista', PrecioArticulo.objects.filter(lista_precio_id=lista_id)),
+            ('reglas activas de una lista', ReglaPrecio.objects.filter(
+                lista_precio_id=lista_id, activo=True
+            ).order_by('prioridad', 'id')),
+            ('combinaciones activas de una lista', CombinacionProducto.objects.filter(
+                lista_precio_id=lista_id, activo=True
+            ).order_by('id')),
+            ('detalle por número de orden', DetalleOrdenCompraCliente.objects.filter(
+                numero_orden=numero_orden
+            )),
+        ]
@@ -0,0 +1,209 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    Empresa, Sucursal, LineaArticulo, GrupoArticulo, Articulo,
+    ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto
+)
+
+
+# Las empresas sintéticas se reconocen por el prefijo de su RUC
+PREFIJO_RUC = '99'
+
+CANALES = [canal for canal, _ in ListaPrecio.CANAL_CHOICES if canal != 'TODOS']
+TIPOS_REGLA = ['CANAL', 'ESCALA_UNIDADES', 'ESCALA_MONTO', 'MONTO_PEDIDO']
+TIPOS_AJUSTE = ['PORCENTAJE', 'PORCENTAJE', 'PORCENTAJE', 'MONTO_FIJO']
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un catálogo sintético grande con bulk_create para medir el '
+        'rendimiento del cálculo de precios (ver benchmark_precios)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=1)
+        parser.add_argument('--sucursales', type=int, default=3, help='Sucursales por empresa')
+        parser.add_argument('--lineas', type=int, default=10, help='Líneas por empresa')
+        parser.add_argument('--grupos', type=int, default=10, help='Grupos por línea')
+        parser.add_argument('--articulos', type=int, default=10000, help='Artículos por empresa')
+        parser.add_argument('--listas', type=int, default=3, help='Listas por empresa')
+        parser.add_argument('--reglas', type=int, default=50, help='Reglas por lista')
+        parser.add_argument('--combinaciones', type=int, default=20, help='Combinaciones por lista')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--tamano-lote', type=int, default=5000)
+        parser.add_argument(
+            '--limpiar', action='store_true',
+            help='Borra antes las empresas sintéticas generadas en ejecuciones anteriores'
+        )
+
+    def handle(self, *args, **options):
+        for opcion in ('empresas', 'lineas', 'grupos', 'articulos', 'tamano_lote'):
+            if options[opcion] < 1:
+                raise CommandError(f'--{opcion.replace("_", "-")} debe ser mayor que cero')
+
+        self.rnd = random.Random(options['semilla'])
+        self.lote = options['tamano_lote']
+        inicio = time.perf_counter()
+
+        if options['limpiar']:
+            self.stdout.write('Borrando empresas sintéticas anteriores...')
+            Empresa.objects.filter(ruc__startswith=PREFIJO_RUC).delete()
+
+        with transaction.atomic():
+            empresas = self._empresas(options['empresas'])
+            for empresa in empresas:
+                self.stdout.write(f'Generando "{empresa.nombre}"...')
+                sucursales = self._sucursales(empresa, options['sucursales'])
+                lineas, grupos = self._jerarquia(empresa, options['lineas'], options['grupos'])
+                articulos = self._articulos(empresa, grupos, options['articulos'])
+                listas = self._listas(empresa, sucursales, options['listas'])
+                self._precios(listas, articulos)
+                self._reglas(listas, lineas, grupos, options['reglas'])
+                self._combinaciones(listas, lineas, grupos, articulos, options['combinaciones'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Datos sintéticos generados en {time.perf_counter() - inicio:.1f} s'
+        ))
+        sinteticas = {'empresa__ruc__startswith': PREFIJO_RUC}
+        for modelo, filtro in [
+            (Empresa, {'ruc__startswith': PREFIJO_RUC}),
+            (Sucursal, sinteticas),
+            (Articulo, sinteticas),
+            (ListaPrecio, sinteticas),
+            (PrecioArticulo, {'lista_precio__empresa__ruc__startswith': PREFIJO_RUC}),
+            (ReglaPrecio, {'lista_precio__empresa__ruc__startswith': PREFIJO_RUC}),
+            (CombinacionProducto, {'lista_precio__empresa__ruc__startswith': PREFIJO_RUC}),
+        ]:
+            self.stdout.write(f'  - {modelo.objects.filter(**filtro).count()} {modelo._meta.verbose_name_plural}')
+
+    def _crear(self, modelo, objetos):
+        return modelo.objects.bulk_create(objetos, batch_size=self.lote)
+
+    def _empresas(self, total):
+        ultimo = Empresa.objects.filter(ruc__startswith=PREFIJO_RUC).order_by('-ruc').values_list(
+            'ruc', flat=True
+        ).first()
+        siguiente = int(ultimo) + 1 if ultimo else int(PREFIJO_RUC + '0' * 9)
+        return self._crear(Empresa, [
+            Empresa(nombre=f'Empresa Sintética {siguiente + i}', ruc=str(siguiente + i))
+            for i in range(total)
+        ])
+
+    def _sucursales(self, empresa, total):
+        return self._crear(Sucursal, [
+            Sucursal(empresa=empresa, nombre=f'Sucursal {s + 1}', codigo=f'SIN-{empresa.id}-{s + 1}')
+            for s in range(total)
+        ])
+
+    def _jerarquia(self, empresa, total_lineas, grupos_por_linea):
+        lineas = self._crear(LineaArticulo, [
+            LineaArticulo(empresa=empresa, nombre=f'Línea {l + 1}', codigo=f'LIN-{l + 1:03d}')
+            for l in range(total_lineas)
+        ])
+        grupos = self._crear(GrupoArticulo, [
+            GrupoArticulo(
+                empresa=empresa, linea=linea,
+                nombre=f'Grupo {l + 1}.{g + 1}', codigo=f'GRP-{l + 1:03d}-{g + 1:03d}'
+            )
+            for l, linea in enumerate(lineas)
+            for g in range(grupos_por_linea)
+        ])
+        return lineas, grupos
+
+    def _articulos(self, empresa, grupos, total):
+        return self._crear(Articulo, [
+            Articulo(
+                empresa=empresa,
+                grupo=grupos[i % len(grupos)],
+                codigo=f'ART-{i + 1:07d}',
+                nombre=f'Artículo sintético {i + 1}',
+                ultimo_costo=Decimal(self.rnd.randint(100, 50000)) / 100,
+            )
+            for i in range(total)
+        ])
+
+    def _listas(self, empresa, sucursales, total):
+        hoy = timezone.now().date()
+        listas = []
+        for i in range(total):
+            # La primera lista es general de la empresa; el resto, por sucursal y canal
+            sucursal = sucursales[(i - 1) % len(sucursales)] if i and sucursales else None
+            listas.append(ListaPrecio(
+                empresa=empresa,
+                sucursal=sucursal,
+                nombre=f'Lista sintética {i + 1}',
+                tipo='GENERAL' if i == 0 else 'ESPECIAL',
+                canal='TODOS' if i == 0 else CANALES[(i - 1) % len(CANALES)],
+                fecha_inicio=hoy - timedelta(days=30),
+                fecha_fin=None if i == 0 else hoy + timedelta(days=365),
+            ))
+        return self._crear(ListaPrecio, listas)
+
+    def _precios(self, listas, articulos):
+        for lista in listas:
+            margen = Decimal(self.rnd.randint(115, 160)) / 100
+            self._crear(PrecioArticulo, [
+                PrecioArticulo(
+                    lista_precio=lista,
+                    articulo=articulo,
+                    precio_base=(articulo.ultimo_costo * margen).quantize(Decimal('0.01')),
+                    descuento_proveedor=Decimal(self.rnd.choice([0, 0, 0, 55, 60])),
+                )
+                for articulo in articulos
+            ])
+
+    def _reglas(self, listas, lineas, grupos, total):
+        reglas = []
+        for lista in listas:
+            for r in range(total):
+                tipo_regla = TIPOS_REGLA[r % len(TIPOS_REGLA)]
+                alcance = self.rnd.random()
+                regla = ReglaPrecio(
+                    lista_precio=lista,
+                    nombre=f'Regla {r + 1}',
+                    tipo_regla=tipo_regla,
+                    tipo_ajuste=self.rnd.choice(TIPOS_AJUSTE),
+                    linea_articulo=self.rnd.choice(lineas) if alcance < 0.4 else None,
+                    grupo_articulo=self.rnd.choice(grupos) if 0.4 <= alcance < 0.8 else None,
+                    valor_ajuste=Decimal(self.rnd.randint(1, 10)),
+                    prioridad=self.rnd.randint(1, 5),
+                )
+                if tipo_regla == 'ESCALA_UNIDADES':
+                    regla.cantidad_minima = self.rnd.randint(1, 50)
+                    regla.cantidad_maxima = regla.cantidad_minima + self.rnd.randint(10, 200)
+                elif tipo_regla in ('ESCALA_MONTO', 'MONTO_PEDIDO'):
+                    regla.monto_minimo = Decimal(self.rnd.randint(100, 5000))
+                    regla.monto_maximo = regla.monto_minimo + self.rnd.randint(1000, 50000)
+                reglas.append(regla)
+        self._crear(ReglaPrecio, reglas)
+
+    def _combinaciones(self, listas, lineas, grupos, articulos, total):
+        combinaciones = []
+        for lista in listas:
+            for c in range(total):
+                combinaciones.append(CombinacionProducto(
+                    lista_precio=lista,
+                    nombre=f'Combinación {c + 1}',
+                    linea_articulo=self.rnd.choice(lineas) if c % 3 == 0 else None,
+                    grupo_articulo=self.rnd.choice(grupos) if c % 3 == 1 else None,
+                    cantidad_minima=self.rnd.randint(2, 5),
+                    tipo_descuento=self.rnd.choice(['PORCENTAJE', 'MONTO_FIJO']),
+                    valor_descuento=Decimal(self.rnd.randint(1, 5)),
+                ))
+        combinaciones = self._crear(CombinacionProducto, combinaciones)
+
+        # Un tercio de las combinaciones se define por artículos específicos
+        Relacion = CombinacionProducto.articulos.through
+        self._crear(Relacion, [
+            Relacion(combinacionproducto_id=combinacion.id, articulo_id=articulo.id)
+            for c, combinacion in enumerate(combinaciones)
+            if c % 3 == 2
+            for articulo in self.rnd.sample(articulos, min(len(articulos), self.rnd.randint(2, 4)))
+        ])
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ListaPrecio
+from core.services.importacion import (
+    LECTORES, TAMANO_LOTE, ErrorImportacion, importar_precios
+)
+
+
+class Command(BaseCommand):
+    help = 'Importa (inserta o actualiza) los precios de una lista desde un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lista_id', type=int, help='ID de la lista de precios')
+        parser.add_argument('archivo', help='Ruta del archivo a importar')
+        parser.add_argument(
+            '--formato', choices=sorted(LECTORES),
+            help='Formato del archivo (por defecto según la extensión)'
+        )
+        parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+        parser.add_argument('--delimitador', default=',', help='Separador de columnas del CSV')
+
+    def handle(self, *args, **options):
+        try:
+            lista = ListaPrecio.objects.get(id=options['lista_id'])
+        except ListaPrecio.DoesNotExist:
+            raise CommandError(f"No existe la lista de precios {options['lista_id']}")
+
+        formato = options['formato'] or options['archivo'].rsplit('.', 1)[-1].lower()
+        if formato not in LECTORES:
+            raise CommandError(f'Formato no soportado: {formato}')
+
+        self.stdout.write(f'Importando {options["archivo"]} en "{lista.nombre}"...')
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                if formato == 'csv':
+                    filas = LECTORES['csv'](archivo, options['delimitador'])
+                else:
+                    filas = LECTORES[formato](archivo)
+                resumen = importar_precios(lista, filas, options['tamano_lote'])
+        except (OSError, ErrorImportacion) as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {resumen['filas_importadas']} de {resumen['filas_leidas']} filas importadas "
+            f"en {resumen['segundos']} s ({resumen['filas_por_segundo']} filas/s)"
+        ))
+        if resumen['rechazadas']:
+            self.stdout.write(self.style.WARNING(f"{len(resumen['rechazadas'])} filas rechazadas:"))
+            for rechazo in resumen['rechazadas']:
+                self.stdout.write(f"  - fila {rechazo['fila']}: {rechazo['motivo']}")
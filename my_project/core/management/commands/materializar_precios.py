@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ListaPrecio
+from core.services.materializacion import (
+    TAMANO_LOTE, materializar_lista, refrescar_pendientes
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula los precios efectivos (tabla precio_efectivo). Por defecto solo '
+        'recalcula los pendientes; pensado para ejecutarse periódicamente (cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lista', type=int, action='append', dest='listas',
+            help='ID de lista a procesar (puede repetirse); por defecto todas las pendientes'
+        )
+        parser.add_argument(
+            '--completo', action='store_true',
+            help='Recalcula todos los precios de las listas en lugar de solo los pendientes'
+        )
+        parser.add_argument('--tamano-lote', type=int, default=TAMANO_LOTE)
+        parser.add_argument(
+            '--intervalo', type=int, default=0,
+            help='Segundos entre ejecuciones; con 0 se ejecuta una sola vez'
+        )
+
+    def handle(self, *args, **options):
+        if options['tamano_lote'] < 1:
+            raise CommandError('El tamaño de lote debe ser mayor que cero')
+        if options['completo'] and not options['listas']:
+            listas = ListaPrecio.objects.all()
+        elif options['listas']:
+            listas = ListaPrecio.objects.filter(id__in=options['listas'])
+            if not listas.exists():
+                raise CommandError('No existe ninguna de las listas indicadas')
+        else:
+            listas = None
+
+        while True:
+            self._ejecutar(listas, options)
+            if not options['intervalo']:
+                break
+            time.sleep(options['intervalo'])
+
+    def _ejecutar(self, listas, options):
+        inicio = time.perf_counter()
+        if options['completo']:
+            resumen = {
+                lista.id: materializar_lista(lista, tamano_lote=options['tamano_lote'])
+                for lista in listas.all()
+            }
+        else:
+            resumen = refrescar_pendientes(
+                listas.all() if listas is not None else None, options['tamano_lote']
+            )
+
+        for lista_id, filas in resumen.items():
+            self.stdout.write(f'  lista {lista_id}: {filas} precios')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {sum(resumen.values())} precios efectivos en {len(resumen)} listas '
+            f'({time.perf_counter() - inicio:.2f} s)'
+        ))
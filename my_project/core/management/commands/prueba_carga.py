@@ -0,0 +1,134 @@
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark_precios import lista_para_medir, percentil
+from core.services.lista_compilada import obtener_lista_compilada
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga del cálculo de precios: compara el rendimiento del camino '
+        'síncrono (WSGI, /api/precios/calcular/) y el asíncrono (ASGI, '
+        '/api/precios/acalcular/) con N clientes concurrentes. Los servidores '
+        'deben estar levantados, por ejemplo:\n'
+        '  gunicorn my_project.wsgi -w 4 -b 127.0.0.1:8000\n'
+        '  uvicorn my_project.asgi:application --workers 4 --port 8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url-sync', default='http://127.0.0.1:8000/api/precios/calcular/',
+            help='Endpoint síncrono servido por WSGI'
+        )
+        parser.add_argument(
+            '--url-async', default='http://127.0.0.1:8001/api/precios/acalcular/',
+            help='Endpoint asíncrono servido por ASGI'
+        )
+        parser.add_argument('--concurrencia', type=int, nargs='+', default=[50, 200])
+        parser.add_argument('--duracion', type=float, default=20, help='Segundos por medición')
+        parser.add_argument('--lista', type=int, help='Lista a usar; por defecto la vigente con más precios')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help='Archivo JSON de resultados')
+
+    def handle(self, *args, **options):
+        lista = lista_para_medir(options['lista'])
+        articulo_ids = sorted(obtener_lista_compilada(lista).precios)
+        if not articulo_ids:
+            raise CommandError(f'La lista {lista.id} no tiene precios')
+        rnd = random.Random(options['semilla'])
+        cuerpos = [
+            json.dumps({
+                'empresa_id': lista.empresa_id,
+                'sucursal_id': lista.sucursal_id,
+                'articulo_id': rnd.choice(articulo_ids),
+                'canal': lista.canal,
+                'cantidad': rnd.randint(1, 100),
+            })
+            for _ in range(1000)
+        ]
+
+        self.stdout.write(
+            f"{'camino':<8} {'clientes':>8} {'peticiones/s':>13} {'p50 (ms)':>9} "
+            f"{'p95 (ms)':>9} {'p99 (ms)':>9} {'errores':>8}"
+        )
+        resultados = []
+        for concurrencia in options['concurrencia']:
+            for camino, url in (('sync', options['url_sync']), ('async', options['url_async'])):
+                resultado = self._medir(url, cuerpos, concurrencia, options['duracion'])
+                resultado.update({'camino': camino, 'url': url, 'concurrencia': concurrencia})
+                resultados.append(resultado)
+                latencias = ' '.join(
+                    f'{resultado[clave]:>9.1f}' if resultado[clave] is not None else f'{"-":>9}'
+                    for clave in ('p50_ms', 'p95_ms', 'p99_ms')
+                )
+                self.stdout.write(
+                    f"{camino:<8} {concurrencia:>8} {resultado['peticiones_por_segundo']:>13.1f} "
+                    f"{latencias} {resultado['errores']:>8}"
+                )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump({'lista_id': lista.id, 'resultados': resultados}, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["salida"]}'))
+
+    def _medir(self, url, cuerpos, concurrencia, duracion):
+        partes = urlsplit(url)
+        if partes.scheme != 'http' or not partes.hostname:
+            raise CommandError(f'URL no soportada: {url}')
+
+        tiempos = []
+        errores = [0]
+        bloqueo = threading.Lock()
+        fin = time.perf_counter() + duracion
+
+        def cliente(indice):
+            conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+            propios = []
+            fallidas = 0
+            i = indice
+            while time.perf_counter() < fin:
+                i += concurrencia
+                inicio = time.perf_counter()
+                try:
+                    conexion.request(
+                        'POST', partes.path, cuerpos[i % len(cuerpos)],
+                        {'Content-Type': 'application/json'}
+                    )
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    if respuesta.status != 200:
+                        fallidas += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    fallidas += 1
+                    conexion.close()
+                    continue
+                propios.append((time.perf_counter() - inicio) * 1000)
+            conexion.close()
+            with bloqueo:
+                tiempos.extend(propios)
+                errores[0] += fallidas
+
+        hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(concurrencia)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        transcurrido = time.perf_counter() - inicio
+
+        tiempos.sort()
+        return {
+            'peticiones': len(tiempos),
+            'errores': errores[0],
+            'peticiones_por_segundo': round(len(tiempos) / transcurrido, 1),
+            'p50_ms': round(percentil(tiempos, 50), 2) if tiempos else None,
+            'p95_ms': round(percentil(tiempos, 95), 2) if tiempos else None,
+            'p99_ms': round(percentil(tiempos, 99), 2) if tiempos else None,
+        }
@@ -0,0 +1,51 @@
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark_precios import lista_para_medir
+from core.services.lista_compilada import obtener_lista_compilada
+from core.services.simulacion import ErrorSimulacion, arreglos_lista, simular_lista
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula el precio de todos los artículos de una lista con sus reglas '
+        'actuales (o sin algunas de ellas) y muestra el resumen: artículos bajo '
+        'costo, descuento promedio y distribución del margen. Requiere numpy'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lista', type=int, help='Por defecto la lista vigente con más precios')
+        parser.add_argument('--canal', help='Canal simulado; por defecto el de la lista')
+        parser.add_argument('--cantidad', type=int, default=1)
+        parser.add_argument('--monto-pedido', type=Decimal, default=Decimal('0'))
+        parser.add_argument(
+            '--sin-regla', type=int, action='append', default=[], dest='sin_reglas',
+            help='ID de regla a excluir de la simulación (puede repetirse)'
+        )
+
+    def handle(self, *args, **options):
+        lista = lista_para_medir(options['lista'])
+        compilada = obtener_lista_compilada(lista)
+        reglas = [regla for regla in compilada.reglas if regla.id not in options['sin_reglas']]
+
+        try:
+            inicio = time.perf_counter()
+            arreglos_lista(compilada)
+            carga = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            resumen = simular_lista(
+                compilada, reglas, options['canal'], options['cantidad'], options['monto_pedido']
+            )
+            simulacion = time.perf_counter() - inicio
+        except ErrorSimulacion as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(json.dumps(resumen, indent=2, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Lista {lista.id}: {resumen["articulos"]} artículos, {len(reglas)} reglas; '
+            f'carga de arreglos {carga * 1000:.1f} ms, simulación {simulacion * 1000:.1f} ms'
+        ))
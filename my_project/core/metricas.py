@@ -0,0 +1,240 @@
+"""
+Métricas de la API en formato Prometheus (GET /metrics). Requiere prometheus_client.
+
+MetricasMiddleware registra por cada petición, con la ruta de Django como
+etiqueta (p. ej. 'api/listas-precios/{pk}/precios/'):
+
+- precios_http_duracion_segundos: latencia (histograma por ruta y método).
+- precios_http_peticiones_total: peticiones por ruta, método y estado.
+- precios_http_consultas_db y precios_http_tiempo_db_segundos: consultas
+  y tiempo de base de datos de la petición (execute_wrapper en cada conexión).
+- precios_http_filas: filas devueltas por las respuestas DRF que son una
+  lista, una página (results) o un lote (items).
+- precios_cache_{aciertos,fallos,desalojos}_total: cachés del motor de
+  precios (lista vigente, listas compiladas, cotizaciones). Cada caché cuenta
+  en memoria; al terminar cada petición el proceso suma a las métricas la
+  diferencia desde la petición anterior, fuera del camino del cálculo.
+
+Con varios workers de gunicorn, PROMETHEUS_MULTIPROC_DIR debe apuntar a un
+directorio vacío compartido por los procesos antes de arrancar (ver
+gunicorn.conf.py): cada worker escribe sus valores en archivos de ese
+directorio y /metrics los suma todos, responda el worker que responda.
+
+Bajo ASGI el middleware es asíncrono y no obliga a la cadena a pasar por un
+hilo; como las consultas se hacen entonces en otros hilos, en ese modo no se
+registran las métricas de base de datos.
+"""
+import logging
+import os
+import re
+import threading
+from contextlib import ExitStack
+from functools import lru_cache
+from time import perf_counter
+from types import SimpleNamespace
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+# Límites de los histogramas
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+LIMITES_FILAS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+SIN_RUTA = 'sin_ruta'
+
+logger = logging.getLogger(__name__)
+
+# (?P<pk>[^/.]+) de los routers de DRF y <int:empresa_id> de path()
+_PARAMETRO_REGEX = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+_PARAMETRO_PATH = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+class ErrorMetricas(Exception):
+    """No se pueden exportar las métricas."""
+
+
+def _prometheus():
+    try:
+        import prometheus_client
+    except ImportError:
+        raise ErrorMetricas('Para exponer métricas instale prometheus_client')
+    return prometheus_client
+
+
+@lru_cache(maxsize=None)
+def metricas():
+    """Métricas del proceso; se crean una sola vez en el registro global."""
+    prometheus = _prometheus()
+    return SimpleNamespace(
+        duracion=prometheus.Histogram(
+            'precios_http_duracion_segundos', 'Latencia de las peticiones',
+            ['ruta', 'metodo'], buckets=LIMITES_LATENCIA
+        ),
+        peticiones=prometheus.Counter(
+            'precios_http_peticiones', 'Peticiones atendidas', ['ruta', 'metodo', 'estado']
+        ),
+        consultas=prometheus.Histogram(
+            'precios_http_consultas_db', 'Consultas a la base de datos por petición',
+            ['ruta'], buckets=LIMITES_CONSULTAS
+        ),
+        tiempo_db=prometheus.Histogram(
+            'precios_http_tiempo_db_segundos', 'Tiempo en la base de datos por petición',
+            ['ruta'], buckets=LIMITES_LATENCIA
+        ),
+        filas=prometheus.Histogram(
+            'precios_http_filas', 'Filas devueltas por petición', ['ruta'], buckets=LIMITES_FILAS
+        ),
+        cache={
+            campo: prometheus.Counter(
+                f'precios_cache_{campo}', f'{campo.capitalize()} de las cachés de precios', ['cache']
+            )
+            for campo in ('aciertos', 'fallos', 'desalojos')
+        },
+    )
+
+
+def _fuentes_cache():
+    # Importación diferida: los servicios importan los modelos
+    from core.services.cache_cotizaciones import cache_cotizaciones
+    from core.services.cache_listas import contador_lista_vigente
+    from core.services.lista_compilada import contador_compiladas
+
+    return {
+        'lista_vigente': contador_lista_vigente.estadisticas,
+        'lista_compilada': contador_compiladas.estadisticas,
+        'cotizaciones': cache_cotizaciones.estadisticas,
+    }
+
+
+_vistos = {}
+_lock_vistos = threading.Lock()
+
+
+def sincronizar_caches():
+    """Suma a las métricas lo que contaron las cachés desde la última llamada."""
+    contadores = metricas().cache
+    with _lock_vistos:
+        for nombre, estadisticas in _fuentes_cache().items():
+            datos = estadisticas()
+            for campo, contador in contadores.items():
+                actual = datos.get(campo)
+                if actual is None:
+                    continue
+                anterior = _vistos.get((nombre, campo), 0)
+                # Si la caché se limpió sus contadores volvieron a cero
+                diferencia = actual - anterior if actual >= anterior else actual
+                if diferencia:
+                    contador.labels(cache=nombre).inc(diferencia)
+                _vistos[(nombre, campo)] = actual
+
+
+def ruta_de(request):
+    """Patrón de la URL resuelta, con {nombre} en lugar de cada parámetro."""
+    coincidencia = getattr(request, 'resolver_match', None)
+    if coincidencia is None or not coincidencia.route:
+        return SIN_RUTA
+    ruta = _PARAMETRO_REGEX.sub(r'{\1}', coincidencia.route)
+    ruta = _PARAMETRO_PATH.sub(r'{\1}', ruta)
+    return ruta.replace('^', '').replace('$', '').replace('\\', '')
+
+
+def filas_de(response):
+    """Filas de una respuesta DRF, o None si no es una colección."""
+    datos = getattr(response, 'data', None)
+    if isinstance(datos, dict):
+        datos = datos.get('results', datos.get('items'))
+    if isinstance(datos, list):
+        return len(datos)
+    return None
+
+
+class _ConsultasPeticion:
+    """execute_wrapper que cuenta las consultas de una petición y su tiempo."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += perf_counter() - inicio
+
+
+class MetricasMiddleware:
+    """Registra latencia, consultas y filas de cada petición (síncrono o asíncrono)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        try:
+            metricas()
+        except ErrorMetricas as error:
+            logger.warning('Métricas desactivadas: %s', error)
+            raise MiddlewareNotUsed(str(error))
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+
+        consultas = _ConsultasPeticion()
+        inicio = perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(consultas))
+            response = self.get_response(request)
+        self._registrar(request, response, perf_counter() - inicio, consultas)
+        return response
+
+    async def __acall__(self, request):
+        inicio = perf_counter()
+        response = await self.get_response(request)
+        self._registrar(request, response, perf_counter() - inicio, None)
+        return response
+
+    def _registrar(self, request, response, duracion, consultas):
+        m = metricas()
+        ruta = ruta_de(request)
+        m.duracion.labels(ruta, request.method).observe(duracion)
+        m.peticiones.labels(ruta, request.method, str(response.status_code)).inc()
+        if consultas is not None:
+            m.consultas.labels(ruta).observe(consultas.consultas)
+            m.tiempo_db.labels(ruta).observe(consultas.segundos)
+        filas = filas_de(response)
+        if filas is not None:
+            m.filas.labels(ruta).observe(filas)
+        sincronizar_caches()
+
+
+def exportar_metricas():
+    """
+    Métricas en el formato de texto de Prometheus.
+
+    Con PROMETHEUS_MULTIPROC_DIR suma los archivos de todos los procesos;
+    sin él, solo las del proceso actual.
+
+    Returns:
+        tuple (bytes, content type)
+    """
+    prometheus = _prometheus()
+    metricas()
+    sincronizar_caches()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registro = prometheus.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = prometheus.REGISTRY
+    return prometheus.generate_latest(registro), prometheus.CONTENT_TYPE_LATEST
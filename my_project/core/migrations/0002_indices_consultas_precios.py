@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='combinacionproducto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['lista_precio', 'id'], name='combinacion_lista_activa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detalleordencompracliente',
+            index=models.Index(fields=['numero_orden'], name='detalle_numero_orden_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listaprecio',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['empresa', 'sucursal', 'canal', '-fecha_inicio', 'fecha_fin'], name='lista_vigente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reglaprecio',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['lista_precio', 'prioridad', 'id'], name='regla_lista_activa_idx'),
+        ),
+    ]
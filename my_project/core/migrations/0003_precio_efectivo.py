@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_indices_consultas_precios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioEfectivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_base', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('precio_final', models.DecimalField(decimal_places=6, max_digits=16)),
+                ('porcentaje_descuento', models.DecimalField(decimal_places=2, default=0, max_digits=7)),
+                ('bajo_costo', models.BooleanField(default=False)),
+                ('es_valido', models.BooleanField(default=True)),
+                ('desactualizado', models.BooleanField(default=False)),
+                ('fecha_calculo', models.DateTimeField(auto_now=True)),
+                ('articulo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios_efectivos', to='core.articulo')),
+                ('lista_precio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precios_efectivos', to='core.listaprecio')),
+            ],
+            options={
+                'verbose_name': 'Precio Efectivo',
+                'verbose_name_plural': 'Precios Efectivos',
+                'db_table': 'precio_efectivo',
+                'indexes': [models.Index(condition=models.Q(('desactualizado', True)), fields=['lista_precio'], name='precio_efectivo_pendiente_idx')],
+                'unique_together': {('lista_precio', 'articulo')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_precio_efectivo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalleordencompracliente',
+            name='linea',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='detalleordencompracliente',
+            constraint=models.UniqueConstraint(fields=('empresa', 'numero_orden', 'linea'), name='detalle_orden_linea_unica'),
+        ),
+    ]
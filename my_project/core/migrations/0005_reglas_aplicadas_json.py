@@ -0,0 +1,72 @@
+import ast
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+TAMANO_LOTE = 2000
+
+
+def _convertir(texto):
+    """Texto guardado en reglas_aplicadas → valor JSON."""
+    if not texto or not texto.strip():
+        return []
+    try:
+        return json.loads(texto)
+    except ValueError:
+        pass
+    try:
+        # Algunas integraciones guardaron la representación de Python (str(lista))
+        return json.loads(json.dumps(ast.literal_eval(texto), cls=DjangoJSONEncoder))
+    except (ValueError, SyntaxError, TypeError):
+        # Se conserva el texto original como cadena JSON
+        return texto
+
+
+def _por_lotes(modelo, campo):
+    ultimo_id = 0
+    while True:
+        lote = list(
+            modelo.objects.filter(id__gt=ultimo_id).order_by('id').only('id', campo)[:TAMANO_LOTE]
+        )
+        if not lote:
+            return
+        yield lote
+        ultimo_id = lote[-1].id
+
+
+def texto_a_json(apps, schema_editor):
+    DetalleOrdenCompraCliente = apps.get_model('core', 'DetalleOrdenCompraCliente')
+    for lote in _por_lotes(DetalleOrdenCompraCliente, 'reglas_aplicadas'):
+        for detalle in lote:
+            detalle.reglas_aplicadas_json = _convertir(detalle.reglas_aplicadas)
+        DetalleOrdenCompraCliente.objects.bulk_update(lote, ['reglas_aplicadas_json'])
+
+
+def json_a_texto(apps, schema_editor):
+    DetalleOrdenCompraCliente = apps.get_model('core', 'DetalleOrdenCompraCliente')
+    for lote in _por_lotes(DetalleOrdenCompraCliente, 'reglas_aplicadas_json'):
+        for detalle in lote:
+            valor = detalle.reglas_aplicadas_json
+            detalle.reglas_aplicadas = valor if isinstance(valor, str) else json.dumps(valor, cls=DjangoJSONEncoder)
+        DetalleOrdenCompraCliente.objects.bulk_update(lote, ['reglas_aplicadas'])
+
+
+class Migration(migrations.Migration):
+    # Cada lote se confirma por separado para no mantener bloqueada la tabla
+    # durante toda la conversión
+    atomic = False
+
+    dependencies = [
+        ('core', '0004_detalle_orden_linea'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalleordencompracliente',
+            name='reglas_aplicadas_json',
+            field=models.JSONField(blank=True, default=list, encoder=DjangoJSONEncoder),
+        ),
+        migrations.RunPython(texto_a_json, json_a_texto),
+    ]
@@ -0,0 +1,27 @@
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_reglas_aplicadas_json'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='detalleordencompracliente',
+            name='reglas_aplicadas',
+        ),
+        migrations.RenameField(
+            model_name='detalleordencompracliente',
+            old_name='reglas_aplicadas_json',
+            new_name='reglas_aplicadas',
+        ),
+        migrations.AddIndex(
+            model_name='detalleordencompracliente',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['reglas_aplicadas'], name='detalle_reglas_aplicadas_gin', opclasses=['jsonb_path_ops']
+            ),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:28
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_reglas_aplicadas_gin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAgregacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('procesado_hasta', models.DateTimeField(blank=True, null=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Marca de Agregación',
+                'verbose_name_plural': 'Marcas de Agregación',
+                'db_table': 'marca_agregacion',
+            },
+        ),
+        migrations.CreateModel(
+            name='UsoReglaDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('tipo', models.CharField(choices=[('REGLA', 'Regla de precio'), ('COMBINACION', 'Combinación de productos')], max_length=20)),
+                ('referencia_id', models.PositiveIntegerField()),
+                ('nombre', models.CharField(max_length=200)),
+                ('veces_aplicada', models.PositiveIntegerField(default=0)),
+                ('unidades', models.BigIntegerField(default=0)),
+                ('descuento_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Uso Diario de Regla',
+                'verbose_name_plural': 'Uso Diario de Reglas',
+                'db_table': 'uso_regla_diario',
+            },
+        ),
+        migrations.AddField(
+            model_name='detalleordencompracliente',
+            name='combinaciones_aplicadas',
+            field=models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AddIndex(
+            model_name='detalleordencompracliente',
+            index=models.Index(fields=['fecha_orden'], name='detalle_fecha_orden_idx'),
+        ),
+        migrations.AddField(
+            model_name='usoregladiario',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.empresa'),
+        ),
+        migrations.AddField(
+            model_name='usoregladiario',
+            name='sucursal',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.sucursal'),
+        ),
+        migrations.AddIndex(
+            model_name='usoregladiario',
+            index=models.Index(fields=['empresa', 'fecha'], name='uso_regla_empresa_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usoregladiario',
+            index=models.Index(fields=['tipo', 'referencia_id', 'fecha'], name='uso_regla_referencia_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='usoregladiario',
+            constraint=models.UniqueConstraint(fields=('fecha', 'empresa', 'sucursal', 'tipo', 'referencia_id'), name='uso_regla_diario_unico'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:38
+
+from django.db import migrations, models
+
+
+# (tabla hija, columna, tabla padre, nombre de la restricción)
+RELACIONES = [
+    ('grupo_articulo', 'linea_id', 'linea_articulo', 'grupo_articulo_linea_misma_empresa'),
+    ('articulo', 'grupo_id', 'grupo_articulo', 'articulo_grupo_misma_empresa'),
+]
+
+
+def _sql_crear(vendor, hija, columna, padre, nombre):
+    if vendor == 'postgresql':
+        # Diferible como las claves foráneas de Django: se verifica al COMMIT
+        return [
+            f'ALTER TABLE {hija} ADD CONSTRAINT {nombre} '
+            f'FOREIGN KEY (empresa_id, {columna}) REFERENCES {padre} (empresa_id, id) '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        ]
+    if vendor == 'sqlite':
+        # SQLite no agrega restricciones con ALTER TABLE: se usan triggers. Django
+        # recrea la tabla al alterar columnas en SQLite y con ella se pierden los
+        # triggers; una migración que lo haga debe volver a crearlos
+        distinta = f'(SELECT empresa_id FROM {padre} WHERE id = NEW.{columna}) IS NOT NEW.empresa_id'
+        abortar = f"BEGIN SELECT RAISE(ABORT, '{nombre}'); END"
+        return [
+            f'CREATE TRIGGER {nombre}_ins BEFORE INSERT ON {hija} '
+            f'WHEN {distinta} {abortar}',
+            f'CREATE TRIGGER {nombre}_upd BEFORE UPDATE OF empresa_id, {columna} ON {hija} '
+            f'WHEN {distinta} {abortar}',
+            f'CREATE TRIGGER {nombre}_padre BEFORE UPDATE OF empresa_id ON {padre} '
+            f'WHEN EXISTS (SELECT 1 FROM {hija} WHERE {columna} = NEW.id '
+            f'AND empresa_id <> NEW.empresa_id) {abortar}',
+        ]
+    return []
+
+
+def _sql_borrar(vendor, hija, columna, padre, nombre):
+    if vendor == 'postgresql':
+        return [f'ALTER TABLE {hija} DROP CONSTRAINT IF EXISTS {nombre}']
+    if vendor == 'sqlite':
+        return [f'DROP TRIGGER IF EXISTS {nombre}_{sufijo}' for sufijo in ('ins', 'upd', 'padre')]
+    return []
+
+
+def crear_restricciones(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for relacion in RELACIONES:
+        for sql in _sql_crear(vendor, *relacion):
+            schema_editor.execute(sql)
+
+
+def borrar_restricciones(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for relacion in reversed(RELACIONES):
+        for sql in _sql_borrar(vendor, *relacion):
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_uso_reglas_diario'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='grupoarticulo',
+            constraint=models.UniqueConstraint(fields=('empresa', 'id'), name='grupo_articulo_empresa_id_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='lineaarticulo',
+            constraint=models.UniqueConstraint(fields=('empresa', 'id'), name='linea_articulo_empresa_id_unico'),
+        ),
+        migrations.RunPython(crear_restricciones, borrar_restricciones),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
@@ -96,6 +98,10 @@ class LineaArticulo(models.Model):
         verbose_name = 'Línea de Artículo'
         verbose_name_plural = 'Líneas de Artículos'
         unique_together = ['empresa', 'codigo']  # Código único por empresa
+        constraints = [
+            # Destino de la clave foránea compuesta (empresa_id, linea_id) de grupo_articulo
+            models.UniqueConstraint(fields=['empresa', 'id'], name='linea_articulo_empresa_id_unico'),
+        ]
 
     def __str__(self):
         return f"{self.empresa.nombre} - {self.nombre}"
@@ -116,13 +122,18 @@ class GrupoArticulo(models.Model):
         verbose_name = 'Grupo de Artículo'
         verbose_name_plural = 'Grupos de Artículos'
         unique_together = ['empresa', 'codigo']  # Código único por empresa
+        constraints = [
+            # Destino de la clave foránea compuesta (empresa_id, grupo_id) de articulo
+            models.UniqueConstraint(fields=['empresa', 'id'], name='grupo_articulo_empresa_id_unico'),
+        ]
 
     def __str__(self):
         return f"{self.empresa.nombre} - {self.linea.nombre} - {self.nombre}"
     
     def save(self, *args, **kwargs):
-        # Validar que la línea pertenezca a la misma empresa
-        if self.linea.empresa != self.empresa:
+        # La base de datos exige que la línea sea de la misma empresa (migración
+        # 0008); aquí solo se adelanta el error si la línea ya está cargada
+        if GrupoArticulo.linea.is_cached(self) and self.linea.empresa_id != self.empresa_id:
             raise ValueError("La línea debe pertenecer a la misma empresa")
         super().save(*args, **kwargs)
 
@@ -155,8 +166,9 @@ class Articulo(models.Model):
         return f"{self.empresa.nombre} - {self.codigo} - {self.nombre}"
     
     def save(self, *args, **kwargs):
-        # Validar que el grupo pertenezca a la misma empresa
-        if self.grupo.empresa != self.empresa:
+        # La base de datos exige que el grupo sea de la misma empresa (migración
+        # 0008); aquí solo se adelanta el error si el grupo ya está cargado
+        if Articulo.grupo.is_cached(self) and self.grupo.empresa_id != self.empresa_id:
             raise ValueError("El grupo debe pertenecer a la misma empresa")
         super().save(*args, **kwargs)
 
@@ -199,6 +211,14 @@ class ListaPrecio(models.Model):
         verbose_name = 'Lista de Precio'
         verbose_name_plural = 'Listas de Precios'
         ordering = ['-fecha_inicio']
+        indexes = [
+            # Resolución de la lista vigente (PrecioService.obtener_lista_vigente)
+            models.Index(
+                fields=['empresa', 'sucursal', 'canal', '-fecha_inicio', 'fecha_fin'],
+                condition=models.Q(activo=True),
+                name='lista_vigente_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.empresa.nombre}"
@@ -307,11 +327,55 @@ class ReglaPrecio(models.Model):
         verbose_name = 'Regla de Precio'
         verbose_name_plural = 'Reglas de Precios'
         ordering = ['prioridad']
+        indexes = [
+            # Reglas activas de una lista en orden de prioridad
+            models.Index(
+                fields=['lista_precio', 'prioridad', 'id'],
+                condition=models.Q(activo=True),
+                name='regla_lista_activa_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.tipo_regla}"
 
 
+class PrecioEfectivo(models.Model):
+    """
+    Precio final precalculado de un artículo en una lista (cantidad 1, sin combinaciones).
+    No depende del canal: toda lista vigente para un canal aplica sus reglas por canal.
+    """
+    lista_precio = models.ForeignKey(ListaPrecio, on_delete=models.CASCADE, related_name='precios_efectivos')
+    articulo = models.ForeignKey(Articulo, on_delete=models.CASCADE, related_name='precios_efectivos')
+    
+    precio_base = models.DecimalField(max_digits=12, decimal_places=2)
+    precio_final = models.DecimalField(max_digits=16, decimal_places=6)
+    porcentaje_descuento = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+    bajo_costo = models.BooleanField(default=False)
+    es_valido = models.BooleanField(default=True)
+    
+    # Marcado por señales cuando cambian precios, reglas o costos; lo recalcula materializar_precios
+    desactualizado = models.BooleanField(default=False)
+    fecha_calculo = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'precio_efectivo'
+        verbose_name = 'Precio Efectivo'
+        verbose_name_plural = 'Precios Efectivos'
+        # La clave única también sirve a la lectura del catálogo de una lista ordenada por artículo
+        unique_together = ['lista_precio', 'articulo']
+        indexes = [
+            models.Index(
+                fields=['lista_precio'],
+                condition=models.Q(desactualizado=True),
+                name='precio_efectivo_pendiente_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.lista_precio_id} - {self.articulo_id} - {self.precio_final}"
+
+
 class CombinacionProducto(models.Model):
     """Combinaciones de productos para reglas especiales"""
     lista_precio = models.ForeignKey(ListaPrecio, on_delete=models.CASCADE, related_name='combinaciones')
@@ -353,6 +417,13 @@ class CombinacionProducto(models.Model):
         db_table = 'combinacion_producto'
         verbose_name = 'Combinación de Producto'
         verbose_name_plural = 'Combinaciones de Productos'
+        indexes = [
+            models.Index(
+                fields=['lista_precio', 'id'],
+                condition=models.Q(activo=True),
+                name='combinacion_lista_activa_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -372,15 +443,97 @@ class DetalleOrdenCompraCliente(models.Model):
     descuento_aplicado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     subtotal = models.DecimalField(max_digits=12, decimal_places=2)
     
-    reglas_aplicadas = models.TextField(blank=True)  # JSON con las reglas aplicadas
+    reglas_aplicadas = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    combinaciones_aplicadas = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
     bajo_costo = models.BooleanField(default=False)
     
+    # Número de línea en las órdenes confirmadas en bloque; vacío en las
+    # líneas registradas una por una
+    linea = models.PositiveIntegerField(null=True, blank=True)
+    
     fecha_orden = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'detalle_orden_compra_cliente'
         verbose_name = 'Detalle de Orden de Compra'
         verbose_name_plural = 'Detalles de Órdenes de Compra'
+        indexes = [
+            models.Index(fields=['numero_orden'], name='detalle_numero_orden_idx'),
+            # Lectura incremental de agregar_uso_reglas (fecha_orden posterior a la marca)
+            models.Index(fields=['fecha_orden'], name='detalle_fecha_orden_idx'),
+            # Responde reglas_aplicadas__contains (@>), p. ej. las órdenes que usaron una regla
+            GinIndex(
+                fields=['reglas_aplicadas'],
+                opclasses=['jsonb_path_ops'],
+                name='detalle_reglas_aplicadas_gin'
+            ),
+        ]
+        constraints = [
+            # Hace idempotente la confirmación: un reintento no duplica líneas
+            models.UniqueConstraint(
+                fields=['empresa', 'numero_orden', 'linea'],
+                name='detalle_orden_linea_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Orden {self.numero_orden} - {self.articulo.nombre}"
+
+
+class MarcaAgregacion(models.Model):
+    """Hasta qué fecha_orden se procesaron los detalles en cada tabla resumen"""
+    nombre = models.CharField(max_length=50, unique=True)
+    procesado_hasta = models.DateTimeField(null=True, blank=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'marca_agregacion'
+        verbose_name = 'Marca de Agregación'
+        verbose_name_plural = 'Marcas de Agregación'
+
+    def __str__(self):
+        return f"{self.nombre} - {self.procesado_hasta}"
+
+
+class UsoReglaDiario(models.Model):
+    """
+    Uso diario de cada regla o combinación en las órdenes, por sucursal.
+    Lo mantiene agregar_uso_reglas a partir de DetalleOrdenCompraCliente.
+    """
+    TIPO_CHOICES = [
+        ('REGLA', 'Regla de precio'),
+        ('COMBINACION', 'Combinación de productos'),
+    ]
+
+    fecha = models.DateField()
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.CASCADE, null=True, blank=True)
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    # ID de la regla o combinación, sin clave foránea: el historial se conserva
+    # aunque la regla se elimine
+    referencia_id = models.PositiveIntegerField()
+    nombre = models.CharField(max_length=200)
+
+    veces_aplicada = models.PositiveIntegerField(default=0)
+    unidades = models.BigIntegerField(default=0)
+    # Descuento de las líneas donde se aplicó (incluye el de otras reglas de la misma línea)
+    descuento_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    ingresos = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'uso_regla_diario'
+        verbose_name = 'Uso Diario de Regla'
+        verbose_name_plural = 'Uso Diario de Reglas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'empresa', 'sucursal', 'tipo', 'referencia_id'],
+                name='uso_regla_diario_unico'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['empresa', 'fecha'], name='uso_regla_empresa_fecha_idx'),
+            models.Index(fields=['tipo', 'referencia_id', 'fecha'], name='uso_regla_referencia_idx'),
+        ]
 
     def __str__(self):
-        return f"Orden {self.numero_orden} - {self.articulo.nombre}"
\ No newline at end of file
+        return f"{self.fecha} - {self.tipo} {self.referencia_id} - {self.veces_aplicada}"
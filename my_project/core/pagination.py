@@ -0,0 +1,66 @@
+"""
+Paginación de los catálogos de gran volumen.
+
+Por defecto se mantiene la paginación por número de página (compatible con los
+clientes actuales). Si la petición incluye ?cursor= o ?paginacion=cursor se usa
+paginación por clave (keyset) sobre el id: cada página es un
+WHERE id > ... ORDER BY id LIMIT n que usa la clave primaria, sin COUNT(*) ni
+OFFSET, y su costo no depende de la profundidad de la página.
+"""
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CursorPorIdPagination(CursorPagination):
+    """Paginación por clave sobre el id ascendente."""
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class CatalogoPagination(PageNumberPagination):
+    """Paginación por número de página, o por cursor si el cliente la pide."""
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def __init__(self):
+        self.por_cursor = None
+
+    @staticmethod
+    def usa_cursor(request):
+        return (
+            CursorPorIdPagination.cursor_query_param in request.query_params
+            or request.query_params.get('paginacion') == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.usa_cursor(request):
+            self.por_cursor = CursorPorIdPagination()
+            pagina = self.por_cursor.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.por_cursor.display_page_controls
+            return pagina
+        return super().paginate_queryset(queryset.order_by('id'), request, view)
+
+    def get_paginated_response(self, data):
+        if self.por_cursor is not None:
+            return self.por_cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.por_cursor is not None:
+            return self.por_cursor.to_html()
+        return super().to_html()
+
+    def get_schema_operation_parameters(self, view):
+        parametros = super().get_schema_operation_parameters(view)
+        nombres = {parametro['name'] for parametro in parametros}
+        return parametros + [
+            parametro
+            for parametro in CursorPorIdPagination().get_schema_operation_parameters(view)
+            if parametro['name'] not in nombres
+        ]
+
+
+class DiferenciasPagination(PageNumberPagination):
+    """Paginación por número de página de resultados calculados en memoria."""
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -1,11 +1,27 @@
+import json
+
 from rest_framework import serializers
 from .models import (
     Empresa, Sucursal, LineaArticulo, GrupoArticulo, Articulo,
-    ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto,
-    DetalleOrdenCompraCliente
+    ListaPrecio, PrecioArticulo, PrecioEfectivo, ReglaPrecio, CombinacionProducto,
+    DetalleOrdenCompraCliente, UsoReglaDiario
 )
 
 
+class CamposDinamicosMixin:
+    """
+    Serializa solo los campos indicados en la clave 'campos' del contexto
+    (parámetro ?fields= de las vistas con CamposParcialesMixin).
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = self.context.get('campos')
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
 class EmpresaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Empresa
@@ -46,7 +62,7 @@ class GrupoArticuloSerializer(serializers.ModelSerializer):
         return data
 
 
-class ArticuloSerializer(serializers.ModelSerializer):
+class ArticuloSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     empresa_nombre = serializers.CharField(source='empresa.nombre', read_only=True)
     grupo_nombre = serializers.CharField(source='grupo.nombre', read_only=True)
     linea_nombre = serializers.CharField(source='grupo.linea.nombre', read_only=True)
@@ -74,7 +90,7 @@ class ListaPrecioSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class PrecioArticuloSerializer(serializers.ModelSerializer):
+class PrecioArticuloSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     articulo_nombre = serializers.CharField(source='articulo.nombre', read_only=True)
     articulo_codigo = serializers.CharField(source='articulo.codigo', read_only=True)
     lista_precio_nombre = serializers.CharField(source='lista_precio.nombre', read_only=True)
@@ -90,6 +106,15 @@ class PrecioArticuloSerializer(serializers.ModelSerializer):
         return value
 
 
+class PrecioEfectivoSerializer(serializers.ModelSerializer):
+    articulo_nombre = serializers.CharField(source='articulo.nombre', read_only=True)
+    articulo_codigo = serializers.CharField(source='articulo.codigo', read_only=True)
+    
+    class Meta:
+        model = PrecioEfectivo
+        fields = '__all__'
+
+
 class ReglaPrecioSerializer(serializers.ModelSerializer):
     lista_precio_nombre = serializers.CharField(source='lista_precio.nombre', read_only=True)
     linea_nombre = serializers.CharField(source='linea_articulo.nombre', read_only=True, allow_null=True)
@@ -129,7 +154,7 @@ class CombinacionProductoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class DetalleOrdenCompraClienteSerializer(serializers.ModelSerializer):
+class DetalleOrdenCompraClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     empresa_nombre = serializers.CharField(source='empresa.nombre', read_only=True)
     sucursal_nombre = serializers.CharField(source='sucursal.nombre', read_only=True, allow_null=True)
     articulo_nombre = serializers.CharField(source='articulo.nombre', read_only=True)
@@ -139,6 +164,42 @@ class DetalleOrdenCompraClienteSerializer(serializers.ModelSerializer):
         model = DetalleOrdenCompraCliente
         fields = '__all__'
 
+    def validate_reglas_aplicadas(self, value):
+        """Acepta también el texto JSON que enviaban las integraciones antes del JSONField."""
+        if isinstance(value, str):
+            try:
+                return json.loads(value) if value.strip() else []
+            except ValueError:
+                raise serializers.ValidationError('reglas_aplicadas no es un JSON válido')
+        return value
+
+
+class UsoReglaDiarioSerializer(serializers.ModelSerializer):
+    sucursal_nombre = serializers.CharField(source='sucursal.nombre', read_only=True, allow_null=True)
+    
+    class Meta:
+        model = UsoReglaDiario
+        fields = '__all__'
+
+
+class UsoReglasFiltroSerializer(serializers.Serializer):
+    """Filtros del reporte de uso de reglas (parámetros de la URL)"""
+    empresa_id = serializers.IntegerField(required=False)
+    sucursal_id = serializers.IntegerField(required=False)
+    tipo = serializers.ChoiceField(choices=UsoReglaDiario.TIPO_CHOICES, required=False)
+    referencia_id = serializers.IntegerField(required=False)
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    agrupar = serializers.ChoiceField(
+        choices=['referencia', 'dia', 'sucursal'], default='referencia',
+        help_text='Agrupación del resumen además de tipo y referencia'
+    )
+
+    def validate(self, data):
+        if data.get('desde') and data.get('hasta') and data['desde'] > data['hasta']:
+            raise serializers.ValidationError('desde debe ser anterior o igual a hasta')
+        return data
+
 
 # Serializer especial para el cálculo de precios
 class CalculoPrecioRequestSerializer(serializers.Serializer):
@@ -159,6 +220,62 @@ class CalculoPrecioRequestSerializer(serializers.Serializer):
     )
 
 
+class ItemPedidoSerializer(serializers.Serializer):
+    """Serializer para una línea de pedido"""
+    articulo_id = serializers.IntegerField(required=True)
+    cantidad = serializers.IntegerField(required=True, min_value=1)
+
+
+class CalculoPrecioLoteRequestSerializer(serializers.Serializer):
+    """Serializer para la petición de cálculo de precios en lote"""
+    empresa_id = serializers.IntegerField(required=True)
+    sucursal_id = serializers.IntegerField(required=False, allow_null=True)
+    canal = serializers.ChoiceField(
+        choices=['TODOS', 'TIENDA', 'ONLINE', 'DISTRIBUIDOR', 'CORPORATIVO'],
+        default='TODOS'
+    )
+    monto_pedido_total = serializers.DecimalField(
+        max_digits=12, 
+        decimal_places=2, 
+        required=False,
+        allow_null=True,
+        min_value=0
+    )
+    items = ItemPedidoSerializer(many=True, allow_empty=False)
+
+
+class ConfirmarPedidoRequestSerializer(CalculoPrecioLoteRequestSerializer):
+    """Serializer para la confirmación de un pedido"""
+    numero_orden = serializers.CharField(max_length=50)
+
+
+class SimulacionReglasRequestSerializer(serializers.Serializer):
+    """Serializer para la petición de simulación de cambios de reglas"""
+    lista_precio_id = serializers.IntegerField(required=True)
+    reglas = serializers.ListField(
+        child=serializers.DictField(), default=list,
+        help_text='Reglas en borrador; las que incluyen id editan esa regla'
+    )
+    eliminar = serializers.ListField(child=serializers.IntegerField(), default=list)
+    canal = serializers.ChoiceField(
+        choices=['TODOS', 'TIENDA', 'ONLINE', 'DISTRIBUIDOR', 'CORPORATIVO'],
+        required=False,
+        allow_null=True
+    )
+    cantidad = serializers.IntegerField(default=1, min_value=1)
+    monto_pedido_total = serializers.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        min_value=0
+    )
+
+    def validate(self, data):
+        if not data['reglas'] and not data['eliminar']:
+            raise serializers.ValidationError('Indique al menos una regla en borrador o a eliminar')
+        return data
+
+
 class CalculoPrecioResponseSerializer(serializers.Serializer):
     """Serializer para la respuesta del cálculo de precio"""
     lista_precio_id = serializers.IntegerField(required=False)
@@ -0,0 +1,110 @@
+"""
+Caché de cotizaciones de PrecioService.calcular_precio.
+
+La clave es (lista, versión de la lista, artículo, si aplican las reglas por
+canal, bandas de cantidad y montos). La versión es la de la instantánea
+compilada (ListaPrecio.fecha_actualizacion), que las señales de core.signals
+actualizan al guardar o borrar precios, reglas, combinaciones o artículos (p.
+ej. su último costo): tras un cambio las claves viejas dejan de pedirse y salen
+de la caché por antigüedad. Las bandas son los tramos entre los límites de las
+reglas de la lista (IndiceReglas.bandas), así que cantidades y montos distintos
+que reciben las mismas reglas comparten entrada.
+
+La caché vive en memoria de cada proceso, igual que las listas compiladas: una
+cotización se calcula en microsegundos sin consultas, de modo que ir a una
+caché compartida por red costaría más que recalcularla.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+CAPACIDAD_POR_DEFECTO = 20000
+
+
+class CacheCotizaciones:
+    """Caché LRU con contadores de aciertos, fallos y desalojos."""
+
+    def __init__(self, capacidad):
+        self.capacidad = capacidad
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def obtener(self, clave, calcular):
+        """
+        Devuelve la cotización guardada o la calcula y la guarda.
+
+        Args:
+            clave: Clave de clave_cotizacion
+            calcular: Función sin argumentos que calcula la cotización
+
+        Returns:
+            dict con la cotización (copia superficial: los valores anidados son compartidos)
+        """
+        with self._lock:
+            resultado = self._entradas.get(clave)
+            if resultado is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return dict(resultado)
+            self.fallos += 1
+
+        resultado = calcular()
+        with self._lock:
+            self._entradas[clave] = resultado
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+        return dict(resultado)
+
+    def estadisticas(self):
+        """Contadores de este proceso desde el arranque o el último limpiar()."""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+                'entradas': len(self._entradas),
+                'capacidad': self.capacidad,
+            }
+
+    def limpiar(self):
+        """Vacía la caché y reinicia los contadores."""
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos = self.fallos = self.desalojos = 0
+
+
+cache_cotizaciones = CacheCotizaciones(
+    getattr(settings, 'PRECIOS_COTIZACIONES_MAX', CAPACIDAD_POR_DEFECTO)
+)
+
+
+def clave_cotizacion(lista_precio, articulo_id, canal, cantidad, monto_pedido_total):
+    """
+    Clave de una cotización sin combinaciones sobre una lista compilada.
+
+    Args:
+        lista_precio: ListaCompilada
+        articulo_id: ID del artículo
+        canal: Canal de venta
+        cantidad: Cantidad de unidades
+        monto_pedido_total: Monto total del pedido
+
+    Returns:
+        tuple
+    """
+    articulo = lista_precio.articulos.get(articulo_id)
+    # Mismo monto estimado que usa aplicar_reglas para ESCALA_MONTO
+    monto_articulo = cantidad * articulo.ultimo_costo if articulo is not None else None
+    canal_aplica = lista_precio.canal == canal or lista_precio.canal == 'TODOS'
+    return (lista_precio.id, lista_precio.version, articulo_id, canal_aplica) + (
+        lista_precio.indice_reglas.bandas(cantidad, monto_articulo, monto_pedido_total)
+    )
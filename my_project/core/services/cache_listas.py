@@ -0,0 +1,213 @@
+"""
+Caché de la resolución de la lista vigente por (empresa, sucursal, canal, fecha).
+
+Usa el backend de caché de Django configurado en settings.PRECIOS_CACHE
+(locmem por defecto, uno compartido como Redis para varios procesos). Cada
+empresa tiene un token de generación que forma parte de la clave: cambiar
+cualquier lista de la empresa reemplaza el token y deja obsoletas todas sus
+entradas sin tener que enumerarlas.
+
+El token solo llega a los demás procesos si la caché es compartida. Con una
+caché del proceso (locmem) cada entrada guarda además la versión de las listas
+de la empresa (version_listas: id y fecha_actualizacion de cada una) y se
+comprueba con una consulta en cada uso, así que un cambio hecho desde otro
+worker se ve en el siguiente cálculo. Con una caché compartida no hace falta:
+un acierto no consulta la base de datos.
+"""
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from core.models import ListaPrecio
+
+
+# Marca para guardar en caché "no hay lista vigente"
+SIN_LISTA = 'SIN_LISTA'
+
+
+class ContadorCache:
+    """
+    Aciertos y fallos de una caché del motor de precios en este proceso
+    (los exporta core.metricas). Sin lock: con varios hilos puede perderse
+    algún incremento, lo que no afecta a una tasa de aciertos.
+    """
+
+    __slots__ = ('aciertos', 'fallos')
+
+    def __init__(self):
+        self.aciertos = 0
+        self.fallos = 0
+
+    def estadisticas(self):
+        return {'aciertos': self.aciertos, 'fallos': self.fallos}
+
+
+# Resolución de la lista vigente (PrecioService.obtener_lista_vigente)
+contador_lista_vigente = ContadorCache()
+
+
+def obtener_cache():
+    """Backend de caché usado por el motor de precios."""
+    return caches[getattr(settings, 'PRECIOS_CACHE', 'default')]
+
+
+def cache_compartida():
+    """
+    Si todos los procesos ven la misma caché de precios. Se toma de
+    settings.PRECIOS_CACHE_COMPARTIDA o, si no está definido, del backend.
+    """
+    compartida = getattr(settings, 'PRECIOS_CACHE_COMPARTIDA', None)
+    if compartida is None:
+        return not isinstance(obtener_cache(), (LocMemCache, DummyCache))
+    return compartida
+
+
+def _consulta_version(empresa_id):
+    return ListaPrecio.objects.filter(empresa_id=empresa_id).order_by('id').values_list(
+        'id', 'fecha_actualizacion'
+    )
+
+
+def version_listas(empresa_id):
+    """
+    Versión de las listas de una empresa para validar una entrada de la caché
+    local; None si la caché es compartida.
+
+    Cualquier alta, baja o cambio de una lista (o de sus precios, reglas y
+    combinaciones, que actualizan fecha_actualizacion) cambia la versión.
+
+    Returns:
+        tuple de (id, fecha_actualizacion) o None
+    """
+    if cache_compartida():
+        return None
+    return tuple(_consulta_version(empresa_id))
+
+
+async def aversion_listas(empresa_id):
+    """Versión asíncrona de version_listas."""
+    if cache_compartida():
+        return None
+    return tuple([fila async for fila in _consulta_version(empresa_id)])
+
+
+def _clave_generacion(empresa_id):
+    return f'precios:generacion:{empresa_id}'
+
+
+def generacion_empresa(empresa_id):
+    """Token de generación vigente de una empresa (se crea si no existe)."""
+    cache = obtener_cache()
+    clave = _clave_generacion(empresa_id)
+    generacion = cache.get(clave)
+    if generacion is None:
+        cache.add(clave, uuid.uuid4().hex, None)
+        generacion = cache.get(clave)
+    return generacion
+
+
+async def aleer_cache(clave):
+    """
+    Lectura asíncrona de la caché de precios. Los backends en memoria del
+    proceso (locmem) no hacen E/S y se leen directamente, sin pasar a un hilo.
+    """
+    cache = obtener_cache()
+    if isinstance(cache, LocMemCache):
+        return cache.get(clave)
+    return await cache.aget(clave)
+
+
+async def aescribir_cache(clave, valor, timeout=DEFAULT_TIMEOUT, solo_si_no_existe=False):
+    """Escritura asíncrona de la caché de precios (ver aleer_cache)."""
+    cache = obtener_cache()
+    metodo = 'add' if solo_si_no_existe else 'set'
+    if isinstance(cache, LocMemCache):
+        getattr(cache, metodo)(clave, valor, timeout)
+    else:
+        await getattr(cache, f'a{metodo}')(clave, valor, timeout)
+
+
+async def ageneracion_empresa(empresa_id):
+    """Versión asíncrona de generacion_empresa."""
+    clave = _clave_generacion(empresa_id)
+    generacion = await aleer_cache(clave)
+    if generacion is None:
+        await aescribir_cache(clave, uuid.uuid4().hex, None, solo_si_no_existe=True)
+        generacion = await aleer_cache(clave)
+    return generacion
+
+
+def invalidar_empresa(empresa_id):
+    """Deja obsoletas todas las resoluciones de lista vigente de una empresa."""
+    obtener_cache().set(_clave_generacion(empresa_id), uuid.uuid4().hex, None)
+
+
+def clave_lista_vigente(empresa_id, sucursal_id, canal, fecha):
+    generacion = generacion_empresa(empresa_id)
+    return _clave_lista_vigente(empresa_id, generacion, sucursal_id, canal, fecha)
+
+
+async def aclave_lista_vigente(empresa_id, sucursal_id, canal, fecha):
+    generacion = await ageneracion_empresa(empresa_id)
+    return _clave_lista_vigente(empresa_id, generacion, sucursal_id, canal, fecha)
+
+
+def _clave_lista_vigente(empresa_id, generacion, sucursal_id, canal, fecha):
+    return f'precios:lista_vigente:{empresa_id}:{generacion}:{sucursal_id or 0}:{canal}:{fecha.isoformat()}'
+
+
+def segundos_hasta_proximo_limite(empresa_id, sucursal_id, canal, fecha):
+    """
+    Segundos hasta la próxima fecha en la que puede cambiar la lista vigente:
+    el siguiente fecha_inicio o el día posterior al siguiente fecha_fin de las
+    listas candidatas. Devuelve None si no hay un límite futuro.
+    """
+    limites = _consulta_limites(empresa_id, sucursal_id, canal, fecha)
+    return _segundos_hasta(limites.aggregate(**_agregados_limites(fecha)))
+
+
+async def asegundos_hasta_proximo_limite(empresa_id, sucursal_id, canal, fecha):
+    """Versión asíncrona de segundos_hasta_proximo_limite."""
+    limites = _consulta_limites(empresa_id, sucursal_id, canal, fecha)
+    return _segundos_hasta(await limites.aaggregate(**_agregados_limites(fecha)))
+
+
+def _consulta_limites(empresa_id, sucursal_id, canal, fecha):
+    sucursales = Q(sucursal__isnull=True)
+    if sucursal_id:
+        sucursales |= Q(sucursal_id=sucursal_id)
+
+    return ListaPrecio.objects.filter(
+        sucursales,
+        empresa_id=empresa_id,
+        activo=True,
+        canal__in=[canal, 'TODOS']
+    )
+
+
+def _agregados_limites(fecha):
+    return {
+        'proximo_inicio': Min('fecha_inicio', filter=Q(fecha_inicio__gt=fecha)),
+        'proximo_fin': Min('fecha_fin', filter=Q(fecha_fin__gte=fecha)),
+    }
+
+
+def _segundos_hasta(limites):
+    candidatos = []
+    if limites['proximo_inicio']:
+        candidatos.append(limites['proximo_inicio'])
+    if limites['proximo_fin']:
+        candidatos.append(limites['proximo_fin'] + timedelta(days=1))
+    if not candidatos:
+        return None
+
+    limite = timezone.make_aware(datetime.combine(min(candidatos), time.min))
+    segundos = int((limite - timezone.now()).total_seconds())
+    return segundos if segundos > 0 else None
@@ -0,0 +1,82 @@
+"""
+Exportación de listas de precios completas en CSV y JSON-lines.
+
+Las filas se leen con un cursor del servidor (QuerySet.iterator) y se generan
+de a una, así que la memoria usada no depende del tamaño de la lista.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import PrecioArticulo
+
+
+CAMPOS_EXPORTACION = [
+    'articulo_id',
+    'articulo_codigo',
+    'articulo_nombre',
+    'precio_base',
+    'bajo_costo',
+    'descuento_proveedor',
+    'autorizado_por',
+    'fecha_autorizacion',
+    'fecha_actualizacion',
+]
+
+FORMATOS_EXPORTACION = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+TAMANO_BLOQUE = 2000
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo que se escribe en él (para csv.writer)."""
+
+    def write(self, valor):
+        return valor
+
+
+def filas_lista(lista_precio_id, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Itera los precios de una lista como diccionarios, leyendo por bloques.
+
+    Args:
+        lista_precio_id: ID de la lista
+        tamano_bloque: Filas por lectura del cursor
+
+    Yields:
+        dict con las claves de CAMPOS_EXPORTACION
+    """
+    filas = PrecioArticulo.objects.filter(
+        lista_precio_id=lista_precio_id
+    ).order_by('articulo_id').values_list(
+        'articulo_id', 'articulo__codigo', 'articulo__nombre', 'precio_base',
+        'bajo_costo', 'descuento_proveedor', 'autorizado_por',
+        'fecha_autorizacion', 'fecha_actualizacion',
+    ).iterator(chunk_size=tamano_bloque)
+
+    for fila in filas:
+        yield dict(zip(CAMPOS_EXPORTACION, fila))
+
+
+def exportar_csv(lista_precio_id, tamano_bloque=TAMANO_BLOQUE):
+    """Genera la lista como líneas CSV, empezando por la cabecera."""
+    writer = csv.writer(_Eco())
+    yield writer.writerow(CAMPOS_EXPORTACION)
+    for fila in filas_lista(lista_precio_id, tamano_bloque):
+        yield writer.writerow([fila[campo] for campo in CAMPOS_EXPORTACION])
+
+
+def exportar_ndjson(lista_precio_id, tamano_bloque=TAMANO_BLOQUE):
+    """Genera la lista como un objeto JSON por línea."""
+    for fila in filas_lista(lista_precio_id, tamano_bloque):
+        yield json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+EXPORTADORES = {
+    'csv': exportar_csv,
+    'ndjson': exportar_ndjson,
+}
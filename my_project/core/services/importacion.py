@@ -0,0 +1,238 @@
+"""
+Importación masiva de precios de artículos a una lista desde CSV o XLSX.
+
+El archivo se lee como un flujo de filas; los códigos de artículo se resuelven
+por lotes y cada lote se inserta o actualiza con un único
+INSERT ... ON CONFLICT (bulk_create con update_conflicts) sobre la clave única
+(lista_precio, articulo). Todo el proceso corre en una transacción.
+"""
+import csv
+import io
+import time
+import zipfile
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Articulo, ListaPrecio, PrecioArticulo
+from core.services.materializacion import marcar_desactualizados
+from core.signals import tocar_listas
+
+
+TAMANO_LOTE = 5000
+
+# Columnas obligatorias: articulo_codigo y precio_base.
+# Opcionales: descuento_proveedor, bajo_costo, autorizado_por.
+COLUMNA_CODIGO = 'articulo_codigo'
+
+CAMPOS_ACTUALIZADOS = [
+    'precio_base', 'descuento_proveedor', 'bajo_costo', 'autorizado_por', 'fecha_actualizacion'
+]
+
+VALORES_VERDADEROS = {'1', 'true', 'verdadero', 'si', 'sí', 'x'}
+
+
+class ErrorImportacion(Exception):
+    """Error que impide procesar el archivo completo."""
+
+
+def _maximo(campo):
+    """Mayor valor que admite un DecimalField de PrecioArticulo."""
+    campo = PrecioArticulo._meta.get_field(campo)
+    return Decimal(10) ** (campo.max_digits - campo.decimal_places) - Decimal(1).scaleb(-campo.decimal_places)
+
+
+PRECIO_MAXIMO = _maximo('precio_base')
+DESCUENTO_MAXIMO = min(Decimal(100), _maximo('descuento_proveedor'))
+
+
+def leer_csv(archivo, delimitador=','):
+    """
+    Itera las filas de un CSV como diccionarios.
+
+    Args:
+        archivo: Archivo binario o de texto
+        delimitador: Separador de columnas
+
+    Yields:
+        dict {columna: valor}
+    """
+    if isinstance(archivo, io.TextIOBase):
+        texto = archivo
+    else:
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.DictReader(texto, delimiter=delimitador)
+    except UnicodeDecodeError:
+        raise ErrorImportacion('El CSV debe estar codificado en UTF-8')
+    except csv.Error as error:
+        raise ErrorImportacion(f'CSV inválido: {error}')
+
+
+def leer_xlsx(archivo):
+    """
+    Itera las filas de la primera hoja de un XLSX como diccionarios.
+    Requiere openpyxl.
+    """
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ErrorImportacion('Para importar archivos XLSX instale openpyxl')
+
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        # KeyError: un ZIP válido al que le faltan las partes de un XLSX
+        raise ErrorImportacion('El archivo no es un XLSX válido')
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        cabecera = [str(columna).strip() if columna is not None else '' for columna in next(filas, [])]
+        for fila in filas:
+            yield {
+                columna: ('' if valor is None else str(valor))
+                for columna, valor in zip(cabecera, fila)
+            }
+    finally:
+        libro.close()
+
+
+LECTORES = {
+    'csv': leer_csv,
+    'xlsx': leer_xlsx,
+}
+
+
+def _decimal(valor, campo, minimo=None, maximo=None):
+    try:
+        numero = Decimal(str(valor).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f'{campo} no es un número válido: {valor!r}')
+    if not numero.is_finite():
+        raise ValueError(f'{campo} no es un número válido: {valor!r}')
+    if minimo is not None and numero < minimo:
+        raise ValueError(f'{campo} no puede ser menor que {minimo}')
+    if maximo is not None and numero > maximo:
+        raise ValueError(f'{campo} no puede ser mayor que {maximo}')
+    return numero.quantize(Decimal('0.01'))
+
+
+def _parsear_fila(fila):
+    """Valida una fila y devuelve (codigo, valores) o lanza ValueError."""
+    codigo = (fila.get(COLUMNA_CODIGO) or '').strip()
+    if not codigo:
+        raise ValueError('Falta el código de artículo')
+    if not (fila.get('precio_base') or '').strip():
+        raise ValueError('Falta el precio base')
+
+    valores = {
+        'precio_base': _decimal(fila['precio_base'], 'precio_base', minimo=0, maximo=PRECIO_MAXIMO),
+        'descuento_proveedor': Decimal('0.00'),
+        'bajo_costo': False,
+        'autorizado_por': '',
+    }
+    if (fila.get('descuento_proveedor') or '').strip():
+        valores['descuento_proveedor'] = _decimal(
+            fila['descuento_proveedor'], 'descuento_proveedor', minimo=0, maximo=DESCUENTO_MAXIMO
+        )
+    if fila.get('bajo_costo') is not None:
+        valores['bajo_costo'] = fila['bajo_costo'].strip().lower() in VALORES_VERDADEROS
+    if fila.get('autorizado_por') is not None:
+        valores['autorizado_por'] = fila['autorizado_por'].strip()[:200]
+    return codigo, valores
+
+
+def importar_precios(lista_precio, filas, tamano_lote=TAMANO_LOTE):
+    """
+    Inserta o actualiza los precios de una lista a partir de filas ya leídas.
+
+    Args:
+        lista_precio: Instancia de ListaPrecio
+        filas: Iterable de dict con articulo_codigo, precio_base y columnas opcionales
+        tamano_lote: Filas por consulta de artículos y por INSERT
+
+    Returns:
+        dict con filas_leidas, filas_importadas, rechazadas ([{fila, motivo}]),
+        segundos y filas_por_segundo
+    """
+    if tamano_lote < 1:
+        raise ErrorImportacion('El tamaño de lote debe ser mayor que cero')
+
+    inicio = time.perf_counter()
+    resumen = {'filas_leidas': 0, 'filas_importadas': 0, 'rechazadas': []}
+    vistos = set()
+
+    def procesar(lote):
+        codigos = {codigo for _, codigo, _ in lote}
+        ids = dict(
+            Articulo.objects.filter(
+                empresa_id=lista_precio.empresa_id,
+                codigo__in=codigos
+            ).values_list('codigo', 'id')
+        )
+        ahora = timezone.now()
+        precios = []
+        for numero_fila, codigo, valores in lote:
+            articulo_id = ids.get(codigo)
+            if articulo_id is None:
+                resumen['rechazadas'].append({
+                    'fila': numero_fila,
+                    'motivo': f'Artículo {codigo} no existe en la empresa'
+                })
+                continue
+            if articulo_id in vistos:
+                resumen['rechazadas'].append({
+                    'fila': numero_fila,
+                    'motivo': f'Artículo {codigo} repetido en el archivo'
+                })
+                continue
+            vistos.add(articulo_id)
+            precios.append(PrecioArticulo(
+                lista_precio_id=lista_precio.id,
+                articulo_id=articulo_id,
+                fecha_actualizacion=ahora,
+                **valores
+            ))
+
+        PrecioArticulo.objects.bulk_create(
+            precios,
+            update_conflicts=True,
+            unique_fields=['lista_precio', 'articulo'],
+            update_fields=CAMPOS_ACTUALIZADOS,
+        )
+        resumen['filas_importadas'] += len(precios)
+
+    with transaction.atomic():
+        lote = []
+        # La fila 1 es la cabecera
+        for numero_fila, fila in enumerate(filas, start=2):
+            if numero_fila == 2:
+                faltantes = {COLUMNA_CODIGO, 'precio_base'} - set(fila)
+                if faltantes:
+                    raise ErrorImportacion(
+                        f'Faltan columnas obligatorias: {", ".join(sorted(faltantes))}'
+                    )
+            resumen['filas_leidas'] += 1
+            try:
+                codigo, valores = _parsear_fila(fila)
+            except ValueError as error:
+                resumen['rechazadas'].append({'fila': numero_fila, 'motivo': str(error)})
+                continue
+            lote.append((numero_fila, codigo, valores))
+            if len(lote) >= tamano_lote:
+                procesar(lote)
+                lote = []
+        if lote:
+            procesar(lote)
+
+        # bulk_create no emite señales: invalidar la lista compilada y los
+        # precios efectivos a mano
+        tocar_listas(ListaPrecio.objects.filter(id=lista_precio.id))
+        marcar_desactualizados([lista_precio.id])
+
+    resumen['rechazadas'].sort(key=lambda rechazo: rechazo['fila'])
+    segundos = time.perf_counter() - inicio
+    resumen['segundos'] = round(segundos, 3)
+    resumen['filas_por_segundo'] = round(resumen['filas_leidas'] / segundos, 1) if segundos else 0
+    return resumen
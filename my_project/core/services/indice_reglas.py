@@ -0,0 +1,178 @@
+"""
+Índice de reglas de precio de una lista compilada.
+
+Las reglas se agrupan por (tipo_regla, linea, grupo) y, dentro de cada grupo,
+los rangos de cantidad o monto se guardan como intervalos ordenados: para cada
+tramo entre dos límites consecutivos se precalcula qué reglas lo cubren. Buscar
+las reglas de una cantidad es entonces una búsqueda binaria en lugar de
+recorrer todas las reglas de la lista.
+"""
+from bisect import bisect_right
+from heapq import merge
+
+
+# Campos de rango que usa cada tipo de regla
+RANGOS_POR_TIPO = {
+    'ESCALA_UNIDADES': ('cantidad_minima', 'cantidad_maxima'),
+    'ESCALA_MONTO': ('monto_minimo', 'monto_maximo'),
+    'MONTO_PEDIDO': ('monto_minimo', 'monto_maximo'),
+}
+
+# Marcas de los límites: un mínimo cuenta desde su propio valor,
+# un máximo deja de contar a partir del valor siguiente.
+_INICIO = 0
+_FIN = 1
+
+
+def _orden_regla(regla):
+    return (regla.prioridad, regla.id)
+
+
+class IndiceIntervalos:
+    """
+    Conjunto de reglas con rango [mínimo, máximo] (ambos inclusive, None = sin límite)
+    que responde en O(log n) qué reglas contienen un valor.
+    """
+
+    __slots__ = ('limites', 'tramos')
+
+    def __init__(self, reglas, campo_minimo, campo_maximo):
+        eventos = []
+        activas = set()
+        for regla in reglas:
+            minimo = getattr(regla, campo_minimo)
+            maximo = getattr(regla, campo_maximo)
+            if minimo is not None and maximo is not None and minimo > maximo:
+                # Rango vacío: la regla nunca aplica
+                continue
+            if minimo is None:
+                activas.add(regla)
+            else:
+                eventos.append(((minimo, _INICIO), regla))
+            if maximo is not None:
+                eventos.append(((maximo, _FIN), regla))
+        eventos.sort(key=lambda evento: evento[0])
+
+        # tramos[i]: reglas activas después de los primeros i límites,
+        # ordenadas por prioridad.
+        limites = []
+        tramos = [tuple(sorted(activas, key=_orden_regla))]
+        for limite, regla in eventos:
+            if limite[1] == _INICIO:
+                activas.add(regla)
+            else:
+                activas.discard(regla)
+            limites.append(limite)
+            tramos.append(tuple(sorted(activas, key=_orden_regla)))
+
+        self.limites = limites
+        self.tramos = tramos
+
+    def buscar(self, valor):
+        """Reglas cuyo rango contiene valor, ordenadas por prioridad."""
+        return self.tramos[bisect_right(self.limites, (valor, _INICIO))]
+
+
+class IndiceReglas:
+    """Índice de las reglas activas de una lista, por tipo, línea y grupo."""
+
+    __slots__ = ('indices', 'limites')
+
+    def __init__(self, reglas):
+        cubetas = {}
+        for regla in reglas:
+            for clave in self._claves_de_regla(regla):
+                cubetas.setdefault(clave, []).append(regla)
+
+        indices = {}
+        limites = {tipo_regla: set() for tipo_regla in RANGOS_POR_TIPO}
+        for clave, reglas_cubeta in cubetas.items():
+            tipo_regla = clave[0]
+            if tipo_regla in RANGOS_POR_TIPO:
+                indices[clave] = IndiceIntervalos(reglas_cubeta, *RANGOS_POR_TIPO[tipo_regla])
+                limites[tipo_regla].update(indices[clave].limites)
+            else:
+                indices[clave] = tuple(sorted(reglas_cubeta, key=_orden_regla))
+        self.indices = indices
+        # Todos los límites de cada tipo de rango, de todas las cubetas
+        self.limites = {tipo_regla: sorted(valores) for tipo_regla, valores in limites.items()}
+
+    @staticmethod
+    def _claves_de_regla(regla):
+        """
+        Una regla con línea y grupo aplica si coincide cualquiera de los dos,
+        por eso se indexa una vez por cada filtro.
+        """
+        if not regla.linea_articulo_id and not regla.grupo_articulo_id:
+            return [(regla.tipo_regla, None, None)]
+        claves = []
+        if regla.linea_articulo_id:
+            claves.append((regla.tipo_regla, regla.linea_articulo_id, None))
+        if regla.grupo_articulo_id:
+            claves.append((regla.tipo_regla, None, regla.grupo_articulo_id))
+        return claves
+
+    def bandas(self, cantidad, monto_articulo, monto_pedido_total):
+        """
+        Tramo de cada valor entre los límites de todas las reglas de su tipo.
+        Dos cotizaciones con las mismas bandas (y el mismo artículo y canal)
+        reciben exactamente las mismas reglas.
+
+        Returns:
+            tuple (banda de cantidad, de monto del artículo, de monto del pedido)
+        """
+        valores = (
+            ('ESCALA_UNIDADES', cantidad),
+            ('ESCALA_MONTO', monto_articulo),
+            ('MONTO_PEDIDO', monto_pedido_total),
+        )
+        return tuple(
+            bisect_right(self.limites[tipo_regla], (valor, _INICIO)) if valor is not None else None
+            for tipo_regla, valor in valores
+        )
+
+    def buscar(self, grupo_id, linea_id, cantidad, monto_articulo, monto_pedido_total, canal_aplica):
+        """
+        Devuelve las reglas que aplican a un artículo, en orden de prioridad.
+
+        Args:
+            grupo_id: ID del grupo del artículo
+            linea_id: ID de la línea del artículo
+            cantidad: Cantidad de unidades
+            monto_articulo: Monto estimado de la línea (cantidad * último costo)
+            monto_pedido_total: Monto total del pedido
+            canal_aplica: Si las reglas por canal aplican al canal solicitado
+
+        Returns:
+            list de reglas (ReglaCompilada)
+        """
+        valores = {
+            'ESCALA_UNIDADES': cantidad,
+            'ESCALA_MONTO': monto_articulo,
+            'MONTO_PEDIDO': monto_pedido_total,
+        }
+        tipos = list(valores)
+        if canal_aplica:
+            tipos.append('CANAL')
+
+        candidatas = []
+        for tipo_regla in tipos:
+            for clave in ((tipo_regla, None, None), (tipo_regla, linea_id, None), (tipo_regla, None, grupo_id)):
+                indice = self.indices.get(clave)
+                if indice is None:
+                    continue
+                if tipo_regla in valores:
+                    indice = indice.buscar(valores[tipo_regla])
+                if indice:
+                    candidatas.append(indice)
+
+        if len(candidatas) == 1:
+            return list(candidatas[0])
+
+        reglas = []
+        vistas = set()
+        for regla in merge(*candidatas, key=_orden_regla):
+            if regla.id not in vistas:
+                vistas.add(regla.id)
+                reglas.append(regla)
+        return reglas
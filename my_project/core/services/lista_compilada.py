@@ -0,0 +1,217 @@
+"""
+Lista de precios compilada: una instantánea inmutable en memoria de todo lo que
+necesita el motor de precios para cotizar contra una ListaPrecio (precios base,
+reglas activas, combinaciones y la jerarquía artículo → grupo → línea).
+
+La instantánea se identifica por (lista.id, lista.fecha_actualizacion). Las
+señales de core.signals actualizan fecha_actualizacion de la lista cuando cambia
+alguno de sus datos, de modo que cualquier proceso detecta la nueva versión con
+la misma consulta que ya hace para resolver la lista vigente.
+"""
+import asyncio
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from core.models import PrecioArticulo, ReglaPrecio, CombinacionProducto
+from core.services.cache_listas import ContadorCache
+from core.services.indice_reglas import IndiceReglas
+
+
+ArticuloCompilado = namedtuple(
+    'ArticuloCompilado',
+    ['id', 'codigo', 'nombre', 'ultimo_costo', 'grupo_id', 'linea_id']
+)
+
+PrecioCompilado = namedtuple(
+    'PrecioCompilado',
+    ['precio_base', 'bajo_costo', 'descuento_proveedor', 'autorizado_por']
+)
+
+ReglaCompilada = namedtuple(
+    'ReglaCompilada',
+    [
+        'id', 'nombre', 'tipo_regla', 'tipo_ajuste',
+        'linea_articulo_id', 'grupo_articulo_id',
+        'cantidad_minima', 'cantidad_maxima', 'monto_minimo', 'monto_maximo',
+        'valor_ajuste', 'prioridad',
+    ]
+)
+
+CombinacionCompilada = namedtuple(
+    'CombinacionCompilada',
+    [
+        'id', 'nombre', 'linea_articulo_id', 'grupo_articulo_id', 'articulos',
+        'cantidad_minima', 'tipo_descuento', 'valor_descuento',
+    ]
+)
+
+
+class ListaCompilada:
+    """Instantánea inmutable de una lista de precios lista para cotizar sin consultas."""
+
+    __slots__ = (
+        'id', 'nombre', 'canal', 'empresa_id', 'version',
+        'precios', 'articulos', 'reglas', 'indice_reglas', 'combinaciones',
+    )
+
+    def __init__(self, lista_precio, precios, articulos, reglas, combinaciones):
+        object.__setattr__(self, 'id', lista_precio.id)
+        object.__setattr__(self, 'nombre', lista_precio.nombre)
+        object.__setattr__(self, 'canal', lista_precio.canal)
+        object.__setattr__(self, 'empresa_id', lista_precio.empresa_id)
+        object.__setattr__(self, 'version', lista_precio.fecha_actualizacion)
+        object.__setattr__(self, 'precios', MappingProxyType(precios))
+        object.__setattr__(self, 'articulos', MappingProxyType(articulos))
+        object.__setattr__(self, 'reglas', tuple(reglas))
+        object.__setattr__(self, 'indice_reglas', IndiceReglas(self.reglas))
+        object.__setattr__(self, 'combinaciones', tuple(combinaciones))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ListaCompilada es inmutable')
+
+    def __repr__(self):
+        return f"<ListaCompilada {self.id} ({len(self.precios)} precios, {len(self.reglas)} reglas)>"
+
+    @classmethod
+    def compilar(cls, lista_precio):
+        """
+        Carga desde la base de datos todos los datos de la lista.
+
+        Args:
+            lista_precio: Instancia de ListaPrecio
+
+        Returns:
+            ListaCompilada
+        """
+        precios, reglas, combinaciones = cls._consultas(lista_precio.id)
+        return cls._armar(lista_precio, list(precios), list(reglas), list(combinaciones))
+
+    @classmethod
+    async def acompilar(cls, lista_precio):
+        """
+        Versión asíncrona de compilar: las consultas de precios, reglas y
+        combinaciones se lanzan a la vez con asyncio.gather.
+        """
+        precios, reglas, combinaciones = await asyncio.gather(
+            *(_alista(consulta) for consulta in cls._consultas(lista_precio.id))
+        )
+        return cls._armar(lista_precio, precios, reglas, combinaciones)
+
+    @staticmethod
+    def _consultas(lista_id):
+        """QuerySets independientes con los precios, reglas y combinaciones de la lista."""
+        precios = PrecioArticulo.objects.filter(lista_precio_id=lista_id).values_list(
+            'articulo_id', 'precio_base', 'bajo_costo', 'descuento_proveedor', 'autorizado_por',
+            'articulo__codigo', 'articulo__nombre', 'articulo__ultimo_costo',
+            'articulo__grupo_id', 'articulo__grupo__linea_id',
+        )
+        reglas = ReglaPrecio.objects.filter(
+            lista_precio_id=lista_id,
+            activo=True
+        ).order_by('prioridad', 'id').values(*ReglaCompilada._fields)
+        combinaciones = CombinacionProducto.objects.filter(
+            lista_precio_id=lista_id,
+            activo=True
+        ).order_by('id').prefetch_related('articulos')
+        return precios, reglas, combinaciones
+
+    @classmethod
+    def _armar(cls, lista_precio, filas_precios, filas_reglas, combinaciones):
+        precios = {}
+        articulos = {}
+        for (articulo_id, precio_base, bajo_costo, descuento_proveedor, autorizado_por,
+             codigo, nombre, ultimo_costo, grupo_id, linea_id) in filas_precios:
+            precios[articulo_id] = PrecioCompilado(
+                precio_base, bajo_costo, descuento_proveedor, autorizado_por
+            )
+            articulos[articulo_id] = ArticuloCompilado(
+                articulo_id, codigo, nombre, ultimo_costo, grupo_id, linea_id
+            )
+
+        reglas = [ReglaCompilada(**fila) for fila in filas_reglas]
+
+        combinaciones = [
+            CombinacionCompilada(
+                id=combinacion.id,
+                nombre=combinacion.nombre,
+                linea_articulo_id=combinacion.linea_articulo_id,
+                grupo_articulo_id=combinacion.grupo_articulo_id,
+                articulos=frozenset(articulo.id for articulo in combinacion.articulos.all()),
+                cantidad_minima=combinacion.cantidad_minima,
+                tipo_descuento=combinacion.tipo_descuento,
+                valor_descuento=combinacion.valor_descuento,
+            )
+            for combinacion in combinaciones
+        ]
+
+        return cls(lista_precio, precios, articulos, reglas, combinaciones)
+
+
+async def _alista(queryset):
+    return [fila async for fila in queryset]
+
+
+_compiladas = {}
+_lock = threading.Lock()
+contador_compiladas = ContadorCache()
+
+
+def obtener_lista_compilada(lista_precio):
+    """
+    Devuelve la instantánea compilada de una lista, compilándola si no existe
+    o si la lista cambió desde la última compilación.
+
+    Args:
+        lista_precio: Instancia de ListaPrecio (o ListaCompilada)
+
+    Returns:
+        ListaCompilada
+    """
+    compilada = _vigente(lista_precio)
+    if compilada is None:
+        contador_compiladas.fallos += 1
+        compilada = _guardar(ListaCompilada.compilar(lista_precio))
+    return compilada
+
+
+async def aobtener_lista_compilada(lista_precio):
+    """Versión asíncrona de obtener_lista_compilada."""
+    compilada = _vigente(lista_precio)
+    if compilada is None:
+        contador_compiladas.fallos += 1
+        compilada = _guardar(await ListaCompilada.acompilar(lista_precio))
+    return compilada
+
+
+def _vigente(lista_precio):
+    """Instantánea ya compilada y al día de la lista, o None."""
+    if isinstance(lista_precio, ListaCompilada):
+        return lista_precio
+    compilada = _compiladas.get(lista_precio.id)
+    if compilada is not None and compilada.version == lista_precio.fecha_actualizacion:
+        contador_compiladas.aciertos += 1
+        return compilada
+    return None
+
+
+def _guardar(compilada):
+    with _lock:
+        actual = _compiladas.get(compilada.id)
+        if actual is None or actual.version is None or (
+            compilada.version is not None and compilada.version >= actual.version
+        ):
+            _compiladas[compilada.id] = compilada
+    return compilada
+
+
+def invalidar_lista(lista_id):
+    """Descarta la instantánea compilada de una lista en este proceso."""
+    with _lock:
+        _compiladas.pop(lista_id, None)
+
+
+def invalidar_todas():
+    """Descarta todas las instantáneas compiladas de este proceso."""
+    with _lock:
+        _compiladas.clear()
@@ -0,0 +1,185 @@
+"""
+Materialización de precios efectivos (tabla PrecioEfectivo).
+
+Recorre los precios de una lista con el motor de precios sobre la instantánea
+compilada (cantidad 1, sin combinaciones ni monto de pedido) y guarda el
+resultado por lotes con INSERT ... ON CONFLICT. Las señales de core.signals
+marcan como desactualizadas las filas afectadas por un cambio; el comando
+materializar_precios recalcula solo esas filas y las que aún no existen.
+
+Un cambio que llega mientras se materializa (después de compilar la
+instantánea) marcaría filas que el INSERT vuelve a dejar al día con precios
+viejos. Como esos cambios también actualizan ListaPrecio.fecha_actualizacion,
+al terminar se compara con la versión de la instantánea y, si cambió, las
+filas escritas quedan otra vez pendientes.
+"""
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef, Q
+
+from core.models import ListaPrecio, PrecioArticulo, PrecioEfectivo
+from core.services.lista_compilada import obtener_lista_compilada
+from core.services.precio_service import PrecioService
+
+
+TAMANO_LOTE = 5000
+
+CAMPOS_ACTUALIZADOS = [
+    'precio_base', 'precio_final', 'porcentaje_descuento', 'bajo_costo',
+    'es_valido', 'desactualizado', 'fecha_calculo',
+]
+
+
+def _precio_efectivo(compilada, articulo_id):
+    """Calcula el PrecioEfectivo de un artículo o None si no tiene precio en la lista."""
+    resultado = PrecioService._calcular_en_lista(
+        compilada, articulo_id, compilada.canal, 1, Decimal('0'), []
+    )
+    if resultado.get('error'):
+        return None
+    return PrecioEfectivo(
+        lista_precio_id=compilada.id,
+        articulo_id=articulo_id,
+        precio_base=Decimal(str(resultado['precio_base'])),
+        precio_final=Decimal(str(resultado['precio_final'])).quantize(Decimal('0.000001')),
+        porcentaje_descuento=Decimal(str(resultado['porcentaje_descuento'])),
+        bajo_costo=resultado['bajo_costo'],
+        es_valido=resultado['validacion']['es_valido'],
+        desactualizado=False,
+    )
+
+
+def materializar_lista(lista_precio, articulo_ids=None, tamano_lote=TAMANO_LOTE):
+    """
+    Calcula y guarda los precios efectivos de una lista.
+
+    Args:
+        lista_precio: Instancia de ListaPrecio (se usa su instantánea compilada)
+        articulo_ids: IDs a recalcular; None recalcula la lista completa
+        tamano_lote: Filas por INSERT
+
+    Returns:
+        int con la cantidad de filas escritas
+    """
+    # La instancia puede ser anterior a cambios ya guardados
+    lista_precio.fecha_actualizacion = _version(lista_precio.id)
+    compilada = obtener_lista_compilada(lista_precio)
+    if articulo_ids is None:
+        articulo_ids = compilada.precios.keys()
+        # Recalculo completo: borrar lo que ya no tiene precio en la lista
+        PrecioEfectivo.objects.filter(lista_precio_id=compilada.id).exclude(
+            articulo_id__in=PrecioArticulo.objects.filter(
+                lista_precio_id=compilada.id
+            ).values('articulo_id')
+        ).delete()
+
+    escritos = []
+    lote = []
+    for articulo_id in articulo_ids:
+        precio = _precio_efectivo(compilada, articulo_id)
+        if precio is not None:
+            lote.append(precio)
+        if len(lote) >= tamano_lote:
+            escritos.extend(_guardar(lote))
+            lote = []
+    if lote:
+        escritos.extend(_guardar(lote))
+
+    if _version(compilada.id) != compilada.version:
+        for inicio in range(0, len(escritos), tamano_lote):
+            marcar_desactualizados(
+                [compilada.id], articulo_ids=escritos[inicio:inicio + tamano_lote]
+            )
+    return len(escritos)
+
+
+def _version(lista_id):
+    return ListaPrecio.objects.filter(pk=lista_id).values_list(
+        'fecha_actualizacion', flat=True
+    ).first()
+
+
+def _guardar(precios):
+    PrecioEfectivo.objects.bulk_create(
+        precios,
+        update_conflicts=True,
+        unique_fields=['lista_precio', 'articulo'],
+        update_fields=CAMPOS_ACTUALIZADOS,
+    )
+    return [precio.articulo_id for precio in precios]
+
+
+def articulos_pendientes(lista_id):
+    """
+    IDs de artículos de una lista cuyo precio efectivo está desactualizado o
+    todavía no fue calculado.
+    """
+    desactualizados = PrecioEfectivo.objects.filter(
+        lista_precio_id=lista_id, desactualizado=True
+    ).values_list('articulo_id', flat=True)
+    sin_calcular = PrecioArticulo.objects.filter(lista_precio_id=lista_id).filter(
+        ~Exists(PrecioEfectivo.objects.filter(
+            lista_precio_id=OuterRef('lista_precio_id'),
+            articulo_id=OuterRef('articulo_id'),
+        ))
+    ).values_list('articulo_id', flat=True)
+    return set(desactualizados) | set(sin_calcular)
+
+
+def listas_pendientes():
+    """Listas con precios efectivos desactualizados o sin calcular."""
+    return ListaPrecio.objects.filter(
+        Exists(PrecioEfectivo.objects.filter(
+            lista_precio_id=OuterRef('pk'), desactualizado=True
+        ))
+        | Exists(PrecioArticulo.objects.filter(lista_precio_id=OuterRef('pk')).filter(
+            ~Exists(PrecioEfectivo.objects.filter(
+                lista_precio_id=OuterRef('lista_precio_id'),
+                articulo_id=OuterRef('articulo_id'),
+            ))
+        ))
+    )
+
+
+def refrescar_pendientes(listas=None, tamano_lote=TAMANO_LOTE):
+    """
+    Recalcula solo los precios efectivos pendientes.
+
+    Args:
+        listas: QuerySet de ListaPrecio a revisar; None revisa todas las pendientes
+        tamano_lote: Filas por INSERT
+
+    Returns:
+        dict {lista_id: filas escritas}
+    """
+    if listas is None:
+        listas = listas_pendientes()
+    resumen = {}
+    for lista in listas:
+        pendientes = articulos_pendientes(lista.id)
+        if pendientes:
+            resumen[lista.id] = materializar_lista(lista, sorted(pendientes), tamano_lote)
+    return resumen
+
+
+def marcar_desactualizados(lista_ids, articulo_ids=None, linea_id=None, grupo_id=None):
+    """
+    Marca como desactualizados los precios efectivos afectados por un cambio.
+
+    Args:
+        lista_ids: IDs de las listas afectadas
+        articulo_ids: Limita a estos artículos
+        linea_id: Limita a los artículos de esta línea
+        grupo_id: Limita a los artículos de este grupo; con linea_id, a los
+                  artículos de cualquiera de los dos (como aplica una regla)
+    """
+    filtro = Q(lista_precio_id__in=lista_ids, desactualizado=False)
+    if articulo_ids is not None:
+        filtro &= Q(articulo_id__in=articulo_ids)
+    alcance = Q()
+    if grupo_id:
+        alcance |= Q(articulo__grupo_id=grupo_id)
+    if linea_id:
+        alcance |= Q(articulo__grupo__linea_id=linea_id)
+    filtro &= alcance
+    PrecioEfectivo.objects.filter(filtro).update(desactualizado=True)
@@ -0,0 +1,106 @@
+"""
+Confirmación de órdenes de compra de clientes.
+
+Una orden se cotiza completa con PrecioService.calcular_precios_lote (un número
+constante de consultas) y todas sus líneas se escriben con un único bulk_create
+dentro de una transacción. La confirmación es idempotente por (empresa,
+numero_orden): si la orden ya existe se devuelven sus líneas sin escribir nada,
+y si dos reintentos concurrentes llegan a insertar a la vez, la restricción
+única (empresa, numero_orden, linea) rechaza al segundo.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import IntegrityError, transaction
+
+from core.models import DetalleOrdenCompraCliente
+from core.services.precio_service import PrecioService
+
+
+CENTAVOS = Decimal('0.01')
+
+
+class ErrorOrden(Exception):
+    """La orden no se puede confirmar; errores tiene el detalle por línea."""
+
+    def __init__(self, mensaje, errores=None):
+        super().__init__(mensaje)
+        self.errores = errores or []
+
+
+def _importe(valor):
+    return Decimal(repr(valor)).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def lineas_de_orden(empresa_id, numero_orden):
+    """Líneas guardadas de una orden, en orden de línea."""
+    return DetalleOrdenCompraCliente.objects.filter(
+        empresa_id=empresa_id,
+        numero_orden=numero_orden
+    ).select_related('empresa', 'sucursal', 'articulo').order_by('linea', 'id')
+
+
+def confirmar_orden(numero_orden, empresa_id, sucursal_id, canal, items, monto_pedido_total=None):
+    """
+    Cotiza y guarda todas las líneas de una orden.
+
+    Args:
+        numero_orden: Número de la orden
+        empresa_id: ID de la empresa
+        sucursal_id: ID de la sucursal
+        canal: Canal de venta
+        items: Lista de diccionarios con {articulo_id, cantidad}
+        monto_pedido_total: Monto total del pedido; si es None se estima con costos
+
+    Returns:
+        tuple (list de DetalleOrdenCompraCliente, bool creada)
+
+    Raises:
+        ErrorOrden: Si alguna línea no se puede cotizar; no se guarda ninguna
+    """
+    existentes = list(lineas_de_orden(empresa_id, numero_orden))
+    if existentes:
+        return existentes, False
+
+    lote = PrecioService.calcular_precios_lote(
+        empresa_id, sucursal_id, canal, items, monto_pedido_total
+    )
+    errores = [
+        {'linea': numero, 'articulo_id': item['articulo_id'], 'error': resultado['error']}
+        for numero, (item, resultado) in enumerate(zip(items, lote['items']), start=1)
+        if 'error' in resultado
+    ]
+    if errores:
+        raise ErrorOrden('Hay líneas que no se pudieron cotizar', errores)
+
+    detalles = [
+        DetalleOrdenCompraCliente(
+            numero_orden=numero_orden,
+            empresa_id=empresa_id,
+            sucursal_id=sucursal_id,
+            articulo_id=item['articulo_id'],
+            lista_precio_id=resultado['lista_precio_id'],
+            linea=numero,
+            cantidad=item['cantidad'],
+            precio_unitario=_importe(resultado['precio_final']),
+            precio_base=_importe(resultado['precio_base']),
+            descuento_aplicado=_importe(resultado['descuento_total']),
+            # Igual que el subtotal que muestra calcular_pedido
+            subtotal=_importe(resultado['precio_final'] * item['cantidad']),
+            reglas_aplicadas=resultado['reglas_aplicadas'],
+            combinaciones_aplicadas=resultado['combinaciones_aplicadas'],
+            bajo_costo=resultado['bajo_costo'],
+        )
+        for numero, (item, resultado) in enumerate(zip(items, lote['items']), start=1)
+    ]
+
+    try:
+        with transaction.atomic():
+            DetalleOrdenCompraCliente.objects.bulk_create(detalles)
+    except IntegrityError:
+        # Otro reintento de la misma orden se confirmó primero
+        existentes = list(lineas_de_orden(empresa_id, numero_orden))
+        if existentes:
+            return existentes, False
+        raise
+
+    return list(lineas_de_orden(empresa_id, numero_orden)), True
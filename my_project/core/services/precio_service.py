@@ -1,11 +1,24 @@
+import asyncio
 from decimal import Decimal
+from functools import lru_cache
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from django.db.models import Q
-from core.models import (
-    ListaPrecio, PrecioArticulo, ReglaPrecio, 
-    CombinacionProducto, Articulo
+from core.models import ListaPrecio, Articulo
+from core.services.lista_compilada import obtener_lista_compilada, aobtener_lista_compilada
+from core.services.cache_cotizaciones import cache_cotizaciones, clave_cotizacion
+from core.services.cache_listas import (
+    SIN_LISTA, obtener_cache, clave_lista_vigente, segundos_hasta_proximo_limite,
+    aclave_lista_vigente, asegundos_hasta_proximo_limite, aleer_cache, aescribir_cache,
+    contador_lista_vigente, version_listas, aversion_listas
 )
-import json
+from core.services.tiempos import medicion_actual
+
+
+@lru_cache(maxsize=4096, typed=True)
+def _fraccion(porcentaje):
+    """porcentaje / 100. Es exacta, pero es la operación Decimal más costosa del cálculo."""
+    return porcentaje / 100
 
 
 class PrecioService:
@@ -19,6 +32,11 @@ class PrecioService:
         """
         Obtiene la lista de precios vigente para una empresa/sucursal en una fecha específica.
         
+        La resolución se guarda en caché hasta el próximo inicio o fin de vigencia
+        de las listas candidatas, o hasta que se modifique una lista de la empresa
+        (con una caché local del proceso, se comprueba en cada llamada con
+        version_listas).
+        
         Args:
             empresa_id: ID de la empresa
             sucursal_id: ID de la sucursal (opcional)
@@ -31,29 +49,104 @@ class PrecioService:
         if fecha is None:
             fecha = timezone.now().date()
         
+        cache = obtener_cache()
+        clave = clave_lista_vigente(empresa_id, sucursal_id, canal, fecha)
+        version = version_listas(empresa_id)
+        entrada = cache.get(clave)
+        if entrada is not None and entrada[0] == version:
+            contador_lista_vigente.aciertos += 1
+            lista = entrada[1]
+            return None if lista == SIN_LISTA else lista
+        contador_lista_vigente.fallos += 1
+        
+        lista = PrecioService._buscar_lista_vigente(empresa_id, sucursal_id, canal, fecha)
+        
+        segundos = segundos_hasta_proximo_limite(empresa_id, sucursal_id, canal, fecha)
+        entrada = (version, SIN_LISTA if lista is None else lista)
+        if segundos is None:
+            cache.set(clave, entrada)
+        else:
+            cache.set(clave, entrada, segundos)
+        
+        return lista
+
+    @staticmethod
+    async def aobtener_lista_vigente(empresa_id, sucursal_id=None, canal='TODOS', fecha=None):
+        """
+        Versión asíncrona de obtener_lista_vigente. Ante un fallo de caché, la
+        búsqueda de la lista y el cálculo de su vencimiento en caché se
+        consultan a la vez.
+        """
+        if fecha is None:
+            fecha = timezone.now().date()
+        
+        clave = await aclave_lista_vigente(empresa_id, sucursal_id, canal, fecha)
+        version = await aversion_listas(empresa_id)
+        entrada = await aleer_cache(clave)
+        if entrada is not None and entrada[0] == version:
+            contador_lista_vigente.aciertos += 1
+            lista = entrada[1]
+            return None if lista == SIN_LISTA else lista
+        contador_lista_vigente.fallos += 1
+        
+        lista, segundos = await asyncio.gather(
+            PrecioService._abuscar_lista_vigente(empresa_id, sucursal_id, canal, fecha),
+            asegundos_hasta_proximo_limite(empresa_id, sucursal_id, canal, fecha),
+        )
+        entrada = (version, SIN_LISTA if lista is None else lista)
+        if segundos is None:
+            await aescribir_cache(clave, entrada)
+        else:
+            await aescribir_cache(clave, entrada, segundos)
+        
+        return lista
+
+    @staticmethod
+    async def _abuscar_lista_vigente(empresa_id, sucursal_id, canal, fecha):
+        """Versión asíncrona de _buscar_lista_vigente: consulta lista de sucursal y de empresa a la vez."""
+        candidatas = await asyncio.gather(*(
+            consulta.afirst()
+            for consulta in PrecioService.consultas_lista_vigente(empresa_id, sucursal_id, canal, fecha)
+        ))
+        return next((lista for lista in candidatas if lista), None)
+
+    @staticmethod
+    def _buscar_lista_vigente(empresa_id, sucursal_id, canal, fecha):
+        """Consulta en la base de datos la lista vigente (sin caché)."""
+        for consulta in PrecioService.consultas_lista_vigente(empresa_id, sucursal_id, canal, fecha):
+            lista = consulta.first()
+            if lista:
+                return lista
+        return None
+
+    @staticmethod
+    def consultas_lista_vigente(empresa_id, sucursal_id, canal, fecha):
+        """
+        QuerySets que resuelven la lista vigente, en orden de preferencia:
+        primero la lista de la sucursal y luego la lista general de la empresa.
+        """
         # Buscar lista vigente
         query = Q(empresa_id=empresa_id, activo=True, fecha_inicio__lte=fecha)
         query &= Q(fecha_fin__gte=fecha) | Q(fecha_fin__isnull=True)
         
+        consultas = []
+        
         # Priorizar lista específica de sucursal
         if sucursal_id:
-            lista = ListaPrecio.objects.filter(
+            consultas.append(ListaPrecio.objects.filter(
                 query, 
                 sucursal_id=sucursal_id,
                 canal__in=[canal, 'TODOS']
-            ).order_by('-fecha_inicio').first()
-            
-            if lista:
-                return lista
+            ).order_by('-fecha_inicio'))
         
         # Si no hay lista de sucursal, buscar lista general de empresa
-        lista = ListaPrecio.objects.filter(
+        consultas.append(ListaPrecio.objects.filter(
             query,
             sucursal__isnull=True,
             canal__in=[canal, 'TODOS']
-        ).order_by('-fecha_inicio').first()
+        ).order_by('-fecha_inicio'))
         
-        return lista
+        return consultas
 
     @staticmethod
     def obtener_precio_base(lista_precio, articulo_id):
@@ -61,26 +154,18 @@ class PrecioService:
         Obtiene el precio base de un artículo en una lista.
         
         Args:
-            lista_precio: Instancia de ListaPrecio
+            lista_precio: Instancia de ListaPrecio o ListaCompilada
             articulo_id: ID del artículo
             
         Returns:
             dict con precio_base, bajo_costo, descuento_proveedor
         """
-        try:
-            precio_articulo = PrecioArticulo.objects.get(
-                lista_precio=lista_precio,
-                articulo_id=articulo_id
-            )
-            
-            return {
-                'precio_base': precio_articulo.precio_base,
-                'bajo_costo': precio_articulo.bajo_costo,
-                'descuento_proveedor': precio_articulo.descuento_proveedor,
-                'autorizado_por': precio_articulo.autorizado_por
-            }
-        except PrecioArticulo.DoesNotExist:
+        precio_articulo = obtener_lista_compilada(lista_precio).precios.get(articulo_id)
+        
+        if precio_articulo is None:
             return None
+        
+        return precio_articulo._asdict()
 
     @staticmethod
     def aplicar_reglas(lista_precio, articulo, cantidad, monto_pedido_total, canal):
@@ -88,8 +173,8 @@ class PrecioService:
         Aplica las reglas de precio según la prioridad jerárquica.
         
         Args:
-            lista_precio: Instancia de ListaPrecio
-            articulo: Instancia de Articulo
+            lista_precio: Instancia de ListaPrecio o ListaCompilada
+            articulo: Instancia de Articulo o ArticuloCompilado
             cantidad: Cantidad de unidades
             monto_pedido_total: Monto total del pedido
             canal: Canal de venta
@@ -99,13 +184,44 @@ class PrecioService:
         """
         reglas_aplicadas = []
         
-        # Obtener todas las reglas activas de la lista, ordenadas por prioridad
-        reglas = ReglaPrecio.objects.filter(
-            lista_precio=lista_precio,
-            activo=True
-        ).order_by('prioridad')
+        # Las reglas por canal solo aplican si la lista corresponde al canal
+        canal_aplica = lista_precio.canal == canal or lista_precio.canal == 'TODOS'
+        monto_articulo = cantidad * articulo.ultimo_costo  # Monto estimado
+        
+        # El índice devuelve solo las reglas cuyo filtro y rango coinciden,
+        # ordenadas por prioridad
+        reglas = obtener_lista_compilada(lista_precio).indice_reglas.buscar(
+            grupo_id=articulo.grupo_id,
+            linea_id=PrecioService._linea_de(articulo),
+            cantidad=cantidad,
+            monto_articulo=monto_articulo,
+            monto_pedido_total=monto_pedido_total,
+            canal_aplica=canal_aplica
+        )
         
         for regla in reglas:
+            ajuste = PrecioService._calcular_ajuste(regla)
+            
+            if ajuste:
+                reglas_aplicadas.append({
+                    'regla_id': regla.id,
+                    'nombre': regla.nombre,
+                    'tipo': regla.tipo_regla,
+                    'tipo_ajuste': regla.tipo_ajuste,
+                    'valor_ajuste': ajuste
+                })
+        
+        return reglas_aplicadas
+
+    @staticmethod
+    def aplicar_reglas_secuencial(lista_precio, articulo, cantidad, monto_pedido_total, canal):
+        """
+        Versión de aplicar_reglas que recorre todas las reglas de la lista una por una.
+        Se conserva como referencia para comparar y medir el índice de reglas.
+        """
+        reglas_aplicadas = []
+        
+        for regla in obtener_lista_compilada(lista_precio).reglas:
             # Verificar si la regla aplica al artículo
             if not PrecioService._regla_aplica_a_articulo(regla, articulo):
                 continue
@@ -148,21 +264,28 @@ class PrecioService:
     def _regla_aplica_a_articulo(regla, articulo):
         """Verifica si una regla aplica a un artículo específico."""
         # Si la regla no tiene filtros, aplica a todos
-        if not regla.linea_articulo and not regla.grupo_articulo:
+        if not regla.linea_articulo_id and not regla.grupo_articulo_id:
             return True
         
         # Si tiene línea específica
-        if regla.linea_articulo:
-            if articulo.grupo.linea_id == regla.linea_articulo_id:
+        if regla.linea_articulo_id:
+            if PrecioService._linea_de(articulo) == regla.linea_articulo_id:
                 return True
         
         # Si tiene grupo específico
-        if regla.grupo_articulo:
+        if regla.grupo_articulo_id:
             if articulo.grupo_id == regla.grupo_articulo_id:
                 return True
         
         return False
 
+    @staticmethod
+    def _linea_de(articulo):
+        """Devuelve el ID de la línea de un Articulo o ArticuloCompilado."""
+        if isinstance(articulo, Articulo):
+            return articulo.grupo.linea_id
+        return articulo.linea_id
+
     @staticmethod
     def _cantidad_en_rango(cantidad, minimo, maximo):
         """Verifica si una cantidad está en el rango especificado."""
@@ -200,8 +323,6 @@ class PrecioService:
         Returns:
             dict con es_valido, mensaje, bajo_costo
         """
-        costo_con_descuento = articulo.ultimo_costo * (1 - descuento_proveedor / 100)
-        
         if precio_final >= articulo.ultimo_costo:
             return {
                 'es_valido': True,
@@ -211,6 +332,7 @@ class PrecioService:
         
         # Verificar si está en el rango permitido con descuento de proveedor
         if descuento_proveedor >= 50 and descuento_proveedor <= 70:
+            costo_con_descuento = articulo.ultimo_costo * (1 - descuento_proveedor / 100)
             if precio_final >= costo_con_descuento:
                 return {
                     'es_valido': True,
@@ -229,23 +351,28 @@ class PrecioService:
         """
         Evalúa si los artículos del pedido cumplen alguna combinación.
         
+        Las combinaciones vienen de la lista compilada y el pedido se resume una
+        sola vez en conjuntos de artículos por grupo y por línea, de modo que cada
+        combinación se resuelve con operaciones de conjuntos y sin consultas.
+        
         Args:
-            lista_precio: Instancia de ListaPrecio
+            lista_precio: Instancia de ListaPrecio o ListaCompilada
             items_pedido: Lista de diccionarios con {articulo_id, cantidad}
             
         Returns:
             list de combinaciones aplicables con sus descuentos
         """
         combinaciones_aplicadas = []
+        compilada = obtener_lista_compilada(lista_precio)
         
-        # Obtener todas las combinaciones activas de la lista
-        combinaciones = CombinacionProducto.objects.filter(
-            lista_precio=lista_precio,
-            activo=True
-        )
+        if not compilada.combinaciones:
+            return combinaciones_aplicadas
+        
+        contexto = PrecioService._contexto_pedido(compilada, items_pedido)
         
-        for combinacion in combinaciones:
-            if PrecioService._cumple_combinacion(combinacion, items_pedido):
+        # Combinaciones activas de la lista, tomadas de la instantánea
+        for combinacion in compilada.combinaciones:
+            if PrecioService._cumple_combinacion(combinacion, contexto):
                 combinaciones_aplicadas.append({
                     'combinacion_id': combinacion.id,
                     'nombre': combinacion.nombre,
@@ -257,54 +384,70 @@ class PrecioService:
         return combinaciones_aplicadas
 
     @staticmethod
-    def _cumple_combinacion(combinacion, items_pedido):
+    def _contexto_pedido(compilada, items_pedido):
+        """
+        Resume los artículos del pedido en conjuntos para evaluar combinaciones.
+        Los artículos que no están en la lista se resuelven con una sola consulta.
+        
+        Returns:
+            dict con articulos (frozenset de IDs), por_grupo y por_linea
+            ({grupo_id/linea_id: set de IDs de artículos del pedido})
+        """
+        articulos_pedido = frozenset(item['articulo_id'] for item in items_pedido)
+        por_grupo = {}
+        por_linea = {}
+        
+        def agregar(articulo_id, grupo_id, linea_id):
+            por_grupo.setdefault(grupo_id, set()).add(articulo_id)
+            por_linea.setdefault(linea_id, set()).add(articulo_id)
+        
+        faltantes = []
+        for articulo_id in articulos_pedido:
+            articulo = compilada.articulos.get(articulo_id)
+            if articulo is not None:
+                agregar(articulo_id, articulo.grupo_id, articulo.linea_id)
+            else:
+                faltantes.append(articulo_id)
+        
+        if faltantes:
+            for articulo_id, grupo_id, linea_id in Articulo.objects.filter(
+                id__in=faltantes
+            ).values_list('id', 'grupo_id', 'grupo__linea_id'):
+                agregar(articulo_id, grupo_id, linea_id)
+        
+        return {
+            'articulos': articulos_pedido,
+            'por_grupo': por_grupo,
+            'por_linea': por_linea,
+        }
+
+    @staticmethod
+    def _cumple_combinacion(combinacion, contexto):
         """
         Verifica si un pedido cumple con una combinación específica.
         
         Args:
-            combinacion: Instancia de CombinacionProducto
-            items_pedido: Lista de diccionarios con {articulo_id, cantidad}
+            combinacion: CombinacionCompilada
+            contexto: Resumen del pedido generado por _contexto_pedido
             
         Returns:
             bool indicando si cumple la combinación
         """
-        # Obtener los IDs de artículos en el pedido
-        articulos_pedido_ids = [item['articulo_id'] for item in items_pedido]
-        cantidad_total = sum(item['cantidad'] for item in items_pedido)
-        
         # Si la combinación es por artículos específicos
-        if combinacion.articulos.exists():
-            articulos_combinacion_ids = list(combinacion.articulos.values_list('id', flat=True))
-            
-            # Verificar si todos los artículos de la combinación están en el pedido
-            articulos_en_pedido = [aid for aid in articulos_combinacion_ids if aid in articulos_pedido_ids]
-            
-            if len(articulos_en_pedido) >= combinacion.cantidad_minima:
-                return True
+        if combinacion.articulos:
+            # Artículos de la combinación presentes en el pedido
+            articulos_en_pedido = combinacion.articulos & contexto['articulos']
+            return len(articulos_en_pedido) >= combinacion.cantidad_minima
         
         # Si la combinación es por grupo de artículos
-        elif combinacion.grupo_articulo:
-            # Contar artículos del pedido que pertenecen al grupo
-            from core.models import Articulo
-            articulos_del_grupo = Articulo.objects.filter(
-                id__in=articulos_pedido_ids,
-                grupo=combinacion.grupo_articulo
-            ).count()
-            
-            if articulos_del_grupo >= combinacion.cantidad_minima:
-                return True
+        if combinacion.grupo_articulo_id:
+            articulos_del_grupo = contexto['por_grupo'].get(combinacion.grupo_articulo_id, ())
+            return len(articulos_del_grupo) >= combinacion.cantidad_minima
         
         # Si la combinación es por línea de artículos
-        elif combinacion.linea_articulo:
-            # Contar artículos del pedido que pertenecen a la línea
-            from core.models import Articulo
-            articulos_de_linea = Articulo.objects.filter(
-                id__in=articulos_pedido_ids,
-                grupo__linea=combinacion.linea_articulo
-            ).count()
-            
-            if articulos_de_linea >= combinacion.cantidad_minima:
-                return True
+        if combinacion.linea_articulo_id:
+            articulos_de_linea = contexto['por_linea'].get(combinacion.linea_articulo_id, ())
+            return len(articulos_de_linea) >= combinacion.cantidad_minima
         
         return False
 
@@ -321,13 +464,71 @@ class PrecioService:
             Precio con descuento aplicado
         """
         if combinacion_info['tipo_descuento'] == 'PORCENTAJE':
-            descuento = precio_final * (combinacion_info['valor_descuento'] / 100)
+            descuento = precio_final * _fraccion(combinacion_info['valor_descuento'])
             return precio_final - descuento
         elif combinacion_info['tipo_descuento'] == 'MONTO_FIJO':
             return precio_final - combinacion_info['valor_descuento']
         
         return precio_final
 
+    @staticmethod
+    def aplicar_ajustes(precio_base, reglas_aplicadas, combinaciones_aplicadas):
+        """
+        Aplica en orden los ajustes de las reglas y los descuentos por combinación.
+        Da exactamente el mismo Decimal que aplicar_ajustes_secuencial, sin dividir
+        entre 100 en cada paso ni llamar a un método por combinación.
+        
+        Args:
+            precio_base: Decimal
+            reglas_aplicadas: Reglas en el formato de aplicar_reglas
+            combinaciones_aplicadas: Combinaciones en el formato de evaluar_combinaciones
+            
+        Returns:
+            Decimal con el precio final, nunca negativo
+        """
+        precio = precio_base
+        for regla in reglas_aplicadas:
+            tipo_ajuste = regla['tipo_ajuste']
+            if tipo_ajuste == 'PORCENTAJE':
+                precio -= precio * _fraccion(regla['valor_ajuste'])
+            elif tipo_ajuste == 'MONTO_FIJO':
+                precio -= regla['valor_ajuste']
+            elif tipo_ajuste == 'PRECIO_FIJO':
+                precio = regla['valor_ajuste']
+        
+        for combinacion in combinaciones_aplicadas:
+            tipo_descuento = combinacion['tipo_descuento']
+            if tipo_descuento == 'PORCENTAJE':
+                precio -= precio * _fraccion(combinacion['valor_descuento'])
+            elif tipo_descuento == 'MONTO_FIJO':
+                precio -= combinacion['valor_descuento']
+        
+        return max(precio, Decimal('0.00'))
+
+    @staticmethod
+    def aplicar_ajustes_secuencial(precio_base, reglas_aplicadas, combinaciones_aplicadas):
+        """
+        Versión original de aplicar_ajustes. Se mantiene como referencia para
+        verificar que el cálculo optimizado da los mismos resultados.
+        """
+        precio_final = precio_base
+        for regla in reglas_aplicadas:
+            if regla['tipo_ajuste'] == 'PORCENTAJE':
+                descuento = precio_final * (regla['valor_ajuste'] / 100)
+                precio_final -= descuento
+            elif regla['tipo_ajuste'] == 'MONTO_FIJO':
+                precio_final -= regla['valor_ajuste']
+            elif regla['tipo_ajuste'] == 'PRECIO_FIJO':
+                precio_final = regla['valor_ajuste']
+        
+        for combinacion in combinaciones_aplicadas:
+            if combinacion['tipo_descuento'] == 'PORCENTAJE':
+                precio_final -= precio_final * (combinacion['valor_descuento'] / 100)
+            elif combinacion['tipo_descuento'] == 'MONTO_FIJO':
+                precio_final -= combinacion['valor_descuento']
+        
+        return max(precio_final, Decimal('0.00'))
+
     @staticmethod
     def calcular_precio(empresa_id, sucursal_id, articulo_id, canal, cantidad, monto_pedido_total=0, items_pedido=None):
         """
@@ -347,6 +548,11 @@ class PrecioService:
         Returns:
             dict con precio_base, precio_final, reglas_aplicadas, combinaciones_aplicadas, validacion
         """
+        # Tiempos por etapa (core.services.tiempos); None si no se está midiendo
+        medicion = medicion_actual()
+        if medicion:
+            medicion.iniciar()
+        
         # 1. Obtener lista vigente
         lista_precio = PrecioService.obtener_lista_vigente(empresa_id, sucursal_id, canal)
         
@@ -357,8 +563,202 @@ class PrecioService:
                 'precio_final': None
             }
         
+        # Instantánea compilada de la lista: los pasos siguientes no consultan la base de datos
+        lista_precio = obtener_lista_compilada(lista_precio)
+        if medicion:
+            medicion.marcar('lista_vigente')
+        
+        # Combinaciones del pedido (si se proporcionaron items del pedido)
+        if items_pedido:
+            combinaciones_aplicadas = PrecioService.evaluar_combinaciones(lista_precio, items_pedido)
+            if medicion:
+                medicion.marcar('combinaciones')
+            return PrecioService._calcular_en_lista(
+                lista_precio, articulo_id, canal, cantidad,
+                monto_pedido_total, combinaciones_aplicadas
+            )
+        
+        return PrecioService._cotizar(lista_precio, articulo_id, canal, cantidad, monto_pedido_total)
+
+    @staticmethod
+    async def acalcular_precio(empresa_id, sucursal_id, articulo_id, canal, cantidad, monto_pedido_total=0, items_pedido=None):
+        """
+        Versión asíncrona de calcular_precio para vistas ASGI.
+        
+        La lista vigente y su instantánea se obtienen con el ORM asíncrono
+        (las consultas independientes se lanzan con asyncio.gather); el cálculo
+        sobre la instantánea no hace E/S y se ejecuta directamente.
+        
+        Returns:
+            dict con el mismo formato que calcular_precio
+        """
+        lista_precio = await PrecioService.aobtener_lista_vigente(empresa_id, sucursal_id, canal)
+        
+        if not lista_precio:
+            return {
+                'error': 'No hay lista de precios vigente',
+                'precio_base': None,
+                'precio_final': None
+            }
+        
+        lista_precio = await aobtener_lista_compilada(lista_precio)
+        
+        if items_pedido:
+            combinaciones_aplicadas = await sync_to_async(PrecioService.evaluar_combinaciones)(
+                lista_precio, items_pedido
+            )
+            return PrecioService._calcular_en_lista(
+                lista_precio, articulo_id, canal, cantidad,
+                monto_pedido_total, combinaciones_aplicadas
+            )
+        
+        return PrecioService._cotizar(lista_precio, articulo_id, canal, cantidad, monto_pedido_total)
+
+    @staticmethod
+    def _cotizar(lista_precio, articulo_id, canal, cantidad, monto_pedido_total):
+        """
+        _calcular_en_lista sin combinaciones, a través de la caché de cotizaciones.
+        El resultado es una copia superficial: no modificar sus listas ni diccionarios.
+        """
+        medicion = medicion_actual()
+        clave = clave_cotizacion(lista_precio, articulo_id, canal, cantidad, monto_pedido_total)
+        if medicion:
+            medicion.marcar('cache_cotizaciones')
+        resultado = cache_cotizaciones.obtener(
+            clave,
+            lambda: PrecioService._calcular_en_lista(
+                lista_precio, articulo_id, canal, cantidad, monto_pedido_total, []
+            )
+        )
+        if medicion:
+            medicion.marcar('cache_cotizaciones')
+        return resultado
+
+    @staticmethod
+    def calcular_precios_lote(empresa_id, sucursal_id, canal, items, monto_pedido_total=None):
+        """
+        Calcula el precio final de todos los items de un pedido en un número
+        constante de consultas, sin importar la cantidad de líneas.
+        
+        La lista vigente se resuelve una sola vez, los artículos fuera de la lista
+        se leen con una única consulta IN y las combinaciones se evalúan una vez
+        para todo el pedido. Cada línea es idéntica a la que devolvería
+        calcular_precio(..., items_pedido=items).
+        
+        Args:
+            empresa_id: ID de la empresa
+            sucursal_id: ID de la sucursal
+            canal: Canal de venta
+            items: Lista de diccionarios con {articulo_id, cantidad}
+            monto_pedido_total: Monto total del pedido. Si es None se estima
+                                con el último costo de cada artículo.
+            
+        Returns:
+            dict con items (un resultado por línea, en el mismo orden), monto_pedido_total
+            y articulos (artículos de la lista compilada, por ID)
+        """
+        medicion = medicion_actual()
+        if medicion:
+            medicion.iniciar()
+        
+        lista_precio = PrecioService.obtener_lista_vigente(empresa_id, sucursal_id, canal)
+        
+        if lista_precio:
+            lista_precio = obtener_lista_compilada(lista_precio)
+        
+        if monto_pedido_total is None:
+            monto_pedido_total = PrecioService.estimar_monto_pedido(lista_precio, items)
+        if medicion:
+            medicion.marcar('lista_vigente')
+        
+        if not lista_precio:
+            error = {
+                'error': 'No hay lista de precios vigente',
+                'precio_base': None,
+                'precio_final': None
+            }
+            return {
+                'items': [dict(error) for _ in items],
+                'monto_pedido_total': monto_pedido_total,
+                'articulos': {}
+            }
+        
+        combinaciones_aplicadas = []
+        if items:
+            combinaciones_aplicadas = PrecioService.evaluar_combinaciones(lista_precio, items)
+        if medicion:
+            medicion.marcar('combinaciones')
+        
+        resultados = [
+            PrecioService._calcular_en_lista(
+                lista_precio, item['articulo_id'], canal, item['cantidad'],
+                monto_pedido_total, combinaciones_aplicadas
+            )
+            for item in items
+        ]
+        
+        return {
+            'items': resultados,
+            'monto_pedido_total': monto_pedido_total,
+            'articulos': lista_precio.articulos
+        }
+
+    @staticmethod
+    def estimar_monto_pedido(lista_precio, items):
+        """
+        Estima el monto total de un pedido con el último costo de cada artículo.
+        
+        Args:
+            lista_precio: ListaCompilada o None
+            items: Lista de diccionarios con {articulo_id, cantidad}
+            
+        Returns:
+            float con el monto estimado
+        """
+        costos = {}
+        faltantes = set()
+        for item in items:
+            articulo = lista_precio.articulos.get(item['articulo_id']) if lista_precio else None
+            if articulo is not None:
+                costos[articulo.id] = articulo.ultimo_costo
+            else:
+                faltantes.add(item['articulo_id'])
+        
+        if faltantes:
+            costos.update(
+                Articulo.objects.filter(id__in=faltantes).values_list('id', 'ultimo_costo')
+            )
+        
+        monto_pedido_total = 0
+        for item in items:
+            if item['articulo_id'] in costos:
+                monto_pedido_total += float(costos[item['articulo_id']]) * item['cantidad']
+        
+        return monto_pedido_total
+
+    @staticmethod
+    def _calcular_en_lista(lista_precio, articulo_id, canal, cantidad, monto_pedido_total, combinaciones_aplicadas):
+        """
+        Calcula el precio de un artículo sobre una lista ya compilada.
+        Pasos 2 a 7 de calcular_precio; no realiza consultas.
+        
+        Args:
+            lista_precio: ListaCompilada
+            articulo_id: ID del artículo
+            canal: Canal de venta
+            cantidad: Cantidad de unidades
+            monto_pedido_total: Monto total del pedido
+            combinaciones_aplicadas: Combinaciones que cumple el pedido
+            
+        Returns:
+            dict con el mismo formato que calcular_precio
+        """
+        medicion = medicion_actual()
+        
         # 2. Obtener precio base
         precio_info = PrecioService.obtener_precio_base(lista_precio, articulo_id)
+        if medicion:
+            medicion.marcar('precio_base')
         
         if not precio_info:
             return {
@@ -368,12 +768,12 @@ class PrecioService:
             }
         
         precio_base = precio_info['precio_base']
-        precio_final = precio_base
         
         # 3. Obtener artículo
-        try:
-            articulo = Articulo.objects.get(id=articulo_id)
-        except Articulo.DoesNotExist:
+        articulo = lista_precio.articulos.get(articulo_id)
+        if medicion:
+            medicion.marcar('articulo')
+        if articulo is None:
             return {
                 'error': 'Artículo no encontrado',
                 'precio_base': None,
@@ -384,28 +784,13 @@ class PrecioService:
         reglas_aplicadas = PrecioService.aplicar_reglas(
             lista_precio, articulo, cantidad, monto_pedido_total, canal
         )
+        if medicion:
+            medicion.marcar('reglas')
         
-        # 5. Calcular precio final aplicando ajustes de reglas
-        for regla in reglas_aplicadas:
-            if regla['tipo_ajuste'] == 'PORCENTAJE':
-                descuento = precio_final * (regla['valor_ajuste'] / 100)
-                precio_final -= descuento
-            elif regla['tipo_ajuste'] == 'MONTO_FIJO':
-                precio_final -= regla['valor_ajuste']
-            elif regla['tipo_ajuste'] == 'PRECIO_FIJO':
-                precio_final = regla['valor_ajuste']
-        
-        # 6. Evaluar y aplicar combinaciones (si se proporcionaron items del pedido)
-        combinaciones_aplicadas = []
-        if items_pedido:
-            combinaciones_aplicadas = PrecioService.evaluar_combinaciones(lista_precio, items_pedido)
-            
-            # Aplicar descuentos por combinación
-            for combinacion in combinaciones_aplicadas:
-                precio_final = PrecioService.aplicar_descuento_combinacion(precio_final, combinacion)
-        
-        # Asegurar que el precio no sea negativo
-        precio_final = max(precio_final, Decimal('0.00'))
+        # 5-6. Ajustes de reglas y descuentos por combinación
+        precio_final = PrecioService.aplicar_ajustes(precio_base, reglas_aplicadas, combinaciones_aplicadas)
+        if medicion:
+            medicion.marcar('ajustes')
         
         # 7. Validar contra costo
         validacion = PrecioService.validar_costo(
@@ -413,6 +798,8 @@ class PrecioService:
             articulo, 
             precio_info['descuento_proveedor']
         )
+        if medicion:
+            medicion.marcar('validacion_costo')
         
         # Calcular descuento total
         descuento_total = float(precio_base - precio_final)
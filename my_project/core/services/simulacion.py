@@ -0,0 +1,431 @@
+"""
+Simulación vectorizada del precio de todos los artículos de una lista.
+
+Para evaluar el efecto de un cambio de reglas sobre la lista completa no se
+cotiza artículo por artículo: los precios base, costos, descuentos de proveedor
+y la jerarquía grupo/línea de la lista se cargan en arreglos de NumPy y cada
+regla se aplica, en orden de prioridad, como una operación con máscara sobre
+todos los artículos a la vez. La validación contra costo también es una
+comparación vectorial.
+
+Los precios se calculan en float64, así que pueden diferir del cálculo con
+Decimal en la última cifra: sirven para previsualizar, no para cotizar. Los
+rangos de monto se comparan en centavos enteros, igual que en el cálculo exacto.
+Las combinaciones de productos dependen del contenido de cada pedido y no se
+simulan.
+
+comparar_reglas evalúa en la misma pasada las reglas actuales y un conjunto
+modificado (reglas en borrador, editadas o eliminadas) y devuelve solo los
+artículos cuyo precio final o condición de bajo costo cambia.
+
+Requiere numpy.
+"""
+import threading
+from collections import namedtuple
+
+from core.models import DetalleOrdenCompraCliente
+from core.services.lista_compilada import obtener_lista_compilada
+
+
+# Límites de los tramos de margen (% sobre el precio final) del resumen
+TRAMOS_MARGEN = (0, 10, 20, 30, 40, 50)
+
+PERCENTILES_MARGEN = (5, 25, 50, 75, 95)
+
+# Decimales con que se informan los precios simulados (los de PrecioEfectivo)
+DECIMALES_PRECIO = 6
+
+# Artículos por consulta al buscar órdenes afectadas
+TAMANO_LOTE_ORDENES = 5000
+
+ArreglosLista = namedtuple(
+    'ArreglosLista',
+    [
+        'articulo_id', 'precio_base', 'ultimo_costo', 'ultimo_costo_centavos',
+        'descuento_proveedor', 'bajo_costo', 'grupo_id', 'linea_id',
+    ]
+)
+
+
+class ErrorSimulacion(Exception):
+    """Error que impide simular la lista."""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ErrorSimulacion('Para simular precios instale numpy')
+    return numpy
+
+
+_arreglos = {}
+_lock = threading.Lock()
+
+
+def arreglos_lista(lista_precio):
+    """
+    Arreglos de NumPy con los datos de todos los artículos de la lista, en
+    orden de articulo_id. Se reutilizan mientras la lista compilada no cambie.
+
+    Args:
+        lista_precio: Instancia de ListaPrecio o ListaCompilada
+
+    Returns:
+        ArreglosLista
+    """
+    compilada = obtener_lista_compilada(lista_precio)
+    guardado = _arreglos.get(compilada.id)
+    if guardado is not None and guardado[0] is compilada:
+        return guardado[1]
+
+    np = _numpy()
+    articulo_ids = sorted(compilada.precios)
+    precios = [compilada.precios[articulo_id] for articulo_id in articulo_ids]
+    articulos = [compilada.articulos[articulo_id] for articulo_id in articulo_ids]
+
+    ultimo_costo = np.array([articulo.ultimo_costo for articulo in articulos], dtype=np.float64)
+    arreglos = ArreglosLista(
+        articulo_id=np.array(articulo_ids, dtype=np.int64),
+        precio_base=np.array([precio.precio_base for precio in precios], dtype=np.float64),
+        ultimo_costo=ultimo_costo,
+        # Los costos tienen 2 decimales: en centavos son enteros exactos
+        ultimo_costo_centavos=np.rint(ultimo_costo * 100).astype(np.int64),
+        descuento_proveedor=np.array([precio.descuento_proveedor for precio in precios], dtype=np.float64),
+        bajo_costo=np.array([precio.bajo_costo for precio in precios], dtype=bool),
+        grupo_id=np.array([articulo.grupo_id for articulo in articulos], dtype=np.int64),
+        linea_id=np.array([articulo.linea_id for articulo in articulos], dtype=np.int64),
+    )
+    with _lock:
+        _arreglos[compilada.id] = (compilada, arreglos)
+    return arreglos
+
+
+def _centavos(monto):
+    return None if monto is None else int(monto * 100)
+
+
+def _orden_regla(regla):
+    # Las reglas en borrador (sin id) van después de las guardadas de igual prioridad
+    return (regla.prioridad, regla.id is None, regla.id or 0)
+
+
+def precios_finales(arreglos, reglas, canal_aplica=True, cantidad=1, monto_pedido_total=0):
+    """
+    Aplica un conjunto de reglas a todos los artículos.
+
+    Args:
+        arreglos: ArreglosLista
+        reglas: Iterable de ReglaPrecio o ReglaCompilada (pueden no estar guardadas)
+        canal_aplica: Si las reglas por canal aplican al canal simulado
+        cantidad: Cantidad de unidades por artículo
+        monto_pedido_total: Monto total del pedido
+
+    Returns:
+        numpy.ndarray con el precio final de cada artículo
+    """
+    np = _numpy()
+    precio = arreglos.precio_base.copy()
+    monto_articulo = None
+
+    for regla in sorted(reglas, key=_orden_regla):
+        # Igual que aplicar_reglas: las reglas inactivas o con ajuste 0 no aplican
+        if not getattr(regla, 'activo', True) or not regla.valor_ajuste:
+            continue
+
+        if regla.tipo_regla == 'CANAL':
+            if not canal_aplica:
+                continue
+            mascara = None
+        elif regla.tipo_regla == 'ESCALA_UNIDADES':
+            if not _en_rango(cantidad, regla.cantidad_minima, regla.cantidad_maxima):
+                continue
+            mascara = None
+        elif regla.tipo_regla == 'MONTO_PEDIDO':
+            if not _en_rango(monto_pedido_total, regla.monto_minimo, regla.monto_maximo):
+                continue
+            mascara = None
+        elif regla.tipo_regla == 'ESCALA_MONTO':
+            if monto_articulo is None:
+                monto_articulo = arreglos.ultimo_costo_centavos * int(cantidad)
+            mascara = np.ones(len(precio), dtype=bool)
+            minimo, maximo = _centavos(regla.monto_minimo), _centavos(regla.monto_maximo)
+            if minimo is not None:
+                mascara &= monto_articulo >= minimo
+            if maximo is not None:
+                mascara &= monto_articulo <= maximo
+        else:
+            continue
+
+        if regla.linea_articulo_id or regla.grupo_articulo_id:
+            filtro = np.zeros(len(precio), dtype=bool)
+            if regla.linea_articulo_id:
+                filtro |= arreglos.linea_id == regla.linea_articulo_id
+            if regla.grupo_articulo_id:
+                filtro |= arreglos.grupo_id == regla.grupo_articulo_id
+            mascara = filtro if mascara is None else mascara & filtro
+
+        valor = float(regla.valor_ajuste)
+        if regla.tipo_ajuste == 'PORCENTAJE':
+            factor = 1 - valor / 100
+            if mascara is None:
+                precio *= factor
+            else:
+                precio[mascara] *= factor
+        elif regla.tipo_ajuste == 'MONTO_FIJO':
+            if mascara is None:
+                precio -= valor
+            else:
+                precio[mascara] -= valor
+        elif regla.tipo_ajuste == 'PRECIO_FIJO':
+            if mascara is None:
+                precio[:] = valor
+            else:
+                precio[mascara] = valor
+
+    np.maximum(precio, 0, out=precio)
+    return precio
+
+
+def _en_rango(valor, minimo, maximo):
+    if minimo is not None and valor < minimo:
+        return False
+    if maximo is not None and valor > maximo:
+        return False
+    return True
+
+
+def validar_costos(arreglos, precio_final):
+    """
+    Versión vectorial de PrecioService.validar_costo.
+
+    Returns:
+        tuple (es_valido, bajo_costo) de arreglos booleanos
+    """
+    bajo_costo = precio_final < arreglos.ultimo_costo
+    descuento = arreglos.descuento_proveedor
+    autorizado = (
+        (descuento >= 50) & (descuento <= 70)
+        & (precio_final >= arreglos.ultimo_costo * (1 - descuento / 100))
+    )
+    return ~bajo_costo | autorizado, bajo_costo | arreglos.bajo_costo
+
+
+def resumir(arreglos, precio_final):
+    """
+    Resumen de una simulación: artículos bajo costo, descuento promedio y
+    distribución del margen sobre el precio final.
+
+    Returns:
+        dict
+    """
+    np = _numpy()
+    total = len(precio_final)
+    es_valido, _ = validar_costos(arreglos, precio_final)
+
+    con_precio = arreglos.precio_base > 0
+    porcentaje_descuento = (
+        (arreglos.precio_base[con_precio] - precio_final[con_precio])
+        / arreglos.precio_base[con_precio] * 100
+    )
+    con_precio_final = precio_final > 0
+    margen = (
+        (precio_final[con_precio_final] - arreglos.ultimo_costo[con_precio_final])
+        / precio_final[con_precio_final] * 100
+    )
+
+    limites = [-np.inf, *TRAMOS_MARGEN, np.inf]
+    cuentas, _ = np.histogram(margen, bins=limites)
+    tramos = [
+        {
+            'desde': None if np.isinf(desde) else int(desde),
+            'hasta': None if np.isinf(hasta) else int(hasta),
+            'articulos': int(cuenta),
+        }
+        for desde, hasta, cuenta in zip(limites[:-1], limites[1:], cuentas)
+    ]
+
+    if len(margen):
+        percentiles = {
+            f'p{p}': round(float(valor), 2)
+            for p, valor in zip(PERCENTILES_MARGEN, np.percentile(margen, PERCENTILES_MARGEN))
+        }
+        margen_promedio = round(float(margen.mean()), 2)
+    else:
+        percentiles = {}
+        margen_promedio = None
+
+    return {
+        'articulos': total,
+        'bajo_costo': int(np.count_nonzero(precio_final < arreglos.ultimo_costo)),
+        'no_validos': int(total - np.count_nonzero(es_valido)),
+        'precio_cero': int(total - np.count_nonzero(con_precio_final)),
+        'descuento_promedio': round(float(porcentaje_descuento.mean()), 2) if len(porcentaje_descuento) else 0,
+        'margen': {
+            'promedio': margen_promedio,
+            'percentiles': percentiles,
+            'tramos': tramos,
+        },
+    }
+
+
+def _canal_aplica(compilada, canal):
+    canal = canal or compilada.canal
+    return compilada.canal == canal or compilada.canal == 'TODOS'
+
+
+def simular_lista(lista_precio, reglas=None, canal=None, cantidad=1, monto_pedido_total=0):
+    """
+    Simula el precio de todos los artículos de la lista con un conjunto de reglas.
+
+    Args:
+        lista_precio: Instancia de ListaPrecio o ListaCompilada
+        reglas: Reglas a aplicar; por defecto las reglas activas de la lista
+        canal: Canal simulado; por defecto el de la lista
+        cantidad: Cantidad de unidades por artículo
+        monto_pedido_total: Monto total del pedido
+
+    Returns:
+        dict con el resumen de la simulación
+    """
+    compilada = obtener_lista_compilada(lista_precio)
+    arreglos = arreglos_lista(compilada)
+    if reglas is None:
+        reglas = compilada.reglas
+    precio_final = precios_finales(
+        arreglos, reglas, _canal_aplica(compilada, canal), cantidad, monto_pedido_total
+    )
+    return resumir(arreglos, precio_final)
+
+
+def reglas_con_cambios(reglas, borradores=(), eliminar=()):
+    """
+    Conjunto de reglas resultante de aplicar cambios a las reglas actuales.
+
+    Args:
+        reglas: Reglas actuales (ReglaCompilada)
+        borradores: Instancias de ReglaPrecio sin guardar; las que tienen id
+                    reemplazan a la regla actual con ese id
+        eliminar: IDs de reglas que se quitan
+
+    Returns:
+        list de reglas
+    """
+    reemplazadas = set(eliminar) | {borrador.id for borrador in borradores if borrador.id}
+    return [regla for regla in reglas if regla.id not in reemplazadas] + list(borradores)
+
+
+class DiferenciasSimulacion:
+    """
+    Artículos cuyo precio final o condición de bajo costo cambia, como
+    secuencia de solo lectura: los dict de cada fila se arman al indexarla, de
+    modo que paginar no construye las filas de toda la lista.
+    """
+
+    def __init__(self, compilada, arreglos, indices, precio_actual, precio_nuevo, bajo_costo_actual, bajo_costo_nuevo):
+        self.compilada = compilada
+        self.arreglos = arreglos
+        self.indices = indices
+        self.precio_actual = precio_actual
+        self.precio_nuevo = precio_nuevo
+        self.bajo_costo_actual = bajo_costo_actual
+        self.bajo_costo_nuevo = bajo_costo_nuevo
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, posicion):
+        if isinstance(posicion, slice):
+            return [self._fila(indice) for indice in self.indices[posicion].tolist()]
+        return self._fila(int(self.indices[posicion]))
+
+    def __iter__(self):
+        for indice in self.indices.tolist():
+            yield self._fila(indice)
+
+    @property
+    def articulo_ids(self):
+        return self.arreglos.articulo_id[self.indices].tolist()
+
+    def _fila(self, indice):
+        articulo = self.compilada.articulos[int(self.arreglos.articulo_id[indice])]
+        return {
+            'articulo_id': articulo.id,
+            'codigo': articulo.codigo,
+            'nombre': articulo.nombre,
+            'precio_base': round(float(self.arreglos.precio_base[indice]), 2),
+            'ultimo_costo': round(float(self.arreglos.ultimo_costo[indice]), 2),
+            'precio_final_actual': round(float(self.precio_actual[indice]), DECIMALES_PRECIO),
+            'precio_final_nuevo': round(float(self.precio_nuevo[indice]), DECIMALES_PRECIO),
+            'bajo_costo_actual': bool(self.bajo_costo_actual[indice]),
+            'bajo_costo_nuevo': bool(self.bajo_costo_nuevo[indice]),
+        }
+
+
+def comparar_reglas(lista_precio, reglas_nuevas, canal=None, cantidad=1, monto_pedido_total=0):
+    """
+    Evalúa las reglas actuales y las nuevas sobre todos los artículos de la lista.
+
+    Args:
+        lista_precio: Instancia de ListaPrecio o ListaCompilada
+        reglas_nuevas: Conjunto completo de reglas a comparar (ver reglas_con_cambios)
+        canal: Canal simulado; por defecto el de la lista
+        cantidad: Cantidad de unidades por artículo
+        monto_pedido_total: Monto total del pedido
+
+    Returns:
+        tuple (DiferenciasSimulacion, dict con el resumen de ambos conjuntos)
+    """
+    np = _numpy()
+    compilada = obtener_lista_compilada(lista_precio)
+    arreglos = arreglos_lista(compilada)
+    canal_aplica = _canal_aplica(compilada, canal)
+
+    precio_actual = precios_finales(arreglos, compilada.reglas, canal_aplica, cantidad, monto_pedido_total)
+    precio_nuevo = precios_finales(arreglos, reglas_nuevas, canal_aplica, cantidad, monto_pedido_total)
+    _, bajo_costo_actual = validar_costos(arreglos, precio_actual)
+    _, bajo_costo_nuevo = validar_costos(arreglos, precio_nuevo)
+
+    # Las reglas sin cambios hacen las mismas operaciones en ambos conjuntos,
+    # así que basta comparar con la precisión con que se informan los precios
+    cambia_precio = (
+        np.round(precio_actual, DECIMALES_PRECIO) != np.round(precio_nuevo, DECIMALES_PRECIO)
+    )
+    cambia_bajo_costo = bajo_costo_actual != bajo_costo_nuevo
+    indices = np.flatnonzero(cambia_precio | cambia_bajo_costo)
+
+    diferencias = DiferenciasSimulacion(
+        compilada, arreglos, indices, precio_actual, precio_nuevo, bajo_costo_actual, bajo_costo_nuevo
+    )
+    resumen = {
+        'articulos': len(precio_actual),
+        'articulos_afectados': len(indices),
+        'cambian_precio': int(np.count_nonzero(cambia_precio)),
+        'pasan_a_bajo_costo': int(np.count_nonzero(bajo_costo_nuevo & ~bajo_costo_actual)),
+        'salen_de_bajo_costo': int(np.count_nonzero(bajo_costo_actual & ~bajo_costo_nuevo)),
+        'actual': resumir(arreglos, precio_actual),
+        'nuevo': resumir(arreglos, precio_nuevo),
+    }
+    return diferencias, resumen
+
+
+def ordenes_afectadas(lista_id, articulo_ids, tamano_lote=TAMANO_LOTE_ORDENES):
+    """
+    Cantidad de órdenes de la lista con algún artículo afectado.
+
+    Args:
+        lista_id: ID de la lista de precios
+        articulo_ids: IDs de los artículos afectados
+
+    Returns:
+        int
+    """
+    ordenes = set()
+    for inicio in range(0, len(articulo_ids), tamano_lote):
+        ordenes.update(
+            DetalleOrdenCompraCliente.objects.filter(
+                lista_precio_id=lista_id,
+                articulo_id__in=articulo_ids[inicio:inicio + tamano_lote]
+            ).values_list('numero_orden', flat=True).distinct()
+        )
+    return len(ordenes)
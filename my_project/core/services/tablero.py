@@ -0,0 +1,45 @@
+"""
+Contadores y versiones de las páginas HTML (inicio, empresas, dashboard).
+
+Cada página lee en una sola consulta (UNION ALL de un agregado condicional por
+tabla) los registros activos de las tablas que muestra, el total de filas y la
+última fecha_actualizacion. Total y fecha forman la versión de los fragmentos
+cacheados en las plantillas con {% cache %}: un alta, una baja o un save()
+cambian la versión y el fragmento se vuelve a renderizar en la siguiente
+visita. QuerySet.update() no toca fecha_actualizacion; esos cambios se ven al
+vencer TIEMPO_FRAGMENTOS.
+"""
+from django.db.models import Count, Max, Q, Value
+
+
+# Segundos que vive un fragmento renderizado aunque su versión no cambie
+TIEMPO_FRAGMENTOS = 300
+
+
+def resumen_tablas(**querysets):
+    """
+    Cuenta los registros activos de varias tablas en una sola consulta.
+
+    Args:
+        **querysets: nombre -> QuerySet de un modelo con activo y fecha_actualizacion
+
+    Returns:
+        tuple (dict {nombre: activos}, str con la versión de los datos)
+    """
+    consultas = [
+        queryset.order_by().values(tabla=Value(nombre)).annotate(
+            activos=Count('pk', filter=Q(activo=True)),
+            total=Count('pk'),
+            modificado=Max('fecha_actualizacion'),
+        ).values_list('tabla', 'activos', 'total', 'modificado')
+        for nombre, queryset in querysets.items()
+    ]
+    filas = {fila[0]: fila[1:] for fila in consultas[0].union(*consultas[1:], all=True)}
+
+    activos = {}
+    version = []
+    for nombre in querysets:
+        cantidad, total, modificado = filas.get(nombre, (0, 0, None))
+        activos[nombre] = cantidad
+        version.append(f'{nombre}:{total}:{modificado.isoformat() if modificado else ""}')
+    return activos, '|'.join(version)
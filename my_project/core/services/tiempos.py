@@ -0,0 +1,203 @@
+"""
+Tiempos por etapa del cálculo de precios (header Server-Timing e histogramas).
+
+Con PRECIOS_TIEMPOS activo, las vistas decoradas con con_server_timing abren
+una Medicion y PrecioService marca el fin de cada etapa (lista vigente,
+combinaciones, precio base, artículo, reglas, ajustes, validación de costo y
+caché de cotizaciones). Cada marca atribuye a su etapa el tiempo y las
+consultas transcurridos desde la marca anterior, así que en un lote las etapas
+acumulan lo de todas las líneas. Al terminar la vista las etapas salen en el
+header Server-Timing y se suman a los histogramas del proceso.
+
+Desactivado, medicion_actual() devuelve None y cada etapa cuesta un if: el
+servicio no arma contextos ni cuenta consultas.
+"""
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+
+
+HABILITADO = getattr(settings, 'PRECIOS_TIEMPOS', False)
+
+# Límites superiores de los buckets de los histogramas, en milisegundos
+LIMITES_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+TOTAL = 'total'
+
+_medicion = ContextVar('medicion_precios', default=None)
+
+# Medicion de la vista en curso, o None si no se está midiendo
+medicion_actual = _medicion.get
+
+
+class Medicion:
+    """Tiempo y consultas por etapa de una petición."""
+
+    __slots__ = ('etapas', 'consultas', 'inicio', 'duracion', '_ultimo', '_consultas_ultimo')
+
+    def __init__(self):
+        self.etapas = {}
+        self.consultas = 0
+        self.inicio = perf_counter()
+        self.duracion = None
+        self._ultimo = self.inicio
+        self._consultas_ultimo = 0
+
+    def iniciar(self):
+        """Descarta lo transcurrido desde la última marca (p. ej. validar la petición)."""
+        self._ultimo = perf_counter()
+        self._consultas_ultimo = self.consultas
+
+    def marcar(self, etapa):
+        """Atribuye a la etapa el tiempo y las consultas desde la marca anterior."""
+        ahora = perf_counter()
+        segundos = ahora - self._ultimo
+        consultas = self.consultas - self._consultas_ultimo
+        acumulado = self.etapas.get(etapa)
+        if acumulado is None:
+            self.etapas[etapa] = [segundos, consultas]
+        else:
+            acumulado[0] += segundos
+            acumulado[1] += consultas
+        self._ultimo = ahora
+        self._consultas_ultimo = self.consultas
+
+    def cerrar(self):
+        self.duracion = perf_counter() - self.inicio
+
+    def contar_consulta(self, execute, sql, params, many, context):
+        """execute_wrapper de la conexión: cuenta las consultas de la petición."""
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+    def encabezado(self):
+        """
+        Valor del header Server-Timing.
+
+        Returns:
+            str como 'reglas;dur=0.012;desc="0 consultas", ..., total;dur=1.2;desc="2 consultas"'
+        """
+        partes = [
+            f'{etapa};dur={segundos * 1000:.3f};desc="{consultas} consultas"'
+            for etapa, (segundos, consultas) in self.etapas.items()
+        ]
+        if self.duracion is not None:
+            partes.append(f'{TOTAL};dur={self.duracion * 1000:.3f};desc="{self.consultas} consultas"')
+        return ', '.join(partes)
+
+
+class HistogramasEtapas:
+    """Histogramas por etapa de las mediciones de este proceso."""
+
+    def __init__(self, limites_ms=LIMITES_MS):
+        self.limites_ms = tuple(limites_ms)
+        self._limites = [limite / 1000 for limite in self.limites_ms]
+        self._etapas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, medicion):
+        """Suma las etapas de una medición cerrada (y su total) a los histogramas."""
+        valores = list(medicion.etapas.items())
+        valores.append((TOTAL, (medicion.duracion, medicion.consultas)))
+        with self._lock:
+            for etapa, (segundos, consultas) in valores:
+                datos = self._etapas.get(etapa)
+                if datos is None:
+                    # buckets (el último sin límite), cantidad, suma de segundos, consultas
+                    datos = self._etapas[etapa] = [[0] * (len(self._limites) + 1), 0, 0.0, 0]
+                datos[0][bisect_left(self._limites, segundos)] += 1
+                datos[1] += 1
+                datos[2] += segundos
+                datos[3] += consultas
+
+    def _percentil(self, buckets, cantidad, fraccion):
+        # Límite superior del bucket que contiene el percentil; None si cae en el último
+        objetivo = fraccion * cantidad
+        acumulado = 0
+        for limite, veces in zip(self.limites_ms, buckets):
+            acumulado += veces
+            if acumulado >= objetivo:
+                return limite
+        return None
+
+    def estadisticas(self):
+        """
+        Histogramas de este proceso desde el arranque o el último limpiar().
+
+        Returns:
+            dict {etapa: {cantidad, suma_ms, promedio_ms, consultas, p50_ms, p95_ms,
+            p99_ms, buckets}} donde buckets es una lista de [límite_ms, veces
+            acumuladas] y el último límite es None (sin límite)
+        """
+        with self._lock:
+            copia = {etapa: (list(datos[0]),) + tuple(datos[1:]) for etapa, datos in self._etapas.items()}
+
+        resultado = {}
+        for etapa, (buckets, cantidad, suma, consultas) in copia.items():
+            acumulados = []
+            total = 0
+            for limite, veces in zip(self.limites_ms + (None,), buckets):
+                total += veces
+                acumulados.append([limite, total])
+            resultado[etapa] = {
+                'cantidad': cantidad,
+                'suma_ms': round(suma * 1000, 3),
+                'promedio_ms': round(suma * 1000 / cantidad, 3),
+                'consultas': consultas,
+                'p50_ms': self._percentil(buckets, cantidad, 0.50),
+                'p95_ms': self._percentil(buckets, cantidad, 0.95),
+                'p99_ms': self._percentil(buckets, cantidad, 0.99),
+                'buckets': acumulados,
+            }
+        return resultado
+
+    def limpiar(self):
+        """Reinicia los histogramas."""
+        with self._lock:
+            self._etapas.clear()
+
+
+histogramas = HistogramasEtapas()
+
+
+@contextmanager
+def medir():
+    """
+    Mide las etapas del código ejecutado dentro del bloque.
+
+    Returns:
+        Medicion (cerrada y registrada en los histogramas al salir), o None
+        si PRECIOS_TIEMPOS está desactivado
+    """
+    if not HABILITADO:
+        yield None
+        return
+
+    medicion = Medicion()
+    token = _medicion.set(medicion)
+    try:
+        with connection.execute_wrapper(medicion.contar_consulta):
+            yield medicion
+    finally:
+        _medicion.reset(token)
+        medicion.cerrar()
+        histogramas.registrar(medicion)
+
+
+def con_server_timing(vista):
+    """Decorador de vistas: mide la vista y agrega el header Server-Timing a su respuesta."""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if not HABILITADO:
+            return vista(*args, **kwargs)
+        with medir() as medicion:
+            response = vista(*args, **kwargs)
+        response['Server-Timing'] = medicion.encabezado()
+        return response
+    return envoltura
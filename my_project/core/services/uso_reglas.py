@@ -0,0 +1,225 @@
+"""
+Estadísticas de uso de reglas y combinaciones (tabla UsoReglaDiario).
+
+Cada línea de DetalleOrdenCompraCliente guarda en reglas_aplicadas y
+combinaciones_aplicadas los ajustes que recibió. La agregación desarma esos
+arreglos JSON en la base de datos (jsonb_array_elements en PostgreSQL,
+json_each en SQLite) y agrupa por día, empresa, sucursal y regla con un único
+GROUP BY, sin traer las líneas a Python.
+
+El refresco es incremental: MarcaAgregacion guarda hasta qué fecha_orden se
+procesó, cada ejecución agrega solo las líneas posteriores y suma los
+resultados a los días ya existentes. La marca se bloquea con SELECT ... FOR
+UPDATE, de modo que dos ejecuciones simultáneas no cuentan la misma línea dos
+veces.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import DetalleOrdenCompraCliente, MarcaAgregacion, UsoReglaDiario
+
+
+MARCA_USO_REGLAS = 'uso_reglas'
+
+# Las líneas con fecha_orden más reciente que esto quedan para la próxima
+# ejecución: fecha_orden se asigna antes del COMMIT y una transacción en curso
+# podría hacer visibles líneas anteriores a la marca ya avanzada
+RETRASO = timedelta(minutes=5)
+
+TAMANO_LOTE = 2000
+
+CENTAVOS = Decimal('0.01')
+
+# (tipo, columna JSON, clave del ID en cada elemento)
+FUENTES = [
+    ('REGLA', 'reglas_aplicadas', 'regla_id'),
+    ('COMBINACION', 'combinaciones_aplicadas', 'combinacion_id'),
+]
+
+# Cómo desarmar un arreglo JSON en filas en cada motor. Los valores que no son
+# arreglos (texto heredado de antes del JSONField) se tratan como vacíos
+ELEMENTOS_JSON = {
+    'postgresql': {
+        'elementos': (
+            "jsonb_array_elements(CASE WHEN jsonb_typeof({columna}) = 'array' "
+            "THEN {columna} ELSE '[]'::jsonb END) AS e(value)"
+        ),
+        'entero': "(e.value ->> '{clave}')::integer",
+        'texto': "(e.value ->> '{clave}')",
+    },
+    'sqlite': {
+        'elementos': (
+            "json_each(CASE WHEN json_type({columna}) = 'array' "
+            "THEN {columna} ELSE '[]' END) AS e"
+        ),
+        'entero': "CAST(json_extract(e.value, '$.{clave}') AS INTEGER)",
+        'texto': "json_extract(e.value, '$.{clave}')",
+    },
+}
+
+
+class ErrorAgregacion(Exception):
+    """El motor de base de datos no permite agregar los arreglos JSON."""
+
+
+def _importe(valor):
+    return Decimal(str(valor or 0)).quantize(CENTAVOS)
+
+
+def _consulta_uso(columna, clave, desde, hasta):
+    """
+    SQL que agrupa los elementos de una columna JSON de los detalles con
+    fecha_orden en (desde, hasta].
+
+    Returns:
+        tuple (sql, params) con filas (fecha, empresa_id, sucursal_id,
+        referencia_id, nombre, veces, unidades, descuento, ingresos)
+    """
+    plantilla = ELEMENTOS_JSON.get(connection.vendor)
+    if plantilla is None:
+        raise ErrorAgregacion(f'La agregación de uso de reglas no admite {connection.vendor}')
+
+    qn = connection.ops.quote_name
+    tabla = qn(DetalleOrdenCompraCliente._meta.db_table)
+    fecha_orden = f'd.{qn("fecha_orden")}'
+    zona = timezone.get_current_timezone_name() if settings.USE_TZ else None
+    fecha_sql, params = connection.ops.datetime_cast_date_sql(fecha_orden, (), zona)
+    params = list(params)
+
+    referencia = plantilla['entero'].format(clave=clave)
+    nombre = plantilla['texto'].format(clave='nombre')
+    elementos = plantilla['elementos'].format(columna=f'd.{qn(columna)}')
+
+    condiciones = []
+    if desde is not None:
+        condiciones.append(f'{fecha_orden} > %s')
+        params.append(desde)
+    condiciones += [f'{fecha_orden} <= %s', f'{referencia} IS NOT NULL']
+    params.append(hasta)
+
+    sql = (
+        f'SELECT {fecha_sql}, d.{qn("empresa_id")}, d.{qn("sucursal_id")}, {referencia}, '
+        f'MAX({nombre}), COUNT(*), SUM(d.{qn("cantidad")}), '
+        f'SUM(d.{qn("descuento_aplicado")} * d.{qn("cantidad")}), SUM(d.{qn("subtotal")}) '
+        f'FROM {tabla} d CROSS JOIN {elementos} '
+        f'WHERE {" AND ".join(condiciones)} '
+        f'GROUP BY 1, 2, 3, 4'
+    )
+    return sql, params
+
+
+def agregar_uso(tipo, columna, clave, desde, hasta):
+    """
+    Agrega en la base de datos el uso de reglas o combinaciones de un período.
+
+    Args:
+        tipo: 'REGLA' o 'COMBINACION'
+        columna: Columna JSON de DetalleOrdenCompraCliente
+        clave: Clave del ID en cada elemento del arreglo
+        desde: fecha_orden exclusiva; None desde el inicio
+        hasta: fecha_orden inclusiva
+
+    Returns:
+        list de UsoReglaDiario sin guardar, uno por día, sucursal y regla
+    """
+    sql, params = _consulta_uso(columna, clave, desde, hasta)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+
+    usos = []
+    for fecha, empresa_id, sucursal_id, referencia_id, nombre, veces, unidades, descuento, ingresos in filas:
+        if isinstance(fecha, str):
+            fecha = date.fromisoformat(fecha)
+        usos.append(UsoReglaDiario(
+            fecha=fecha,
+            empresa_id=empresa_id,
+            sucursal_id=sucursal_id,
+            tipo=tipo,
+            referencia_id=referencia_id,
+            nombre=(nombre or '')[:200],
+            veces_aplicada=veces,
+            unidades=unidades or 0,
+            descuento_total=_importe(descuento),
+            ingresos=_importe(ingresos),
+        ))
+    return usos
+
+
+def _clave(uso):
+    return (uso.fecha, uso.empresa_id, uso.sucursal_id, uso.tipo, uso.referencia_id)
+
+
+def _acumular(usos, tamano_lote):
+    """Suma los usos nuevos a los días ya guardados y crea los que faltan."""
+    if not usos:
+        return 0
+    nuevos = {_clave(uso): uso for uso in usos}
+    existentes = UsoReglaDiario.objects.filter(
+        fecha__in={uso.fecha for uso in usos},
+        referencia_id__in={uso.referencia_id for uso in usos},
+    )
+    actualizados = []
+    for existente in existentes:
+        uso = nuevos.pop(_clave(existente), None)
+        if uso is None:
+            continue
+        existente.nombre = uso.nombre or existente.nombre
+        existente.veces_aplicada += uso.veces_aplicada
+        existente.unidades += uso.unidades
+        existente.descuento_total += uso.descuento_total
+        existente.ingresos += uso.ingresos
+        actualizados.append(existente)
+
+    UsoReglaDiario.objects.bulk_update(
+        actualizados,
+        ['nombre', 'veces_aplicada', 'unidades', 'descuento_total', 'ingresos'],
+        batch_size=tamano_lote
+    )
+    UsoReglaDiario.objects.bulk_create(nuevos.values(), batch_size=tamano_lote)
+    return len(actualizados) + len(nuevos)
+
+
+def refrescar_uso_reglas(hasta=None, tamano_lote=TAMANO_LOTE):
+    """
+    Agrega las líneas de órdenes posteriores a la marca y la avanza.
+
+    Args:
+        hasta: fecha_orden hasta la que se procesa; por defecto ahora menos RETRASO
+        tamano_lote: Filas por INSERT/UPDATE
+
+    Returns:
+        dict con desde, hasta y filas (días escritos)
+    """
+    if hasta is None:
+        hasta = timezone.now() - RETRASO
+
+    with transaction.atomic():
+        marca, _ = MarcaAgregacion.objects.select_for_update().get_or_create(
+            nombre=MARCA_USO_REGLAS
+        )
+        desde = marca.procesado_hasta
+        if desde is not None and hasta <= desde:
+            return {'desde': desde, 'hasta': desde, 'filas': 0}
+
+        usos = []
+        for tipo, columna, clave in FUENTES:
+            usos.extend(agregar_uso(tipo, columna, clave, desde, hasta))
+        filas = _acumular(usos, tamano_lote)
+
+        marca.procesado_hasta = hasta
+        marca.save(update_fields=['procesado_hasta', 'fecha_actualizacion'])
+
+    return {'desde': desde, 'hasta': hasta, 'filas': filas}
+
+
+def reconstruir_uso_reglas(hasta=None, tamano_lote=TAMANO_LOTE):
+    """Borra la tabla resumen y la vuelve a agregar desde todas las órdenes."""
+    with transaction.atomic():
+        MarcaAgregacion.objects.filter(nombre=MARCA_USO_REGLAS).delete()
+        UsoReglaDiario.objects.all().delete()
+        return refrescar_uso_reglas(hasta, tamano_lote)
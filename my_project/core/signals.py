@@ -0,0 +1,137 @@
+"""
+Señales que mantienen al día las listas de precios compiladas.
+
+Cualquier cambio en los datos que usa el motor de precios actualiza
+ListaPrecio.fecha_actualizacion de las listas afectadas. Como la instantánea
+compilada se identifica por esa fecha, todos los procesos recompilan la lista
+en su siguiente cálculo; el proceso actual además la descarta de inmediato.
+
+También marcan como desactualizados los precios efectivos materializados
+(PrecioEfectivo) que dependen del dato modificado.
+
+Las operaciones masivas (QuerySet.update, bulk_create) no emiten señales: tras
+usarlas hay que llamar a tocar_listas() con las listas afectadas.
+"""
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Empresa, GrupoArticulo, Articulo, ListaPrecio, PrecioArticulo,
+    ReglaPrecio, CombinacionProducto, PrecioEfectivo
+)
+from .services.lista_compilada import invalidar_lista
+from .services.cache_listas import invalidar_empresa
+from .services.materializacion import marcar_desactualizados
+
+
+def tocar_listas(listas):
+    """
+    Marca como modificadas las listas indicadas, descarta sus instantáneas locales
+    y las resoluciones de lista vigente en caché de sus empresas.
+
+    Args:
+        listas: QuerySet de ListaPrecio
+    """
+    filas = list(listas.values_list('id', 'empresa_id'))
+    if not filas:
+        return
+    ListaPrecio.objects.filter(id__in=[lista_id for lista_id, _ in filas]).update(
+        fecha_actualizacion=timezone.now()
+    )
+    for lista_id, _ in filas:
+        invalidar_lista(lista_id)
+    for empresa_id in {empresa_id for _, empresa_id in filas}:
+        invalidar_empresa(empresa_id)
+
+
+@receiver(post_save, sender=ListaPrecio)
+@receiver(post_delete, sender=ListaPrecio)
+def lista_precio_modificada(sender, instance, **kwargs):
+    # auto_now ya actualiza fecha_actualizacion al guardar
+    invalidar_lista(instance.id)
+    invalidar_empresa(instance.empresa_id)
+
+
+@receiver(post_save, sender=PrecioArticulo)
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_save, sender=CombinacionProducto)
+@receiver(post_delete, sender=PrecioArticulo)
+@receiver(post_delete, sender=ReglaPrecio)
+@receiver(post_delete, sender=CombinacionProducto)
+def dato_de_lista_modificado(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, ListaPrecio):
+        # Borrado en cascada desde la propia lista: no hay nada que recompilar
+        invalidar_lista(origin.id)
+        return
+    if isinstance(origin, Empresa):
+        return
+    tocar_listas(ListaPrecio.objects.filter(id=instance.lista_precio_id))
+
+
+@receiver(m2m_changed, sender=CombinacionProducto.articulos.through)
+def articulos_de_combinacion_modificados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance es un Articulo; pk_set son combinaciones (None en post_clear)
+        listas = ListaPrecio.objects.filter(empresa_id=instance.empresa_id)
+    else:
+        listas = ListaPrecio.objects.filter(id=instance.lista_precio_id)
+    tocar_listas(listas)
+
+
+@receiver(post_save, sender=Articulo)
+@receiver(post_save, sender=GrupoArticulo)
+@receiver(post_delete, sender=Articulo)
+@receiver(post_delete, sender=GrupoArticulo)
+def jerarquia_articulo_modificada(sender, instance, origin=None, **kwargs):
+    # Costo, grupo o línea de un artículo: afecta a todas las listas de la empresa
+    if isinstance(origin, Empresa):
+        return
+    tocar_listas(ListaPrecio.objects.filter(empresa_id=instance.empresa_id))
+
+
+@receiver(post_save, sender=PrecioArticulo)
+def precio_efectivo_de_precio(sender, instance, **kwargs):
+    marcar_desactualizados([instance.lista_precio_id], articulo_ids=[instance.articulo_id])
+
+
+@receiver(post_delete, sender=PrecioArticulo)
+def precio_efectivo_de_precio_borrado(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (ListaPrecio, Empresa, Articulo)):
+        # El borrado en cascada ya elimina los precios efectivos
+        return
+    PrecioEfectivo.objects.filter(
+        lista_precio_id=instance.lista_precio_id, articulo_id=instance.articulo_id
+    ).delete()
+
+
+@receiver(post_save, sender=ReglaPrecio)
+@receiver(post_delete, sender=ReglaPrecio)
+def precio_efectivo_de_regla(sender, instance, created=False, origin=None, **kwargs):
+    if isinstance(origin, (ListaPrecio, Empresa)):
+        return
+    if created or kwargs.get('signal') is post_delete:
+        # La regla solo alcanza a los artículos de su línea o grupo
+        marcar_desactualizados(
+            [instance.lista_precio_id],
+            linea_id=instance.linea_articulo_id,
+            grupo_id=instance.grupo_articulo_id
+        )
+    else:
+        # Al editarla no se conoce el filtro anterior: toda la lista
+        marcar_desactualizados([instance.lista_precio_id])
+
+
+@receiver(post_save, sender=Articulo)
+def precio_efectivo_de_articulo(sender, instance, **kwargs):
+    # El costo define bajo_costo y es_valido; el grupo, qué reglas aplican
+    listas = ListaPrecio.objects.filter(empresa_id=instance.empresa_id).values('id')
+    marcar_desactualizados(listas, articulo_ids=[instance.id])
+
+
+@receiver(post_save, sender=GrupoArticulo)
+def precio_efectivo_de_grupo(sender, instance, **kwargs):
+    listas = ListaPrecio.objects.filter(empresa_id=instance.empresa_id).values('id')
+    marcar_desactualizados(listas, grupo_id=instance.id)
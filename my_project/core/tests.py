@@ -1,3 +1,1329 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import (
+    Empresa, Sucursal, LineaArticulo, GrupoArticulo, Articulo,
+    ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto,
+    DetalleOrdenCompraCliente, UsoReglaDiario, Usuario
+)
+from .admin_rendimiento import ConteoEstimadoPaginator
+from .metricas import ErrorMetricas
+from .services.cache_cotizaciones import cache_cotizaciones
+from .services.cache_listas import obtener_cache, segundos_hasta_proximo_limite
+from .services.exportacion import CAMPOS_EXPORTACION, exportar_csv
+from .services.lista_compilada import invalidar_todas, obtener_lista_compilada
+from .services.materializacion import materializar_lista
+from .services.precio_service import PrecioService
+from .services.tiempos import histogramas
+from .services.uso_reglas import refrescar_uso_reglas
+
+
+class DatosPrecioMixin:
+    """Crea una empresa con una lista vigente, reglas y combinaciones"""
+
+    TOTAL_ARTICULOS = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        hoy = timezone.now().date()
+        cls.empresa = Empresa.objects.create(nombre='Empresa Test', ruc='20000000001')
+        cls.sucursal = Sucursal.objects.create(empresa=cls.empresa, nombre='Sede', codigo='SUC-T-001')
+        cls.linea = LineaArticulo.objects.create(empresa=cls.empresa, nombre='Abarrotes', codigo='LIN-001')
+        cls.grupo = GrupoArticulo.objects.create(
+            empresa=cls.empresa, linea=cls.linea, nombre='Arroz', codigo='GRP-001'
+        )
+        cls.otro_grupo = GrupoArticulo.objects.create(
+            empresa=cls.empresa, linea=cls.linea, nombre='Fideos', codigo='GRP-002'
+        )
+        cls.lista = ListaPrecio.objects.create(
+            empresa=cls.empresa,
+            sucursal=cls.sucursal,
+            nombre='Lista Mayorista',
+            tipo='MAYORISTA',
+            canal='DISTRIBUIDOR',
+            fecha_inicio=hoy - timedelta(days=10),
+            fecha_fin=hoy + timedelta(days=10),
+        )
+        cls.articulos = []
+        for i in range(cls.TOTAL_ARTICULOS):
+            articulo = Articulo.objects.create(
+                empresa=cls.empresa,
+                grupo=cls.grupo if i % 2 else cls.otro_grupo,
+                codigo=f'ART-{i:03d}',
+                nombre=f'Artículo {i}',
+                ultimo_costo=Decimal('10.00') + i,
+            )
+            PrecioArticulo.objects.create(
+                lista_precio=cls.lista,
+                articulo=articulo,
+                precio_base=(Decimal('10.00') + i) * Decimal('1.30'),
+            )
+            cls.articulos.append(articulo)
+
+        ReglaPrecio.objects.create(
+            lista_precio=cls.lista, nombre='Canal', tipo_regla='CANAL',
+            valor_ajuste=Decimal('2.00'), prioridad=1,
+        )
+        ReglaPrecio.objects.create(
+            lista_precio=cls.lista, nombre='Escala 10-50', tipo_regla='ESCALA_UNIDADES',
+            grupo_articulo=cls.grupo, cantidad_minima=10, cantidad_maxima=50,
+            valor_ajuste=Decimal('5.00'), prioridad=2,
+        )
+        ReglaPrecio.objects.create(
+            lista_precio=cls.lista, nombre='Pedido grande', tipo_regla='MONTO_PEDIDO',
+            tipo_ajuste='MONTO_FIJO', linea_articulo=cls.linea, monto_minimo=Decimal('1000.00'),
+            valor_ajuste=Decimal('0.50'), prioridad=3,
+        )
+        CombinacionProducto.objects.create(
+            lista_precio=cls.lista, nombre='Combo grupo', grupo_articulo=cls.grupo,
+            cantidad_minima=2, valor_descuento=Decimal('3.00'),
+        )
+        combo = CombinacionProducto.objects.create(
+            lista_precio=cls.lista, nombre='Pack', cantidad_minima=2,
+            tipo_descuento='MONTO_FIJO', valor_descuento=Decimal('1.00'),
+        )
+        combo.articulos.add(cls.articulos[0], cls.articulos[2])
+
+    def setUp(self):
+        self.limpiar_caches()
+
+    def limpiar_caches(self):
+        invalidar_todas()
+        obtener_cache().clear()
+        cache_cotizaciones.limpiar()
+
+    def items(self, total, cantidad=12):
+        return [
+            {'articulo_id': articulo.id, 'cantidad': cantidad + i}
+            for i, articulo in enumerate(self.articulos[:total])
+        ]
+
+
+class CalculoPreciosLoteTests(DatosPrecioMixin, TestCase):
+
+    def test_lote_igual_a_calculo_individual(self):
+        items = self.items(20) + [{'articulo_id': 999999, 'cantidad': 1}]
+        lote = PrecioService.calcular_precios_lote(
+            self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR', items
+        )
+
+        for item, resultado in zip(items, lote['items']):
+            esperado = PrecioService.calcular_precio(
+                empresa_id=self.empresa.id,
+                sucursal_id=self.sucursal.id,
+                articulo_id=item['articulo_id'],
+                canal='DISTRIBUIDOR',
+                cantidad=item['cantidad'],
+                monto_pedido_total=lote['monto_pedido_total'],
+                items_pedido=items,
+            )
+            self.assertEqual(resultado, esperado)
+
+    def test_consultas_constantes_sin_importar_cantidad_de_items(self):
+        conteos = []
+        for total in (1, 10, self.TOTAL_ARTICULOS):
+            self.limpiar_caches()
+            with CaptureQueriesContext(connection) as consultas:
+                PrecioService.calcular_precios_lote(
+                    self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR', self.items(total)
+                )
+            conteos.append(len(consultas))
+
+        self.assertEqual(len(set(conteos)), 1, conteos)
+
+    def test_endpoint_calcular_lote(self):
+        items = self.items(5)
+        response = APIClient().post('/api/precios/calcular_lote/', {
+            'empresa_id': self.empresa.id,
+            'sucursal_id': self.sucursal.id,
+            'canal': 'DISTRIBUIDOR',
+            'items': items,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), len(items))
+        self.assertEqual(
+            [r['lista_precio_id'] for r in response.data['items']],
+            [self.lista.id] * len(items)
+        )
+
+    def test_endpoint_calcular_pedido_valida_items(self):
+        articulo = self.articulos[1]
+        response = APIClient().post('/api/pedidos/calcular_pedido/', {
+            'empresa_id': str(self.empresa.id),
+            'sucursal_id': str(self.sucursal.id),
+            'canal': 'DISTRIBUIDOR',
+            'items': [{'articulo_id': str(articulo.id), 'cantidad': '3'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        item = response.data['items'][0]
+        self.assertNotIn('error', item)
+        self.assertEqual(item['articulo_codigo'], articulo.codigo)
+        self.assertEqual(item['cantidad'], 3)
+
+        for items in ([{'articulo_id': articulo.id}], [{'articulo_id': 'abc', 'cantidad': 1}], []):
+            response = APIClient().post('/api/pedidos/calcular_pedido/', {
+                'empresa_id': self.empresa.id, 'canal': 'DISTRIBUIDOR', 'items': items,
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('items', response.data)
+
+
+class ListaCompiladaTests(DatosPrecioMixin, TestCase):
+
+    def calcular(self, articulo, cantidad=12):
+        return PrecioService.calcular_precio(
+            self.empresa.id, self.sucursal.id, articulo.id, 'DISTRIBUIDOR', cantidad
+        )
+
+    def test_calculo_en_caliente_sin_consultas(self):
+        # Con caché compartida la lista vigente no se revalida contra la base de datos
+        with self.settings(PRECIOS_CACHE_COMPARTIDA=True):
+            self.calcular(self.articulos[0])
+            with self.assertNumQueries(0):
+                for articulo in self.articulos[1:10]:
+                    self.calcular(articulo, cantidad=20)
+
+    def test_instantanea_se_recompila_tras_cambios(self):
+        articulo = self.articulos[1]
+        items = [{'articulo_id': a.id, 'cantidad': 1} for a in (articulo, self.articulos[3])]
+
+        def compilada():
+            self.lista.refresh_from_db()
+            return obtener_lista_compilada(self.lista)
+
+        anterior = compilada()
+        self.assertIs(compilada(), anterior)
+        precio = self.calcular(articulo)['precio_final']
+
+        precio_articulo = PrecioArticulo.objects.get(lista_precio=self.lista, articulo=articulo)
+        precio_articulo.precio_base *= 2
+        precio_articulo.save()
+        self.assertIsNot(compilada(), anterior)
+        anterior = compilada()
+        self.assertGreater(self.calcular(articulo)['precio_final'], precio)
+        precio = self.calcular(articulo)['precio_final']
+
+        regla = ReglaPrecio.objects.get(lista_precio=self.lista, tipo_regla='CANAL')
+        regla.valor_ajuste = Decimal('20.00')
+        regla.save()
+        self.assertIsNot(compilada(), anterior)
+        anterior = compilada()
+        self.assertLess(self.calcular(articulo)['precio_final'], precio)
+
+        self.assertEqual(
+            [c['nombre'] for c in PrecioService.evaluar_combinaciones(self.lista, items)], ['Combo grupo']
+        )
+        CombinacionProducto.objects.get(lista_precio=self.lista, nombre='Combo grupo').delete()
+        self.assertIsNot(compilada(), anterior)
+        self.assertEqual(PrecioService.evaluar_combinaciones(self.lista, items), [])
+
+
+class IndiceReglasTests(DatosPrecioMixin, TestCase):
+
+    def test_indice_igual_a_recorrido_secuencial(self):
+        for i in range(1, 20, 3):
+            ReglaPrecio.objects.create(
+                lista_precio=self.lista, nombre=f'Escala {i}', tipo_regla='ESCALA_UNIDADES',
+                linea_articulo=self.linea if i % 2 else None, cantidad_minima=i * 5,
+                cantidad_maxima=i * 5 + 12, valor_ajuste=Decimal('1.00'), prioridad=i % 4 + 1,
+            )
+            ReglaPrecio.objects.create(
+                lista_precio=self.lista, nombre=f'Monto {i}', tipo_regla='ESCALA_MONTO',
+                grupo_articulo=self.grupo, monto_minimo=Decimal(i * 100),
+                monto_maximo=None if i > 15 else Decimal(i * 100 + 250),
+                valor_ajuste=Decimal('0.50'), prioridad=i % 3 + 1,
+            )
+        self.lista.refresh_from_db()
+
+        for articulo in self.articulos[:4]:
+            for cantidad in (1, 5, 10, 17, 50, 99, 150):
+                for monto in (0, 999, Decimal('1000.00'), 5000.0):
+                    self.assertEqual(
+                        PrecioService.aplicar_reglas(self.lista, articulo, cantidad, monto, 'TIENDA'),
+                        PrecioService.aplicar_reglas_secuencial(self.lista, articulo, cantidad, monto, 'TIENDA'),
+                    )
+
+
+class AjustesPrecioTests(SimpleTestCase):
+
+    def importe(self, rnd):
+        return Decimal(rnd.randint(0, 10 ** rnd.randint(1, 8))) / 100
+
+    def test_equivalente_al_calculo_original_en_pilas_aleatorias(self):
+        rnd = random.Random(20240611)
+        for _ in range(3000):
+            precio_base = self.importe(rnd)
+            reglas = [
+                {
+                    'tipo_ajuste': rnd.choice(['PORCENTAJE', 'PORCENTAJE', 'MONTO_FIJO', 'PRECIO_FIJO']),
+                    'valor_ajuste': Decimal(rnd.randint(0, 9999)) / 100 if rnd.random() < 0.7 else self.importe(rnd),
+                }
+                # Pilas largas para llegar al redondeo a 28 dígitos de Decimal
+                for _ in range(rnd.choice([0, 1, 2, 3, 5, 12, 40]))
+            ]
+            combinaciones = [
+                {
+                    'tipo_descuento': rnd.choice(['PORCENTAJE', 'MONTO_FIJO', 'PRECIO_FIJO']),
+                    'valor_descuento': Decimal(rnd.randint(0, 5000)) / 100,
+                }
+                for _ in range(rnd.randint(0, 3))
+            ]
+            articulo = SimpleNamespace(ultimo_costo=self.importe(rnd))
+            descuento_proveedor = rnd.choice([0, Decimal('50.00'), Decimal('65.50'), Decimal('70'), Decimal('80')])
+
+            esperado = PrecioService.aplicar_ajustes_secuencial(precio_base, reglas, combinaciones)
+            obtenido = PrecioService.aplicar_ajustes(precio_base, reglas, combinaciones)
+            self.assertEqual(obtenido, esperado)
+            self.assertEqual(float(obtenido), float(esperado))
+            self.assertEqual(float(precio_base - obtenido), float(precio_base - esperado))
+            self.assertEqual(
+                PrecioService.validar_costo(obtenido, articulo, descuento_proveedor),
+                PrecioService.validar_costo(esperado, articulo, descuento_proveedor)
+            )
+
+
+class SimulacionTests(DatosPrecioMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest('numpy no está instalado')
+
+    def test_igual_al_calculo_por_articulo(self):
+        from .services.simulacion import arreglos_lista, precios_finales, validar_costos
+
+        ReglaPrecio.objects.create(
+            lista_precio=self.lista, nombre='Monto artículo', tipo_regla='ESCALA_MONTO',
+            grupo_articulo=self.otro_grupo, monto_minimo=Decimal('300.00'), monto_maximo=Decimal('500.00'),
+            valor_ajuste=Decimal('8.00'), prioridad=2,
+        )
+        ReglaPrecio.objects.create(
+            lista_precio=self.lista, nombre='Liquidación', tipo_regla='CANAL', tipo_ajuste='PRECIO_FIJO',
+            grupo_articulo=self.grupo, valor_ajuste=Decimal('12.00'), prioridad=4,
+        )
+        self.lista.refresh_from_db()
+        compilada = obtener_lista_compilada(self.lista)
+        arreglos = arreglos_lista(compilada)
+
+        for canal, cantidad, monto in (('DISTRIBUIDOR', 20, Decimal('1500')), ('TIENDA', 1, 0)):
+            canal_aplica = canal == compilada.canal
+            precio_final = precios_finales(arreglos, compilada.reglas, canal_aplica, cantidad, monto)
+            _, bajo_costo = validar_costos(arreglos, precio_final)
+            for i, articulo_id in enumerate(arreglos.articulo_id.tolist()):
+                exacto = PrecioService._calcular_en_lista(compilada, articulo_id, canal, cantidad, monto, [])
+                self.assertAlmostEqual(precio_final[i], exacto['precio_final'], places=9)
+                self.assertEqual(bool(bajo_costo[i]), exacto['bajo_costo'])
+
+    def test_resumen(self):
+        from .services.simulacion import simular_lista
+
+        resumen = simular_lista(self.lista)
+        self.assertEqual(resumen['articulos'], self.TOTAL_ARTICULOS)
+        self.assertEqual(resumen['bajo_costo'], 0)
+        self.assertEqual(resumen['descuento_promedio'], 2.0)
+        self.assertEqual(sum(tramo['articulos'] for tramo in resumen['margen']['tramos']), self.TOTAL_ARTICULOS)
+
+        descuento_total = ReglaPrecio(
+            lista_precio=self.lista, nombre='Borrador', tipo_regla='CANAL',
+            valor_ajuste=Decimal('40.00'), prioridad=1,
+        )
+        resumen = simular_lista(self.lista, [*obtener_lista_compilada(self.lista).reglas, descuento_total])
+        self.assertEqual(resumen['bajo_costo'], self.TOTAL_ARTICULOS)
+        self.assertEqual(resumen['no_validos'], self.TOTAL_ARTICULOS)
+
+
+class SimulacionReglasEndpointTests(DatosPrecioMixin, TestCase):
+
+    URL = '/api/reglas-precios/simular/'
+
+    def setUp(self):
+        super().setUp()
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest('numpy no está instalado')
+        self.client = APIClient()
+
+    def test_diferencias_de_una_regla_en_borrador(self):
+        DetalleOrdenCompraCliente.objects.create(
+            numero_orden='OC-1', empresa=self.empresa, articulo=self.articulos[1], lista_precio=self.lista,
+            cantidad=1, precio_unitario=Decimal('10'), precio_base=Decimal('10'), subtotal=Decimal('10'),
+        )
+        reglas_antes = ReglaPrecio.objects.count()
+
+        response = self.client.post(f'{self.URL}?page_size=7', {
+            'lista_precio_id': self.lista.id,
+            'reglas': [{
+                'nombre': 'Canal arroz', 'tipo_regla': 'CANAL', 'grupo_articulo': self.grupo.id,
+                'valor_ajuste': '10.00', 'prioridad': 5,
+            }],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ReglaPrecio.objects.count(), reglas_antes)
+        self.assertEqual(response.data['count'], self.TOTAL_ARTICULOS // 2)
+        self.assertEqual(response.data['resumen']['cambian_precio'], self.TOTAL_ARTICULOS // 2)
+        self.assertEqual(response.data['resumen']['ordenes_afectadas'], 1)
+        self.assertEqual(len(response.data['results']), 7)
+        compilada = obtener_lista_compilada(self.lista)
+        for fila in response.data['results']:
+            exacto = PrecioService._calcular_en_lista(compilada, fila['articulo_id'], 'DISTRIBUIDOR', 1, 0, [])
+            self.assertAlmostEqual(fila['precio_final_actual'], exacto['precio_final'], places=6)
+            self.assertAlmostEqual(fila['precio_final_nuevo'], exacto['precio_final'] * 0.9, places=6)
+
+    def test_editar_y_eliminar_reglas(self):
+        canal = ReglaPrecio.objects.get(lista_precio=self.lista, tipo_regla='CANAL')
+        escala = ReglaPrecio.objects.get(lista_precio=self.lista, tipo_regla='ESCALA_UNIDADES')
+
+        response = self.client.post(f'{self.URL}?formato=ndjson', {
+            'lista_precio_id': self.lista.id,
+            'reglas': [{'id': canal.id, 'valor_ajuste': '2.00'}],
+            'eliminar': [escala.id],
+            'cantidad': 20,
+        }, format='json')
+        filas = [json.loads(linea) for linea in b''.join(response.streaming_content).splitlines()]
+        # Solo cambian los artículos del grupo de la regla de escala eliminada
+        self.assertEqual(len(filas), self.TOTAL_ARTICULOS // 2)
+        self.assertTrue(all(f['precio_final_nuevo'] > f['precio_final_actual'] for f in filas))
+
+        response = self.client.post(self.URL, {
+            'lista_precio_id': self.lista.id,
+            'reglas': [{'id': canal.id, 'cantidad_minima': 10, 'cantidad_maxima': 5}, {'nombre': 'Sin tipo'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['reglas']), {0, 1})
+
+
+class ConfirmarPedidoTests(DatosPrecioMixin, TestCase):
+
+    URL = '/api/pedidos/confirmar/'
+
+    def cuerpo(self, numero_orden, items):
+        return {
+            'numero_orden': numero_orden, 'empresa_id': self.empresa.id,
+            'sucursal_id': self.sucursal.id, 'canal': 'DISTRIBUIDOR', 'items': items,
+        }
+
+    def test_confirmar_es_idempotente(self):
+        client = APIClient()
+        items = self.items(12)
+
+        response = client.post(self.URL, self.cuerpo('OC-100', items), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([linea['linea'] for linea in response.data['lineas']], list(range(1, 13)))
+
+        cotizado = PrecioService.calcular_precios_lote(
+            self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR', items
+        )['items']
+        detalles = list(DetalleOrdenCompraCliente.objects.filter(numero_orden='OC-100').order_by('linea'))
+        for detalle, resultado in zip(detalles, cotizado):
+            self.assertEqual(detalle.precio_unitario, Decimal(str(round(resultado['precio_final'], 2))))
+            self.assertEqual(
+                [regla['regla_id'] for regla in detalle.reglas_aplicadas],
+                [regla['regla_id'] for regla in resultado['reglas_aplicadas']]
+            )
+
+        response = client.post(self.URL, self.cuerpo('OC-100', items), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['creada'])
+        self.assertEqual(DetalleOrdenCompraCliente.objects.filter(numero_orden='OC-100').count(), 12)
+
+    @skipUnlessDBFeature('supports_json_field_contains')
+    def test_filtro_por_regla_aplicada(self):
+        client = APIClient()
+        client.post(self.URL, self.cuerpo('OC-200', self.items(20)), format='json')
+        escala = ReglaPrecio.objects.get(lista_precio=self.lista, tipo_regla='ESCALA_UNIDADES')
+        # Línea registrada una por una con el texto JSON de antes
+        response = client.post('/api/ordenes-compra/', {
+            'numero_orden': 'OC-201', 'empresa': self.empresa.id, 'articulo': self.articulos[1].id,
+            'lista_precio': self.lista.id, 'cantidad': 1, 'precio_unitario': '10.00',
+            'precio_base': '10.00', 'subtotal': '10.00',
+            'reglas_aplicadas': json.dumps([{'regla_id': escala.id, 'nombre': 'Escala 10-50'}]),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = client.get('/api/ordenes-compra/', {'regla_id': escala.id, 'page_size': 100})
+        esperados = {
+            (detalle.numero_orden, detalle.articulo_id)
+            for detalle in DetalleOrdenCompraCliente.objects.all()
+            if any(regla['regla_id'] == escala.id for regla in detalle.reglas_aplicadas)
+        }
+        self.assertEqual({(fila['numero_orden'], fila['articulo']) for fila in response.data['results']}, esperados)
+        self.assertIn(('OC-201', self.articulos[1].id), esperados)
+        # Artículos del grupo con cantidad 12 a 31
+        self.assertEqual(len(esperados), 11)
+        self.assertEqual(client.get('/api/ordenes-compra/', {'regla_id': 'x'}).status_code, 400)
+
+    def test_consultas_constantes_y_sin_escritura_parcial(self):
+        client = APIClient()
+        consultas = []
+        # La primera orden compila la lista; se comparan las siguientes
+        for numero_orden, total in (('OC-0', 1), ('OC-1', 2), ('OC-2', 40)):
+            with CaptureQueriesContext(connection) as contexto:
+                response = client.post(self.URL, self.cuerpo(numero_orden, self.items(total)), format='json')
+            self.assertEqual(response.status_code, 201)
+            consultas.append(len(contexto))
+        self.assertEqual(consultas[1], consultas[2])
+
+        otro = Articulo.objects.create(
+            empresa=self.empresa, grupo=self.grupo, codigo='SIN-PRECIO', nombre='Sin precio'
+        )
+        items = self.items(3) + [{'articulo_id': otro.id, 'cantidad': 1}]
+        response = client.post(self.URL, self.cuerpo('OC-3', items), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['lineas'][0]['linea'], 4)
+        self.assertFalse(DetalleOrdenCompraCliente.objects.filter(numero_orden='OC-3').exists())
+
+
+class UsoReglasTests(DatosPrecioMixin, TestCase):
+
+    def confirmar(self, numero_orden, items):
+        response = APIClient().post('/api/pedidos/confirmar/', {
+            'numero_orden': numero_orden, 'empresa_id': self.empresa.id,
+            'sucursal_id': self.sucursal.id, 'canal': 'DISTRIBUIDOR', 'items': items,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def esperado(self):
+        """Agregación en Python de todas las líneas, para comparar con la tabla resumen"""
+        totales = {}
+        for detalle in DetalleOrdenCompraCliente.objects.all():
+            aplicadas = [('REGLA', regla['regla_id']) for regla in detalle.reglas_aplicadas]
+            aplicadas += [('COMBINACION', c['combinacion_id']) for c in detalle.combinaciones_aplicadas]
+            for tipo, referencia_id in aplicadas:
+                clave = (detalle.fecha_orden.date(), detalle.sucursal_id, tipo, referencia_id)
+                veces, unidades, descuento, ingresos = totales.get(clave, (0, 0, 0, 0))
+                totales[clave] = (
+                    veces + 1, unidades + detalle.cantidad,
+                    descuento + detalle.descuento_aplicado * detalle.cantidad,
+                    ingresos + detalle.subtotal,
+                )
+        return totales
+
+    def resumen(self):
+        return {
+            (uso.fecha, uso.sucursal_id, uso.tipo, uso.referencia_id):
+                (uso.veces_aplicada, uso.unidades, uso.descuento_total, uso.ingresos)
+            for uso in UsoReglaDiario.objects.all()
+        }
+
+    def test_refresco_incremental_igual_a_agregar_todo(self):
+        self.confirmar('OC-1', self.items(8))
+        self.assertEqual(refrescar_uso_reglas(hasta=timezone.now())['filas'], 5)
+        self.confirmar('OC-2', self.items(30, cantidad=1))
+        self.confirmar('OC-3', self.items(3, cantidad=40))
+        refrescar_uso_reglas(hasta=timezone.now())
+
+        esperado = self.esperado()
+        self.assertEqual(self.resumen(), esperado)
+        self.assertEqual({tipo for _, _, tipo, _ in esperado}, {'REGLA', 'COMBINACION'})
+        # Sin líneas nuevas no se vuelve a sumar nada
+        self.assertEqual(refrescar_uso_reglas(hasta=timezone.now())['filas'], 0)
+        self.assertEqual(self.resumen(), esperado)
+
+        escala = ReglaPrecio.objects.get(lista_precio=self.lista, tipo_regla='ESCALA_UNIDADES')
+        response = APIClient().get('/api/uso-reglas/resumen/', {
+            'empresa_id': self.empresa.id, 'tipo': 'REGLA', 'desde': timezone.now().date().isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        fila = next(fila for fila in response.data if fila['referencia_id'] == escala.id)
+        self.assertEqual(fila['nombre_referencia'], 'Escala 10-50')
+        self.assertEqual(
+            fila['total_veces_aplicada'],
+            sum(veces for (_, _, tipo, referencia_id), (veces, *_) in esperado.items()
+                if (tipo, referencia_id) == ('REGLA', escala.id))
+        )
+        self.assertEqual(
+            APIClient().get('/api/uso-reglas/', {'desde': 'ayer'}).status_code, 400
+        )
+
+
+class MetricasTests(DatosPrecioMixin, TestCase):
+
+    def muestra(self, nombre, **etiquetas):
+        return self.registro.get_sample_value(nombre, etiquetas) or 0
+
+    def test_metricas_por_ruta_y_caches(self):
+        try:
+            import prometheus_client
+        except ImportError:
+            self.skipTest('prometheus_client no está instalado')
+        self.registro = prometheus_client.REGISTRY
+
+        ruta = 'api/listas-precios/{pk}/precios/'
+        peticiones = self.muestra('precios_http_duracion_segundos_count', ruta=ruta, metodo='GET')
+        filas = self.muestra('precios_http_filas_sum', ruta=ruta)
+        consultas = self.muestra('precios_http_consultas_db_sum', ruta=ruta)
+        self.client.get(f'/api/listas-precios/{self.lista.id}/precios/')
+        self.assertEqual(self.muestra('precios_http_duracion_segundos_count', ruta=ruta, metodo='GET'), peticiones + 1)
+        self.assertEqual(self.muestra('precios_http_filas_sum', ruta=ruta), filas + self.TOTAL_ARTICULOS)
+        self.assertGreater(self.muestra('precios_http_consultas_db_sum', ruta=ruta), consultas)
+
+        aciertos = self.muestra('precios_cache_aciertos_total', cache='cotizaciones')
+        for _ in range(2):
+            self.client.post('/api/precios/calcular/', {
+                'empresa_id': self.empresa.id, 'sucursal_id': self.sucursal.id,
+                'articulo_id': self.articulos[1].id, 'canal': 'DISTRIBUIDOR', 'cantidad': 12,
+            }, content_type='application/json')
+        self.assertEqual(self.muestra('precios_cache_aciertos_total', cache='cotizaciones'), aciertos + 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'precios_http_duracion_segundos_bucket{le="0.001",metodo="POST",ruta="api/precios/calcular/"}')
+        self.assertContains(response, 'precios_cache_fallos_total{cache="lista_compilada"}')
+
+    def test_middleware_asincrono(self):
+        try:
+            import prometheus_client
+        except ImportError:
+            self.skipTest('prometheus_client no está instalado')
+        self.registro = prometheus_client.REGISTRY
+        from asgiref.sync import async_to_sync, iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .metricas import MetricasMiddleware
+
+        async def vista(request):
+            return HttpResponse()
+
+        middleware = MetricasMiddleware(vista)
+        self.assertTrue(iscoroutinefunction(middleware))
+        antes = self.muestra('precios_http_duracion_segundos_count', ruta='sin_ruta', metodo='GET')
+        async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(
+            self.muestra('precios_http_duracion_segundos_count', ruta='sin_ruta', metodo='GET'), antes + 1
+        )
+
+    def test_sin_prometheus_client(self):
+        with mock.patch('core.metricas._prometheus', side_effect=ErrorMetricas('sin prometheus_client')):
+            self.assertEqual(self.client.get('/metrics').status_code, 503)
+
+
+class PaginasHtmlTests(DatosPrecioMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Fragmentos de plantillas ({% cache %})
+        cache.clear()
+
+    def test_inicio_cachea_fragmentos_por_version(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/')
+        self.assertEqual(response.context['total_articulos'], self.TOTAL_ARTICULOS)
+        self.assertContains(response, 'Lista Mayorista')
+        # Contadores y versión en una consulta; el fragmento sale de la caché
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get('/'), 'Lista Mayorista')
+
+        self.lista.nombre = 'Lista Renombrada'
+        self.lista.save()
+        self.assertContains(self.client.get('/'), 'Lista Renombrada')
+
+    def test_contadores_de_empresas_y_dashboard(self):
+        Sucursal.objects.create(empresa=self.empresa, nombre='Cerrada', codigo='SUC-T-002', activo=False)
+        ListaPrecio.objects.create(
+            empresa=self.empresa, nombre='Lista Tienda', tipo='MINORISTA', canal='TIENDA',
+            fecha_inicio=timezone.now().date(),
+        )
+        with self.assertNumQueries(2):
+            response = self.client.get('/empresas/')
+        empresa = response.context['empresas'][0]
+        # Sin multiplicar sucursales por listas
+        self.assertEqual((empresa.total_sucursales, empresa.total_listas), (2, 2))
+
+        url = f'/empresa/{self.empresa.id}/dashboard/'
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual((response.context['total_sucursales'], response.context['total_listas']), (1, 2))
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(url), 'Lista Tienda')
+
+
+class CacheCotizacionesTests(DatosPrecioMixin, TestCase):
+
+    def cotizar(self, articulo, cantidad, monto=Decimal('0')):
+        return PrecioService.calcular_precio(
+            self.empresa.id, self.sucursal.id, articulo.id, 'DISTRIBUIDOR', cantidad, monto
+        )
+
+    def test_misma_cotizacion_que_sin_cache(self):
+        compilada = obtener_lista_compilada(self.lista)
+        for articulo in self.articulos[:6]:
+            for cantidad in (1, 9, 10, 11, 50, 51, 200):
+                for monto in (Decimal('0'), Decimal('999.99'), Decimal('1000.00'), Decimal('5000')):
+                    for _ in range(2):
+                        self.assertEqual(
+                            self.cotizar(articulo, cantidad, monto),
+                            PrecioService._calcular_en_lista(
+                                compilada, articulo.id, 'DISTRIBUIDOR', cantidad, monto, []
+                            )
+                        )
+        estadisticas = cache_cotizaciones.estadisticas()
+        # Cantidades 1/9, 10/11/50 y 51/200 y montos 0/999.99 y 1000/5000 comparten banda
+        self.assertEqual(estadisticas['fallos'], 6 * 3 * 2)
+        self.assertEqual(estadisticas['aciertos'], 6 * 7 * 4 * 2 - 6 * 3 * 2)
+
+    def test_cambios_de_la_lista_invalidan(self):
+        articulo = self.articulos[1]
+        precio = self.cotizar(articulo, 12)['precio_final']
+
+        escala = ReglaPrecio.objects.get(lista_precio=self.lista, tipo_regla='ESCALA_UNIDADES')
+        escala.valor_ajuste = Decimal('10.00')
+        escala.save()
+        self.assertLess(self.cotizar(articulo, 20)['precio_final'], precio)
+
+        # 12 y 20 están en la misma banda de la regla de escala
+        self.assertFalse(self.cotizar(articulo, 12)['bajo_costo'])
+        articulo.ultimo_costo = Decimal('100.00')
+        articulo.save()
+        self.assertTrue(self.cotizar(articulo, 12)['bajo_costo'])
+
+        response = APIClient().get('/api/precios/cache/')
+        self.assertEqual((response.data['fallos'], response.data['aciertos']), (3, 1))
+
+
+class TiemposEtapasTests(DatosPrecioMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        histogramas.limpiar()
+
+    def calcular(self):
+        return APIClient().post('/api/precios/calcular/', {
+            'empresa_id': self.empresa.id, 'sucursal_id': self.sucursal.id,
+            'articulo_id': self.articulos[1].id, 'canal': 'DISTRIBUIDOR', 'cantidad': 12,
+        }, format='json')
+
+    def etapas(self, response):
+        return {
+            parte.split(';')[0]: parte.split('desc="')[1].split(' ')[0]
+            for parte in response['Server-Timing'].split(', ')
+        }
+
+    def test_desactivado_sin_header_ni_histogramas(self):
+        self.assertNotIn('Server-Timing', self.calcular())
+        self.assertEqual(histogramas.estadisticas(), {})
+
+    @mock.patch('core.services.tiempos.HABILITADO', True)
+    def test_server_timing_e_histogramas(self):
+        etapas = self.etapas(self.calcular())
+        self.assertEqual(list(etapas), [
+            'lista_vigente', 'cache_cotizaciones', 'precio_base', 'articulo', 'reglas',
+            'ajustes', 'validacion_costo', 'total',
+        ])
+        # Solo la lista vigente consulta la base de datos
+        self.assertGreater(int(etapas['lista_vigente']), 0)
+        self.assertEqual(etapas['reglas'], '0')
+
+        # Segunda vez: acierto de la caché de cotizaciones
+        self.assertEqual(list(self.etapas(self.calcular())), ['lista_vigente', 'cache_cotizaciones', 'total'])
+
+        response = APIClient().post('/api/pedidos/calcular_pedido/', {
+            'empresa_id': self.empresa.id, 'sucursal_id': self.sucursal.id,
+            'canal': 'DISTRIBUIDOR', 'items': self.items(3),
+        }, format='json')
+        self.assertIn('combinaciones', self.etapas(response))
+
+        estadisticas = APIClient().get('/api/precios/tiempos/').data
+        self.assertEqual(estadisticas['total']['cantidad'], 3)
+        self.assertEqual(estadisticas['reglas']['cantidad'], 2)
+        self.assertEqual(estadisticas['reglas']['buckets'][-1], [None, 2])
+
+
+class AdminRendimientoTests(DatosPrecioMixin, TestCase):
+
+    CHANGELISTS = [
+        'articulo', 'precioarticulo', 'precioefectivo', 'detalleordencompracliente',
+        'grupoarticulo', 'listaprecio', 'reglaprecio', 'combinacionproducto',
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(Usuario.objects.create_superuser('admin', 'admin@test.com', 'x'))
+
+    def consultas(self, modelo):
+        with CaptureQueriesContext(connection) as contexto:
+            response = self.client.get(f'/admin/core/{modelo}/')
+        self.assertEqual(response.status_code, 200)
+        return len(contexto)
+
+    def agregar_filas(self):
+        """Otra lista, línea y grupos con sus precios, reglas y órdenes"""
+        linea = LineaArticulo.objects.create(empresa=self.empresa, nombre='Bebidas', codigo='LIN-002')
+        for i in range(3):
+            GrupoArticulo.objects.create(empresa=self.empresa, linea=linea, nombre=f'G{i}', codigo=f'GRP-B{i}')
+        lista = ListaPrecio.objects.create(
+            empresa=self.empresa, sucursal=self.sucursal, nombre='Lista Tienda', tipo='MINORISTA',
+            canal='TIENDA', fecha_inicio=timezone.now().date(),
+        )
+        PrecioArticulo.objects.bulk_create([
+            PrecioArticulo(lista_precio=lista, articulo=articulo, precio_base=Decimal('20.00'))
+            for articulo in self.articulos
+        ])
+        ReglaPrecio.objects.create(lista_precio=lista, nombre='Canal', tipo_regla='CANAL', valor_ajuste=1)
+        CombinacionProducto.objects.create(lista_precio=lista, nombre='Combo', cantidad_minima=2, valor_descuento=1)
+        materializar_lista(self.lista)
+        materializar_lista(lista)
+        DetalleOrdenCompraCliente.objects.bulk_create([
+            DetalleOrdenCompraCliente(
+                numero_orden=f'OC-{i}', empresa=self.empresa, sucursal=self.sucursal, articulo=articulo,
+                lista_precio=lista, cantidad=1, precio_unitario=1, precio_base=1, subtotal=1,
+            )
+            for i, articulo in enumerate(self.articulos)
+        ])
+
+    def test_changelists_con_consultas_constantes(self):
+        antes = {modelo: self.consultas(modelo) for modelo in self.CHANGELISTS}
+        self.agregar_filas()
+        despues = {modelo: self.consultas(modelo) for modelo in self.CHANGELISTS}
+        self.assertEqual(despues, antes)
+        # Sesión, usuario, conteo, página y opciones de filtros
+        self.assertLessEqual(max(despues.values()), 8)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Estimación de pg_class')
+    def test_conteo_estimado_sin_filtros(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE precio_articulo')
+        with mock.patch('core.admin_rendimiento.MINIMO_ESTIMADO', 0):
+            with CaptureQueriesContext(connection) as contexto:
+                ConteoEstimadoPaginator(PrecioArticulo.objects.order_by('-id'), 100).count
+            self.assertNotIn('COUNT', contexto.captured_queries[0]['sql'])
+
+            filtrado = PrecioArticulo.objects.filter(bajo_costo=True)
+            self.assertEqual(ConteoEstimadoPaginator(filtrado, 100).count, filtrado.count())
+
+
+class EmpresaConsistenteTests(DatosPrecioMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.otra_empresa = Empresa.objects.create(nombre='Otra', ruc='20000000002')
+
+    def assertRechazado(self, operacion):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Las claves compuestas son diferidas: se verifican al COMMIT
+                connection.cursor().execute('SET CONSTRAINTS ALL IMMEDIATE')
+            operacion()
+
+    def test_save_sin_consultas_de_validacion(self):
+        ajeno = Articulo(empresa=self.otra_empresa, grupo=self.grupo, codigo='X-1', nombre='X')
+        with self.assertNumQueries(0), self.assertRaises(ValueError):
+            ajeno.save()
+
+        articulo = Articulo(empresa_id=self.empresa.id, grupo_id=self.grupo.id, codigo='X-2', nombre='X')
+        with CaptureQueriesContext(connection) as contexto:
+            articulo.save()
+        self.assertNotIn('grupo_articulo', contexto.captured_queries[0]['sql'])
+
+    @skipUnless(connection.vendor in ('postgresql', 'sqlite'), 'Restricciones de la migración 0008')
+    def test_base_de_datos_rechaza_empresas_distintas(self):
+        self.assertRechazado(lambda: Articulo.objects.bulk_create([
+            Articulo(empresa=self.otra_empresa, grupo=self.grupo, codigo='X-1', nombre='X')
+        ]))
+        self.assertRechazado(lambda: Articulo.objects.filter(pk=self.articulos[0].pk).update(
+            empresa=self.otra_empresa
+        ))
+        self.assertRechazado(lambda: GrupoArticulo.objects.bulk_create([
+            GrupoArticulo(empresa=self.otra_empresa, linea=self.linea, codigo='G-X', nombre='X')
+        ]))
+        self.assertRechazado(lambda: GrupoArticulo.objects.filter(pk=self.grupo.pk).update(
+            empresa=self.otra_empresa
+        ))
+
+
+class ListaVigenteCacheTests(DatosPrecioMixin, TestCase):
+
+    def test_resolucion_en_cache_hasta_modificar_la_lista(self):
+        lista = PrecioService.obtener_lista_vigente(self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR')
+        self.assertEqual(lista, self.lista)
+
+        # Caché local del proceso: solo la consulta de version_listas
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                PrecioService.obtener_lista_vigente(self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR'),
+                self.lista
+            )
+        with self.settings(PRECIOS_CACHE_COMPARTIDA=True):
+            PrecioService.obtener_lista_vigente(self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR')
+            with self.assertNumQueries(0):
+                self.assertEqual(
+                    PrecioService.obtener_lista_vigente(self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR'),
+                    self.lista
+                )
+
+        self.lista.activo = False
+        self.lista.save()
+        self.assertIsNone(
+            PrecioService.obtener_lista_vigente(self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR')
+        )
+
+    def test_cambio_desde_otro_proceso(self):
+        articulo = self.articulos[1]
+        precio = PrecioService.calcular_precio(
+            self.empresa.id, self.sucursal.id, articulo.id, 'DISTRIBUIDOR', 12
+        )['precio_final']
+
+        # Lo que hace tocar_listas en otro worker: sin señales ni invalidaciones en este proceso
+        ReglaPrecio.objects.filter(lista_precio=self.lista, tipo_regla='CANAL').update(
+            valor_ajuste=Decimal('20.00')
+        )
+        ListaPrecio.objects.filter(id=self.lista.id).update(
+            fecha_actualizacion=timezone.now() + timedelta(seconds=1)
+        )
+        self.assertLess(
+            PrecioService.calcular_precio(
+                self.empresa.id, self.sucursal.id, articulo.id, 'DISTRIBUIDOR', 12
+            )['precio_final'],
+            precio
+        )
+
+        # Una lista nueva de la sucursal creada en otro worker reemplaza a la anterior
+        nueva = ListaPrecio.objects.bulk_create([ListaPrecio(
+            empresa=self.empresa, sucursal=self.sucursal, nombre='Nueva', canal='DISTRIBUIDOR',
+            fecha_inicio=self.lista.fecha_inicio + timedelta(days=1),
+        )])[0]
+        self.assertEqual(
+            PrecioService.obtener_lista_vigente(self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR').id,
+            nueva.id
+        )
+
+    def test_vence_en_el_proximo_limite_de_vigencia(self):
+        hoy = timezone.now().date()
+        ListaPrecio.objects.create(
+            empresa=self.empresa, sucursal=self.sucursal, nombre='Lista próxima',
+            canal='DISTRIBUIDOR', fecha_inicio=hoy + timedelta(days=3),
+        )
+        segundos = segundos_hasta_proximo_limite(self.empresa.id, self.sucursal.id, 'DISTRIBUIDOR', hoy)
+        self.assertGreater(segundos, 2 * 86400)
+        self.assertLessEqual(segundos, 3 * 86400)
+
+
+class CombinacionesTests(DatosPrecioMixin, TestCase):
+
+    def test_combinaciones_por_grupo_y_por_articulos(self):
+        a = self.articulos
+        casos = [
+            ([a[1], a[3]], {'Combo grupo'}),
+            ([a[0], a[1]], set()),
+            ([a[0], a[2], a[3]], {'Pack'}),
+            ([a[0], a[1], a[2], a[3]], {'Combo grupo', 'Pack'}),
+        ]
+        for articulos, esperadas in casos:
+            items = [{'articulo_id': articulo.id, 'cantidad': 1} for articulo in articulos]
+            combinaciones = PrecioService.evaluar_combinaciones(self.lista, items)
+            self.assertEqual({c['nombre'] for c in combinaciones}, esperadas)
+
+    def test_evaluacion_sin_consultas_con_lista_compilada(self):
+        items = self.items(self.TOTAL_ARTICULOS)
+        PrecioService.evaluar_combinaciones(self.lista, items)
+
+        with self.assertNumQueries(0):
+            PrecioService.evaluar_combinaciones(self.lista, items)
+
+
+class ExportacionTests(DatosPrecioMixin, TestCase):
+
+    def exportar(self, formato):
+        response = APIClient().get(f'/api/listas-precios/{self.lista.id}/exportar/', {'formato': formato})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_csv_con_cabecera_y_una_fila_por_precio(self):
+        response = self.exportar('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'lista_{self.lista.id}_precios.csv', response['Content-Disposition'])
+        filas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(filas[0], CAMPOS_EXPORTACION)
+        self.assertEqual(len(filas) - 1, self.TOTAL_ARTICULOS)
+        self.assertEqual(filas[1][1], 'ART-000')
+
+    def test_ndjson_un_objeto_por_linea(self):
+        response = self.exportar('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lineas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lineas), self.TOTAL_ARTICULOS)
+        filas = [json.loads(linea) for linea in lineas]
+        self.assertEqual(list(filas[0]), CAMPOS_EXPORTACION)
+        self.assertEqual(filas[0]['articulo_codigo'], 'ART-000')
+        self.assertEqual(Decimal(filas[0]['precio_base']), Decimal('13.00'))
+
+    def test_formato_no_soportado(self):
+        response = APIClient().get(f'/api/listas-precios/{self.lista.id}/exportar/', {'formato': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_lee_con_cursor_por_bloques(self):
+        with mock.patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as iterator:
+            filas = exportar_csv(self.lista.id, tamano_bloque=7)
+            # Nada se consulta hasta pedir las filas
+            with self.assertNumQueries(0):
+                next(filas)
+            self.assertEqual(len(list(filas)), self.TOTAL_ARTICULOS)
+        iterator.assert_called_once()
+        self.assertEqual(iterator.call_args.kwargs, {'chunk_size': 7})
+
+
+class ImportacionPreciosTests(DatosPrecioMixin, TestCase):
+
+    def test_importa_actualiza_y_rechaza_filas(self):
+        from .services.importacion import importar_precios, leer_csv
+
+        nuevo = Articulo.objects.create(
+            empresa=self.empresa, grupo=self.grupo, codigo='ART-NUEVO', nombre='Nuevo'
+        )
+        contenido = (
+            'articulo_codigo,precio_base,descuento_proveedor\n'
+            'ART-000,99.90,\n'
+            'ART-NUEVO,5,60\n'
+            'ART-NO-EXISTE,1,\n'
+            'ART-001,-3,\n'
+        )
+        resumen = importar_precios(self.lista, leer_csv(io.BytesIO(contenido.encode())), tamano_lote=2)
+
+        self.assertEqual(resumen['filas_leidas'], 4)
+        self.assertEqual(resumen['filas_importadas'], 2)
+        self.assertEqual([r['fila'] for r in resumen['rechazadas']], [4, 5])
+        self.assertEqual(
+            PrecioArticulo.objects.get(lista_precio=self.lista, articulo=self.articulos[0]).precio_base,
+            Decimal('99.90')
+        )
+        self.assertEqual(
+            PrecioArticulo.objects.get(lista_precio=self.lista, articulo=nuevo).descuento_proveedor,
+            Decimal('60.00')
+        )
+        resultado = PrecioService.calcular_precio(
+            self.empresa.id, self.sucursal.id, self.articulos[0].id, 'DISTRIBUIDOR', 1
+        )
+        self.assertEqual(resultado['precio_base'], 99.9)
+
+    def test_rechaza_precios_fuera_de_rango_y_archivos_invalidos(self):
+        from .services.importacion import ErrorImportacion, importar_precios, leer_csv, leer_xlsx
+
+        contenido = (
+            'articulo_codigo,precio_base,descuento_proveedor\n'
+            'ART-000,10000000000,\n'
+            'ART-001,5,1000\n'
+            'ART-002,9999999999.99,\n'
+        )
+        resumen = importar_precios(self.lista, leer_csv(io.BytesIO(contenido.encode())))
+        self.assertEqual(resumen['filas_importadas'], 1)
+        self.assertEqual([r['fila'] for r in resumen['rechazadas']], [2, 3])
+
+        latin1 = 'articulo_codigo,precio_base,autorizado_por\nART-000,1,Muñoz\n'.encode('latin-1')
+        for filas in (leer_csv(io.BytesIO(latin1)), leer_xlsx(io.BytesIO(b'no es un xlsx'))):
+            with self.assertRaises(ErrorImportacion):
+                importar_precios(self.lista, filas)
+
+        response = APIClient().post(
+            f'/api/listas-precios/{self.lista.id}/importar/',
+            {'archivo': SimpleUploadedFile('precios.csv', latin1)}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class PrecioEfectivoTests(DatosPrecioMixin, TestCase):
+
+    def test_materializa_igual_al_calculo_y_refresca_solo_lo_pendiente(self):
+        from .models import PrecioEfectivo
+        from .services.materializacion import materializar_lista, refrescar_pendientes
+
+        self.assertEqual(materializar_lista(self.lista), self.TOTAL_ARTICULOS)
+        for articulo in self.articulos:
+            resultado = PrecioService.calcular_precio(
+                self.empresa.id, self.sucursal.id, articulo.id, 'DISTRIBUIDOR', 1
+            )
+            efectivo = PrecioEfectivo.objects.get(lista_precio=self.lista, articulo=articulo)
+            self.assertAlmostEqual(float(efectivo.precio_final), resultado['precio_final'], places=6)
+            self.assertEqual(efectivo.bajo_costo, resultado['bajo_costo'])
+
+        # Un cambio de precio marca solo ese artículo
+        precio = PrecioArticulo.objects.get(lista_precio=self.lista, articulo=self.articulos[3])
+        precio.precio_base = Decimal('500.00')
+        precio.save()
+        self.assertEqual(
+            list(PrecioEfectivo.objects.filter(desactualizado=True).values_list('articulo_id', flat=True)),
+            [self.articulos[3].id]
+        )
+        # Una regla nueva marca solo los artículos de su grupo (el artículo 3 ya es del grupo)
+        ReglaPrecio.objects.create(
+            lista_precio=self.lista, nombre='Grupo', tipo_regla='CANAL',
+            grupo_articulo=self.grupo, valor_ajuste=Decimal('1.00'), prioridad=4,
+        )
+        self.assertEqual(
+            PrecioEfectivo.objects.filter(desactualizado=True).count(), self.TOTAL_ARTICULOS // 2
+        )
+
+        self.assertEqual(refrescar_pendientes(), {self.lista.id: self.TOTAL_ARTICULOS // 2})
+        self.assertFalse(PrecioEfectivo.objects.filter(desactualizado=True).exists())
+        self.assertEqual(refrescar_pendientes(), {})
+        resultado = PrecioService.calcular_precio(
+            self.empresa.id, self.sucursal.id, self.articulos[3].id, 'DISTRIBUIDOR', 1
+        )
+        efectivo = PrecioEfectivo.objects.get(lista_precio=self.lista, articulo=self.articulos[3])
+        self.assertAlmostEqual(float(efectivo.precio_final), resultado['precio_final'], places=6)
+
+    def test_regla_con_linea_y_grupo_marca_ambos(self):
+        from .models import PrecioEfectivo
+
+        otra_linea = LineaArticulo.objects.create(empresa=self.empresa, nombre='Bebidas', codigo='LIN-002')
+        otro_grupo = GrupoArticulo.objects.create(
+            empresa=self.empresa, linea=otra_linea, nombre='Gaseosas', codigo='GRP-003'
+        )
+        de_linea = Articulo.objects.create(
+            empresa=self.empresa, grupo=otro_grupo, codigo='ART-LIN', nombre='De la línea',
+            ultimo_costo=Decimal('10.00'),
+        )
+        PrecioArticulo.objects.create(lista_precio=self.lista, articulo=de_linea, precio_base=Decimal('20.00'))
+        materializar_lista(self.lista)
+
+        ReglaPrecio.objects.create(
+            lista_precio=self.lista, nombre='Línea o grupo', tipo_regla='CANAL',
+            linea_articulo=otra_linea, grupo_articulo=self.grupo,
+            valor_ajuste=Decimal('1.00'), prioridad=4,
+        )
+        marcados = set(PrecioEfectivo.objects.filter(desactualizado=True).values_list('articulo_id', flat=True))
+        self.assertIn(de_linea.id, marcados)
+        self.assertIn(self.articulos[1].id, marcados)
+        # Los artículos del otro grupo de la línea original no cambian
+        self.assertNotIn(self.articulos[0].id, marcados)
+        self.assertEqual(len(marcados), self.TOTAL_ARTICULOS // 2 + 1)
+
+    def test_cambio_durante_la_materializacion_queda_pendiente(self):
+        from .models import PrecioEfectivo
+        from .services import materializacion
+
+        guardar = materializacion._guardar
+
+        def guardar_con_cambio(precios):
+            # Un cambio confirmado después de compilar la instantánea
+            precio = PrecioArticulo.objects.get(lista_precio=self.lista, articulo=self.articulos[3])
+            precio.precio_base = Decimal('500.00')
+            precio.save()
+            return guardar(precios)
+
+        materializacion.materializar_lista(self.lista)
+        with mock.patch.object(materializacion, '_guardar', guardar_con_cambio):
+            materializacion.materializar_lista(self.lista, articulo_ids=[self.articulos[3].id])
+        efectivo = PrecioEfectivo.objects.get(lista_precio=self.lista, articulo=self.articulos[3])
+        self.assertTrue(efectivo.desactualizado)
+
+        materializacion.refrescar_pendientes()
+        efectivo.refresh_from_db()
+        self.assertFalse(efectivo.desactualizado)
+        self.assertEqual(efectivo.precio_base, Decimal('500.00'))
+
+    def test_endpoint_por_lista_vigente(self):
+        from .services.materializacion import materializar_lista
+
+        materializar_lista(self.lista)
+        respuesta = APIClient().get('/api/precios-efectivos/', {
+            'empresa_id': self.empresa.id, 'sucursal_id': self.sucursal.id, 'canal': 'DISTRIBUIDOR'
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['count'], self.TOTAL_ARTICULOS)
+        self.assertEqual(respuesta.data['results'][0]['articulo_codigo'], 'ART-000')
+
+        for parametro in ('empresa_id', 'sucursal_id', 'lista_id', 'articulo_id'):
+            respuesta = APIClient().get('/api/precios-efectivos/', {
+                'empresa_id': self.empresa.id, parametro: 'abc'
+            })
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertIn(parametro, respuesta.data)
+
+
+class ComandosRendimientoTests(TestCase):
+
+    def generar(self):
+        salida = io.StringIO()
+        call_command(
+            'generar_datos_sinteticos', '--sucursales', '2', '--lineas', '2', '--grupos', '2',
+            '--articulos', '20', '--listas', '3', '--reglas', '4', '--combinaciones', '3',
+            stdout=salida,
+        )
+        return salida.getvalue()
+
+    def test_generar_datos_sinteticos(self):
+        salida = self.generar()
+        empresa = Empresa.objects.get()
+        self.assertTrue(empresa.ruc.startswith('99'))
+        self.assertEqual(Sucursal.objects.filter(empresa=empresa).count(), 2)
+        self.assertEqual(GrupoArticulo.objects.filter(empresa=empresa).count(), 4)
+        self.assertEqual(Articulo.objects.filter(empresa=empresa).count(), 20)
+        self.assertEqual(ListaPrecio.objects.filter(empresa=empresa).count(), 3)
+        self.assertEqual(PrecioArticulo.objects.count(), 3 * 20)
+        self.assertEqual(ReglaPrecio.objects.count(), 3 * 4)
+        self.assertEqual(CombinacionProducto.objects.count(), 3 * 3)
+        self.assertIn('- 60 Precios de Artículos', salida)
+
+        # Una segunda ejecución agrega otra empresa sin chocar con la anterior
+        self.generar()
+        self.assertEqual(Empresa.objects.count(), 2)
+
+    def test_benchmark_precios(self):
+        self.generar()
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'benchmark.json')
+            salida = io.StringIO()
+            call_command(
+                'benchmark_precios', '--iteraciones', '3', '--iteraciones-api', '1',
+                '--calentamiento', '1', '--lineas-pedido', '1', '5', '--salida', ruta,
+                stdout=salida,
+            )
+            with open(ruta, encoding='utf-8') as archivo:
+                informe = json.load(archivo)
+        self.assertEqual(informe['datos']['precios'], 20)
+        self.assertEqual(informe['resultados']['calcular_precio']['iteraciones'], 3)
+        self.assertIn('calcular_pedido_5', informe['resultados'])
+        self.assertIn('Resultados guardados', salida.getvalue())
+
+
+class ExplicarConsultasTests(DatosPrecioMixin, TestCase):
+
+    @skipUnless(connection.vendor == 'postgresql', 'Planes de PostgreSQL')
+    def test_consultas_criticas_usan_indices(self):
+        salida = io.StringIO()
+        call_command('explicar_consultas', '--estricto', '--sin-seqscan', stdout=salida)
+        lineas = salida.getvalue().splitlines()
+        self.assertEqual(len([linea for linea in lineas if 'usa índice' in linea]), 6)
+        self.assertNotIn('NO usa índice', salida.getvalue())
+
+
+class PresupuestoConsultasTests(DatosPrecioMixin, TestCase):
+    """
+    Cada endpoint de listado tiene un presupuesto fijo de consultas: no debe
+    crecer con la cantidad de filas de la página (N+1).
+    """
+
+    def presupuestos(self):
+        lista = self.lista.id
+        return [
+            # (url, consultas, filas mínimas en la respuesta)
+            ('/api/empresas/', 2, 1),
+            ('/api/sucursales/', 2, 1),
+            ('/api/lineas-articulos/', 2, 1),
+            ('/api/grupos-articulos/', 2, 2),
+            ('/api/articulos/', 2, self.TOTAL_ARTICULOS),
+            ('/api/listas-precios/', 2, 2),
+            ('/api/precios-articulos/', 2, self.TOTAL_ARTICULOS),
+            ('/api/precios-efectivos/', 2, self.TOTAL_ARTICULOS),
+            ('/api/reglas-precios/', 2, 3),
+            ('/api/combinaciones-productos/', 3, 2),
+            ('/api/ordenes-compra/', 2, 3),
+            (f'/api/listas-precios/{lista}/precios/', 2, self.TOTAL_ARTICULOS),
+            (f'/api/listas-precios/{lista}/reglas/', 2, 3),
+        ]
+
+    def setUp(self):
+        super().setUp()
+        from .services.materializacion import materializar_lista
+
+        materializar_lista(self.lista)
+        ListaPrecio.objects.create(
+            empresa=self.empresa, nombre='Lista general', canal='TODOS',
+            fecha_inicio=timezone.now().date(),
+        )
+        for i, articulo in enumerate(self.articulos[:3]):
+            DetalleOrdenCompraCliente.objects.create(
+                numero_orden='OC-1', empresa=self.empresa, sucursal=self.sucursal,
+                articulo=articulo, lista_precio=self.lista, cantidad=i + 1,
+                precio_unitario=Decimal('10.00'), precio_base=Decimal('10.00'),
+                subtotal=Decimal('10.00') * (i + 1),
+            )
+
+    def test_presupuesto_de_consultas_por_endpoint(self):
+        cliente = APIClient()
+        for url, presupuesto, filas_minimas in self.presupuestos():
+            with self.subTest(url=url):
+                with self.assertNumQueries(presupuesto):
+                    respuesta = cliente.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                filas = respuesta.data['results'] if isinstance(respuesta.data, dict) else respuesta.data
+                self.assertGreaterEqual(len(filas), filas_minimas)
+
+
+class PaginacionYCamposTests(DatosPrecioMixin, TestCase):
+
+    def test_paginacion_por_cursor_sin_count(self):
+        cliente = APIClient()
+        ids = []
+        url = '/api/precios-articulos/?paginacion=cursor&page_size=25'
+        while url:
+            with self.assertNumQueries(1):
+                respuesta = cliente.get(url)
+            self.assertNotIn('count', respuesta.data)
+            ids.extend(fila['id'] for fila in respuesta.data['results'])
+            url = respuesta.data['next']
+        self.assertEqual(ids, sorted(PrecioArticulo.objects.values_list('id', flat=True)))
+
+    def test_fields_limita_campos_y_columnas(self):
+        cliente = APIClient()
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = cliente.get('/api/articulos/', {'fields': 'id,codigo,linea_nombre'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(set(respuesta.data['results'][0]), {'id', 'codigo', 'linea_nombre'})
+        self.assertEqual(len(contexto.captured_queries), 2)
+        consulta = contexto.captured_queries[-1]['sql']
+        self.assertNotIn('"articulo"."nombre"', consulta)
+        self.assertNotIn('"empresa"', consulta)
+
+        respuesta = cliente.get('/api/articulos/', {'fields': 'codigo,no_existe'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class CalculoAsincronoTests(DatosPrecioMixin, TestCase):
+
+    async def test_acalcular_precio_igual_al_calculo_sincrono(self):
+        from asgiref.sync import sync_to_async
+
+        for articulo in self.articulos[:10]:
+            await sync_to_async(self.limpiar_caches)()
+            asincrono = await PrecioService.acalcular_precio(
+                self.empresa.id, self.sucursal.id, articulo.id, 'DISTRIBUIDOR', 12,
+                Decimal('1500'), self.items(5)
+            )
+            await sync_to_async(self.limpiar_caches)()
+            sincrono = await sync_to_async(PrecioService.calcular_precio)(
+                self.empresa.id, self.sucursal.id, articulo.id, 'DISTRIBUIDOR', 12,
+                Decimal('1500'), self.items(5)
+            )
+            self.assertEqual(asincrono, sincrono)
+
+    async def test_endpoint_asincrono(self):
+        from asgiref.sync import sync_to_async
+        from django.test import AsyncClient
+
+        cuerpo = {
+            'empresa_id': self.empresa.id, 'sucursal_id': self.sucursal.id,
+            'articulo_id': self.articulos[1].id, 'canal': 'DISTRIBUIDOR', 'cantidad': 20,
+        }
+        respuesta = await AsyncClient().post('/api/precios/acalcular/', cuerpo, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        sincrono = await sync_to_async(PrecioService.calcular_precio)(
+            self.empresa.id, self.sucursal.id, self.articulos[1].id, 'DISTRIBUIDOR', 20
+        )
+        self.assertEqual(respuesta.json()['precio_final'], sincrono['precio_final'])
+        respuesta = await AsyncClient().post('/api/precios/acalcular/', {'empresa_id': 1}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
@@ -3,8 +3,9 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     EmpresaViewSet, SucursalViewSet, LineaArticuloViewSet,
     GrupoArticuloViewSet, ArticuloViewSet, ListaPrecioViewSet,
-    PrecioArticuloViewSet, ReglaPrecioViewSet, CombinacionProductoViewSet,
-    DetalleOrdenCompraClienteViewSet, PrecioCalculoViewSet, PedidoCalculoViewSet,
+    PrecioArticuloViewSet, PrecioEfectivoViewSet, ReglaPrecioViewSet, CombinacionProductoViewSet,
+    DetalleOrdenCompraClienteViewSet, UsoReglaViewSet, PrecioCalculoViewSet, PedidoCalculoViewSet,
+    calcular_precio_async, metricas_view,
     # Vistas HTML
     home, empresas_view, dashboard_empresa, calcular_precio_view, calcular_pedido_view
 )
@@ -20,15 +21,19 @@ router.register(r'grupos-articulos', GrupoArticuloViewSet, basename='grupo-artic
 router.register(r'articulos', ArticuloViewSet, basename='articulo')
 router.register(r'listas-precios', ListaPrecioViewSet, basename='lista-precio')
 router.register(r'precios-articulos', PrecioArticuloViewSet, basename='precio-articulo')
+router.register(r'precios-efectivos', PrecioEfectivoViewSet, basename='precio-efectivo')
 router.register(r'reglas-precios', ReglaPrecioViewSet, basename='regla-precio')
 router.register(r'combinaciones-productos', CombinacionProductoViewSet, basename='combinacion-producto')
 router.register(r'ordenes-compra', DetalleOrdenCompraClienteViewSet, basename='orden-compra')
+router.register(r'uso-reglas', UsoReglaViewSet, basename='uso-regla')
 router.register(r'precios', PrecioCalculoViewSet, basename='precio-calculo')
 router.register(r'pedidos', PedidoCalculoViewSet, basename='pedido-calculo')
 
 urlpatterns = [
     # API REST
+    path('api/precios/acalcular/', calcular_precio_async, name='precio-calcular-async'),
     path('api/', include(router.urls)),
+    path('metrics', metricas_view, name='metricas'),
     
     # Rutas HTML Frontend
     path('', home, name='home'),
@@ -1,22 +1,93 @@
+import copy
+import json
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Max, Prefetch, Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
+from .metricas import ErrorMetricas, exportar_metricas
 from .models import (
     Empresa, Sucursal, LineaArticulo, GrupoArticulo, Articulo,
-    ListaPrecio, PrecioArticulo, ReglaPrecio, CombinacionProducto,
-    DetalleOrdenCompraCliente
+    ListaPrecio, PrecioArticulo, PrecioEfectivo, ReglaPrecio, CombinacionProducto,
+    DetalleOrdenCompraCliente, UsoReglaDiario
 )
 from .serializers import (
     EmpresaSerializer, SucursalSerializer, LineaArticuloSerializer,
     GrupoArticuloSerializer, ArticuloSerializer, ListaPrecioSerializer,
-    PrecioArticuloSerializer, ReglaPrecioSerializer, CombinacionProductoSerializer,
+    PrecioArticuloSerializer, PrecioEfectivoSerializer, ReglaPrecioSerializer,
+    CombinacionProductoSerializer,
     DetalleOrdenCompraClienteSerializer, CalculoPrecioRequestSerializer,
-    CalculoPrecioResponseSerializer
+    CalculoPrecioResponseSerializer, CalculoPrecioLoteRequestSerializer,
+    SimulacionReglasRequestSerializer, ConfirmarPedidoRequestSerializer,
+    UsoReglaDiarioSerializer, UsoReglasFiltroSerializer
 )
+from .pagination import CatalogoPagination, DiferenciasPagination
+from .services.cache_cotizaciones import cache_cotizaciones
+from .services.lista_compilada import obtener_lista_compilada
+from .services.ordenes import ErrorOrden, confirmar_orden
 from .services.precio_service import PrecioService
+from .services.exportacion import EXPORTADORES, FORMATOS_EXPORTACION
+from .services.importacion import (
+    LECTORES, TAMANO_LOTE, ErrorImportacion, importar_precios
+)
+from .services.simulacion import (
+    ErrorSimulacion, comparar_reglas, ordenes_afectadas, reglas_con_cambios
+)
+from .services.tiempos import con_server_timing, histogramas
+
+
+class CamposParcialesMixin:
+    """
+    Permite pedir solo algunos campos con ?fields=campo1,campo2 en las lecturas.
+    Los campos se traducen a .only() sobre el queryset, y el select_related se
+    limita a las relaciones que esos campos recorren, para no cargar columnas
+    ni filas relacionadas que no se van a serializar.
+    """
+    parametro_campos = 'fields'
+    
+    def campos_solicitados(self):
+        """Lista de campos pedidos o None si se piden todos"""
+        if not hasattr(self, '_campos'):
+            self._campos = None
+            valor = self.request.query_params.get(self.parametro_campos)
+            if self.request.method == 'GET' and valor:
+                campos = [campo.strip() for campo in valor.split(',') if campo.strip()]
+                disponibles = self.get_serializer_class()().fields
+                invalidos = [campo for campo in campos if campo not in disponibles]
+                if invalidos:
+                    raise ValidationError({
+                        self.parametro_campos: f'Campos no válidos: {", ".join(invalidos)}. '
+                                               f'Opciones: {", ".join(disponibles)}'
+                    })
+                self._campos = campos
+        return self._campos
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['campos'] = self.campos_solicitados()
+        return context
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        campos = self.campos_solicitados()
+        if not campos:
+            return queryset
+        
+        disponibles = self.get_serializer_class()().fields
+        columnas = set()
+        relaciones = set()
+        for campo in campos:
+            partes = disponibles[campo].source.split('.')
+            columnas.add('__'.join(partes))
+            relaciones.update('__'.join(partes[:i]) for i in range(1, len(partes)))
+        return queryset.select_related(None).select_related(*relaciones).only(*columnas)
 
 
 class EmpresaViewSet(viewsets.ModelViewSet):
@@ -34,7 +105,7 @@ class SucursalViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Permite filtrar sucursales por empresa"""
-        queryset = Sucursal.objects.all()
+        queryset = Sucursal.objects.select_related('empresa')
         empresa_id = self.request.query_params.get('empresa_id', None)
         if empresa_id:
             queryset = queryset.filter(empresa_id=empresa_id)
@@ -49,7 +120,7 @@ class LineaArticuloViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Permite filtrar líneas por empresa"""
-        queryset = LineaArticulo.objects.all()
+        queryset = LineaArticulo.objects.select_related('empresa')
         empresa_id = self.request.query_params.get('empresa_id', None)
         
         if empresa_id:
@@ -66,7 +137,7 @@ class GrupoArticuloViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Permite filtrar grupos por empresa y/o línea"""
-        queryset = GrupoArticulo.objects.all()
+        queryset = GrupoArticulo.objects.select_related('empresa', 'linea')
         empresa_id = self.request.query_params.get('empresa_id', None)
         linea_id = self.request.query_params.get('linea_id', None)
         
@@ -78,15 +149,16 @@ class GrupoArticuloViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class ArticuloViewSet(viewsets.ModelViewSet):
+class ArticuloViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar artículos"""
     queryset = Articulo.objects.all()
     serializer_class = ArticuloSerializer
+    pagination_class = CatalogoPagination
     # permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         """Permite filtrar artículos por empresa, grupo o línea"""
-        queryset = Articulo.objects.all()
+        queryset = Articulo.objects.select_related('empresa', 'grupo__linea')
         empresa_id = self.request.query_params.get('empresa_id', None)
         grupo_id = self.request.query_params.get('grupo_id', None)
         linea_id = self.request.query_params.get('linea_id', None)
@@ -108,7 +180,7 @@ class ListaPrecioViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Permite filtrar listas por empresa o sucursal"""
-        queryset = ListaPrecio.objects.all()
+        queryset = ListaPrecio.objects.select_related('empresa', 'sucursal')
         empresa_id = self.request.query_params.get('empresa_id', None)
         sucursal_id = self.request.query_params.get('sucursal_id', None)
         activo = self.request.query_params.get('activo', None)
@@ -126,28 +198,97 @@ class ListaPrecioViewSet(viewsets.ModelViewSet):
     def precios(self, request, pk=None):
         """Obtiene todos los precios de artículos de una lista"""
         lista = self.get_object()
-        precios = PrecioArticulo.objects.filter(lista_precio=lista)
+        precios = PrecioArticulo.objects.filter(lista_precio=lista).select_related(
+            'articulo', 'lista_precio'
+        )
         serializer = PrecioArticuloSerializer(precios, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def exportar(self, request, pk=None):
+        """
+        Exporta todos los precios de una lista en streaming.
+        
+        Query params:
+            formato: csv (por defecto) o ndjson
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in EXPORTADORES:
+            return Response(
+                {'error': f'Formato no soportado. Opciones: {", ".join(EXPORTADORES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        lista = self.get_object()
+        response = StreamingHttpResponse(
+            EXPORTADORES[formato](lista.id),
+            content_type=FORMATOS_EXPORTACION[formato]
+        )
+        response['Content-Disposition'] = f'attachment; filename="lista_{lista.id}_precios.{formato}"'
+        return response
+    
+    @action(detail=True, methods=['post'])
+    def importar(self, request, pk=None):
+        """
+        Inserta o actualiza en bloque los precios de la lista desde un archivo.
+        
+        Multipart form:
+            archivo: CSV o XLSX con columnas articulo_codigo, precio_base y
+                     opcionalmente descuento_proveedor, bajo_costo, autorizado_por
+            formato: csv o xlsx (por defecto según la extensión)
+            tamano_lote: filas por lote (por defecto 5000)
+        """
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response(
+                {'error': 'Debe adjuntar un archivo en el campo "archivo"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        formato = request.data.get('formato') or archivo.name.rsplit('.', 1)[-1].lower()
+        if formato not in LECTORES:
+            return Response(
+                {'error': f'Formato no soportado. Opciones: {", ".join(LECTORES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            tamano_lote = int(request.data.get('tamano_lote', TAMANO_LOTE))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'tamano_lote debe ser un número entero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        lista = self.get_object()
+        try:
+            resumen = importar_precios(lista, LECTORES[formato](archivo), tamano_lote)
+        except ErrorImportacion as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(resumen, status=status.HTTP_200_OK)
+    
     @action(detail=True, methods=['get'])
     def reglas(self, request, pk=None):
         """Obtiene todas las reglas de una lista"""
         lista = self.get_object()
-        reglas = ReglaPrecio.objects.filter(lista_precio=lista)
+        reglas = ReglaPrecio.objects.filter(lista_precio=lista).select_related(
+            'lista_precio', 'linea_articulo', 'grupo_articulo'
+        )
         serializer = ReglaPrecioSerializer(reglas, many=True)
         return Response(serializer.data)
 
 
-class PrecioArticuloViewSet(viewsets.ModelViewSet):
+class PrecioArticuloViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar precios de artículos"""
     queryset = PrecioArticulo.objects.all()
     serializer_class = PrecioArticuloSerializer
+    pagination_class = CatalogoPagination
     # permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         """Permite filtrar precios por lista o artículo"""
-        queryset = PrecioArticulo.objects.all()
+        queryset = PrecioArticulo.objects.select_related('articulo', 'lista_precio')
         lista_id = self.request.query_params.get('lista_id', None)
         articulo_id = self.request.query_params.get('articulo_id', None)
         
@@ -159,6 +300,46 @@ class PrecioArticuloViewSet(viewsets.ModelViewSet):
         return queryset
 
 
+class PrecioEfectivoViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta de precios efectivos precalculados (cantidad 1, sin combinaciones).
+    Lectura indexada de la tabla materializada; no ejecuta el motor de precios.
+    """
+    queryset = PrecioEfectivo.objects.all()
+    serializer_class = PrecioEfectivoSerializer
+    # permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """
+        Permite filtrar por lista (lista_id) o por la lista vigente de
+        empresa_id, sucursal_id y canal, y por artículo
+        """
+        queryset = PrecioEfectivo.objects.select_related('articulo').order_by('articulo_id')
+        for parametro in ('lista_id', 'empresa_id', 'sucursal_id', 'articulo_id'):
+            valor = self.request.query_params.get(parametro)
+            if valor and not valor.isdigit():
+                raise ValidationError({parametro: 'Debe ser un número entero'})
+        lista_id = self.request.query_params.get('lista_id', None)
+        empresa_id = self.request.query_params.get('empresa_id', None)
+        articulo_id = self.request.query_params.get('articulo_id', None)
+        
+        if not lista_id and empresa_id:
+            lista = PrecioService.obtener_lista_vigente(
+                empresa_id=int(empresa_id),
+                sucursal_id=int(self.request.query_params.get('sucursal_id') or 0) or None,
+                canal=self.request.query_params.get('canal', 'TODOS')
+            )
+            if lista is None:
+                return queryset.none()
+            lista_id = lista.id
+        if lista_id:
+            queryset = queryset.filter(lista_precio_id=lista_id)
+        if articulo_id:
+            queryset = queryset.filter(articulo_id=articulo_id)
+        
+        return queryset
+
+
 class ReglaPrecioViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar reglas de precio"""
     queryset = ReglaPrecio.objects.all()
@@ -167,7 +348,9 @@ class ReglaPrecioViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Permite filtrar reglas por lista"""
-        queryset = ReglaPrecio.objects.all()
+        queryset = ReglaPrecio.objects.select_related(
+            'lista_precio', 'linea_articulo', 'grupo_articulo'
+        )
         lista_id = self.request.query_params.get('lista_id', None)
         activo = self.request.query_params.get('activo', None)
         
@@ -178,6 +361,95 @@ class ReglaPrecioViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    @action(detail=False, methods=['post'])
+    def simular(self, request):
+        """
+        Compara las reglas actuales de una lista con un conjunto modificado,
+        sin guardar nada, y devuelve los artículos cuyo precio final o
+        condición de bajo costo cambia (paginado, o completo con ?formato=ndjson).
+        
+        Request body example:
+        {
+            "lista_precio_id": 1,
+            "reglas": [
+                {"nombre": "Canal 5%", "tipo_regla": "CANAL", "linea_articulo": 3,
+                 "valor_ajuste": "5.00", "prioridad": 1},
+                {"id": 7, "valor_ajuste": "12.00"}
+            ],
+            "eliminar": [9],
+            "cantidad": 1
+        }
+        """
+        request_serializer = SimulacionReglasRequestSerializer(data=request.data)
+        if not request_serializer.is_valid():
+            return Response(request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        datos = request_serializer.validated_data
+        
+        lista = get_object_or_404(ListaPrecio, id=datos['lista_precio_id'])
+        borradores, errores = self._borradores(lista, datos['reglas'])
+        if errores:
+            return Response({'reglas': errores}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            diferencias, resumen = comparar_reglas(
+                lista,
+                reglas_con_cambios(obtener_lista_compilada(lista).reglas, borradores, datos['eliminar']),
+                datos.get('canal'),
+                datos['cantidad'],
+                datos['monto_pedido_total']
+            )
+        except ErrorSimulacion as error:
+            return Response({'error': str(error)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        
+        if request.query_params.get('formato') == 'ndjson':
+            return StreamingHttpResponse(
+                (json.dumps(fila, ensure_ascii=False) + '\n' for fila in diferencias),
+                content_type='application/x-ndjson'
+            )
+        
+        resumen['ordenes_afectadas'] = ordenes_afectadas(lista.id, diferencias.articulo_ids)
+        paginador = DiferenciasPagination()
+        pagina = paginador.paginate_queryset(diferencias, request, view=self)
+        response = paginador.get_paginated_response(pagina)
+        response.data['resumen'] = resumen
+        return response
+    
+    def _borradores(self, lista, reglas):
+        """
+        Valida las reglas en borrador con ReglaPrecioSerializer y las devuelve
+        como instancias sin guardar. Las que traen id parten de la regla guardada.
+        """
+        ids = [regla['id'] for regla in reglas if regla.get('id')]
+        existentes = ReglaPrecio.objects.filter(lista_precio=lista).in_bulk(ids)
+        
+        borradores = []
+        errores = {}
+        for posicion, regla in enumerate(reglas):
+            datos = {campo: valor for campo, valor in regla.items() if campo != 'id'}
+            datos['lista_precio'] = lista.id
+            if regla.get('id'):
+                instancia = existentes.get(regla['id'])
+                if instancia is None:
+                    errores[posicion] = {'id': [f'La regla {regla["id"]} no pertenece a la lista {lista.id}']}
+                    continue
+                serializer = ReglaPrecioSerializer(instancia, data=datos, partial=True)
+            else:
+                instancia = None
+                serializer = ReglaPrecioSerializer(data=datos)
+            
+            if not serializer.is_valid():
+                errores[posicion] = serializer.errors
+                continue
+            
+            if instancia is None:
+                borrador = ReglaPrecio(**serializer.validated_data)
+            else:
+                borrador = copy.copy(instancia)
+                for campo, valor in serializer.validated_data.items():
+                    setattr(borrador, campo, valor)
+            borradores.append(borrador)
+        return borradores, errores
+
 
 class CombinacionProductoViewSet(viewsets.ModelViewSet):
     """ViewSet para gestionar combinaciones de productos"""
@@ -187,7 +459,12 @@ class CombinacionProductoViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Permite filtrar combinaciones por lista"""
-        queryset = CombinacionProducto.objects.all()
+        queryset = CombinacionProducto.objects.select_related(
+            'lista_precio', 'linea_articulo', 'grupo_articulo'
+        ).prefetch_related(
+            # articulos_detalle serializa cada artículo con su empresa, grupo y línea
+            Prefetch('articulos', queryset=Articulo.objects.select_related('empresa', 'grupo__linea'))
+        )
         lista_id = self.request.query_params.get('lista_id', None)
         
         if lista_id:
@@ -196,27 +473,90 @@ class CombinacionProductoViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class DetalleOrdenCompraClienteViewSet(viewsets.ModelViewSet):
+class DetalleOrdenCompraClienteViewSet(CamposParcialesMixin, viewsets.ModelViewSet):
     """ViewSet para gestionar detalles de órdenes"""
     queryset = DetalleOrdenCompraCliente.objects.all()
     serializer_class = DetalleOrdenCompraClienteSerializer
+    pagination_class = CatalogoPagination
     # permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        """Permite filtrar detalles por número de orden"""
-        queryset = DetalleOrdenCompraCliente.objects.all()
+        """Permite filtrar detalles por número de orden o por regla aplicada"""
+        queryset = DetalleOrdenCompraCliente.objects.select_related('empresa', 'sucursal', 'articulo')
         numero_orden = self.request.query_params.get('numero_orden', None)
+        regla_id = self.request.query_params.get('regla_id', None)
         
         if numero_orden:
             queryset = queryset.filter(numero_orden=numero_orden)
+        if regla_id:
+            if not regla_id.isdigit():
+                raise ValidationError({'regla_id': 'Debe ser un número entero'})
+            # reglas_aplicadas @> '[{"regla_id": N}]', resuelto con el índice GIN
+            queryset = queryset.filter(reglas_aplicadas__contains=[{'regla_id': int(regla_id)}])
+        
+        return queryset
+
+
+class UsoReglaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Uso de reglas y combinaciones por día y sucursal, leído de la tabla
+    resumen UsoReglaDiario (la mantiene python manage.py agregar_uso_reglas)
+    """
+    queryset = UsoReglaDiario.objects.all()
+    serializer_class = UsoReglaDiarioSerializer
+    pagination_class = CatalogoPagination
+    # permission_classes = [IsAuthenticated]
+    
+    def filtros(self):
+        filtro = UsoReglasFiltroSerializer(data=self.request.query_params)
+        filtro.is_valid(raise_exception=True)
+        return filtro.validated_data
+    
+    def get_queryset(self):
+        """Permite filtrar por empresa, sucursal, tipo, regla o combinación y rango de fechas"""
+        filtros = self.filtros()
+        queryset = UsoReglaDiario.objects.select_related('sucursal')
+        
+        for campo in ('empresa_id', 'sucursal_id', 'tipo', 'referencia_id'):
+            if campo in filtros:
+                queryset = queryset.filter(**{campo: filtros[campo]})
+        if 'desde' in filtros:
+            queryset = queryset.filter(fecha__gte=filtros['desde'])
+        if 'hasta' in filtros:
+            queryset = queryset.filter(fecha__lte=filtros['hasta'])
         
         return queryset
+    
+    @action(detail=False, methods=['get'])
+    def resumen(self, request):
+        """
+        Totales por regla o combinación en el período filtrado, de la más usada
+        a la menos usada. ?agrupar=dia o ?agrupar=sucursal los separa además por
+        día o por sucursal.
+        """
+        agrupar = self.filtros()['agrupar']
+        campos = ['tipo', 'referencia_id']
+        if agrupar == 'dia':
+            campos.append('fecha')
+        elif agrupar == 'sucursal':
+            campos.append('sucursal_id')
+        
+        totales = self.get_queryset().order_by().values(*campos).annotate(
+            total_veces_aplicada=Sum('veces_aplicada'),
+            total_unidades=Sum('unidades'),
+            total_descuento=Sum('descuento_total'),
+            total_ingresos=Sum('ingresos'),
+            nombre_referencia=Max('nombre'),
+        ).order_by('-total_veces_aplicada', *campos)
+        
+        return Response(list(totales))
 
 
 class PrecioCalculoViewSet(viewsets.ViewSet):
     """ViewSet para calcular precios dinámicamente"""
     
     @action(detail=False, methods=['post'])
+    @con_server_timing
     def calcular(self, request):
         """
         Calcula el precio final de un artículo según las políticas comerciales.
@@ -265,33 +605,172 @@ class PrecioCalculoViewSet(viewsets.ViewSet):
         
         return Response(response_serializer.data, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['get'], url_path='cache')
+    def estadisticas_cache(self, request):
+        """
+        Aciertos, fallos y desalojos de la caché de cotizaciones de este proceso,
+        para ajustar PRECIOS_COTIZACIONES_MAX.
+        """
+        return Response(cache_cotizaciones.estadisticas())
+    
+    @action(detail=False, methods=['get'], url_path='tiempos')
+    def tiempos(self, request):
+        """
+        Histogramas por etapa del cálculo de precios en este proceso (requiere
+        PRECIOS_TIEMPOS). Con ?reiniciar=1 los vacía después de leerlos.
+        """
+        estadisticas = histogramas.estadisticas()
+        if request.query_params.get('reiniciar') in ('1', 'true'):
+            histogramas.limpiar()
+        return Response(estadisticas)
+    
+    @action(detail=False, methods=['post'])
+    def calcular_lote(self, request):
+        """
+        Calcula el precio final de muchos artículos en un número constante de consultas.
+        
+        Request body example:
+        {
+            "empresa_id": 1,
+            "sucursal_id": 1,
+            "canal": "DISTRIBUIDOR",
+            "monto_pedido_total": 5000.00,
+            "items": [
+                {"articulo_id": 1, "cantidad": 5},
+                {"articulo_id": 2, "cantidad": 3}
+            ]
+        }
+        
+        Si no se envía monto_pedido_total se estima con el último costo de los artículos.
+        """
+        request_serializer = CalculoPrecioLoteRequestSerializer(data=request.data)
+        
+        if not request_serializer.is_valid():
+            return Response(
+                request_serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        validated_data = request_serializer.validated_data
+        
+        lote = PrecioService.calcular_precios_lote(
+            empresa_id=validated_data['empresa_id'],
+            sucursal_id=validated_data.get('sucursal_id'),
+            canal=validated_data['canal'],
+            items=validated_data['items'],
+            monto_pedido_total=validated_data.get('monto_pedido_total')
+        )
+        
+        return Response({
+            'items': lote['items'],
+            'monto_pedido_total': float(lote['monto_pedido_total'])
+        }, status=status.HTTP_200_OK)
+    
 # ============================================
 # VISTAS PARA FRONTEND (HTML)
 # ============================================
 
+@csrf_exempt
+@require_POST
+async def calcular_precio_async(request):
+    """
+    Variante asíncrona de POST /api/precios/calcular/ para servir con ASGI
+    (my_project/asgi.py). Recibe el mismo cuerpo y devuelve la misma respuesta;
+    es una vista de Django porque los ViewSets de DRF no admiten vistas asíncronas.
+    """
+    try:
+        datos = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'El cuerpo debe ser JSON válido'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    request_serializer = CalculoPrecioRequestSerializer(data=datos)
+    if not request_serializer.is_valid():
+        return JsonResponse(request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    validated_data = request_serializer.validated_data
+    
+    resultado = await PrecioService.acalcular_precio(
+        empresa_id=validated_data['empresa_id'],
+        sucursal_id=validated_data.get('sucursal_id'),
+        articulo_id=validated_data['articulo_id'],
+        canal=validated_data['canal'],
+        cantidad=validated_data['cantidad'],
+        monto_pedido_total=validated_data.get('monto_pedido_total', 0)
+    )
+    
+    if 'error' in resultado:
+        return JsonResponse(resultado, status=status.HTTP_404_NOT_FOUND)
+    
+    response_serializer = CalculoPrecioResponseSerializer(data=resultado)
+    response_serializer.is_valid()
+    
+    return JsonResponse(response_serializer.data, status=status.HTTP_200_OK)
+
+
+def metricas_view(request):
+    """
+    Métricas de latencia, base de datos y cachés en formato Prometheus
+    (ver core.metricas). Responde 503 si no está instalado prometheus_client.
+    """
+    try:
+        contenido, tipo = exportar_metricas()
+    except ErrorMetricas as error:
+        return HttpResponse(str(error), status=status.HTTP_503_SERVICE_UNAVAILABLE, content_type='text/plain')
+    return HttpResponse(contenido, content_type=tipo)
+
+
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Count
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .services.tablero import TIEMPO_FRAGMENTOS, resumen_tablas
+
+
+def _contar_por_empresa(modelo):
+    """Subconsulta correlacionada con la cantidad de filas de la empresa (sin multiplicar joins)"""
+    return Coalesce(Subquery(
+        modelo.objects.filter(empresa_id=OuterRef('pk')).order_by().values('empresa_id').annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
 
 def home(request):
     """Vista principal del sistema"""
+    activos, version = resumen_tablas(
+        empresas=Empresa.objects.all(),
+        sucursales=Sucursal.objects.all(),
+        articulos=Articulo.objects.all(),
+        listas=ListaPrecio.objects.all(),
+    )
     context = {
-        'total_empresas': Empresa.objects.filter(activo=True).count(),
-        'total_sucursales': Sucursal.objects.filter(activo=True).count(),
-        'total_articulos': Articulo.objects.filter(activo=True).count(),
-        'total_listas': ListaPrecio.objects.filter(activo=True).count(),
-        'listas_activas': ListaPrecio.objects.filter(activo=True)[:5],
+        'total_empresas': activos['empresas'],
+        'total_sucursales': activos['sucursales'],
+        'total_articulos': activos['articulos'],
+        'total_listas': activos['listas'],
+        # Solo se consulta si el fragmento no está en caché
+        'listas_activas': ListaPrecio.objects.filter(activo=True).select_related('empresa')[:5],
+        'version_fragmentos': version,
+        'tiempo_fragmentos': TIEMPO_FRAGMENTOS,
     }
     return render(request, 'core/index.html', context)
 
 
 def empresas_view(request):
     """Vista de empresas"""
+    _, version = resumen_tablas(
+        empresas=Empresa.objects.all(),
+        sucursales=Sucursal.objects.all(),
+        listas=ListaPrecio.objects.all(),
+    )
     empresas = Empresa.objects.filter(activo=True).annotate(
-        total_sucursales=Count('sucursales'),
-        total_listas=Count('listas_precios')
+        total_sucursales=_contar_por_empresa(Sucursal),
+        total_listas=_contar_por_empresa(ListaPrecio)
     )
     context = {
         'empresas': empresas,
+        'version_fragmentos': version,
+        'tiempo_fragmentos': TIEMPO_FRAGMENTOS,
     }
     return render(request, 'core/empresas.html', context)
 
@@ -299,13 +778,19 @@ def empresas_view(request):
 def dashboard_empresa(request, empresa_id):
     """Dashboard de una empresa específica"""
     empresa = get_object_or_404(Empresa, id=empresa_id)
+    activos, version = resumen_tablas(
+        sucursales=empresa.sucursales.all(),
+        listas=empresa.listas_precios.all(),
+    )
     
     context = {
         'empresa': empresa,
         'sucursales': empresa.sucursales.filter(activo=True),
-        'listas_precios': empresa.listas_precios.filter(activo=True),
-        'total_sucursales': empresa.sucursales.filter(activo=True).count(),
-        'total_listas': empresa.listas_precios.filter(activo=True).count(),
+        'listas_precios': empresa.listas_precios.filter(activo=True).select_related('sucursal'),
+        'total_sucursales': activos['sucursales'],
+        'total_listas': activos['listas'],
+        'version_fragmentos': version,
+        'tiempo_fragmentos': TIEMPO_FRAGMENTOS,
     }
     return render(request, 'core/dashboard.html', context)
 
@@ -345,6 +830,7 @@ class PedidoCalculoViewSet(viewsets.ViewSet):
     """ViewSet para calcular precios de pedidos completos con combinaciones"""
     
     @action(detail=False, methods=['post'])
+    @con_server_timing
     def calcular_pedido(self, request):
         """
         Calcula el precio final de un pedido completo evaluando combinaciones.
@@ -361,42 +847,31 @@ class PedidoCalculoViewSet(viewsets.ViewSet):
             ]
         }
         """
+        request_serializer = CalculoPrecioLoteRequestSerializer(data=request.data)
+        
+        if not request_serializer.is_valid():
+            return Response(
+                request_serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        validated_data = request_serializer.validated_data
+        items = validated_data['items']
+        
         try:
-            empresa_id = request.data.get('empresa_id')
-            sucursal_id = request.data.get('sucursal_id')
-            canal = request.data.get('canal', 'TODOS')
-            items = request.data.get('items', [])
-            
-            if not empresa_id or not items:
-                return Response(
-                    {'error': 'Debe proporcionar empresa_id e items'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Calcular monto total del pedido (estimado con costos)
-            monto_pedido_total = 0
-            for item in items:
-                try:
-                    articulo = Articulo.objects.get(id=item['articulo_id'])
-                    monto_pedido_total += float(articulo.ultimo_costo) * item['cantidad']
-                except Articulo.DoesNotExist:
-                    pass
+            # Calcular todos los items en lote; el monto total se estima con costos
+            lote = PrecioService.calcular_precios_lote(
+                empresa_id=validated_data['empresa_id'],
+                sucursal_id=validated_data.get('sucursal_id'),
+                canal=validated_data['canal'],
+                items=items
+            )
+            monto_pedido_total = lote['monto_pedido_total']
             
-            # Calcular precio de cada item
             resultados = []
             total_pedido = 0
             
-            for item in items:
-                resultado = PrecioService.calcular_precio(
-                    empresa_id=empresa_id,
-                    sucursal_id=sucursal_id,
-                    articulo_id=item['articulo_id'],
-                    canal=canal,
-                    cantidad=item['cantidad'],
-                    monto_pedido_total=monto_pedido_total,
-                    items_pedido=items  # Pasar todos los items para evaluar combinaciones
-                )
-                
+            for item, resultado in zip(items, lote['items']):
                 if 'error' not in resultado:
                     subtotal = resultado['precio_final'] * item['cantidad']
                     total_pedido += subtotal
@@ -404,13 +879,11 @@ class PedidoCalculoViewSet(viewsets.ViewSet):
                     resultado['cantidad'] = item['cantidad']
                     resultado['subtotal'] = round(subtotal, 2)
                     
-                    # Obtener info del artículo
-                    try:
-                        articulo = Articulo.objects.get(id=item['articulo_id'])
+                    # Info del artículo, tomada de la lista compilada
+                    articulo = lote['articulos'].get(item['articulo_id'])
+                    if articulo is not None:
                         resultado['articulo_codigo'] = articulo.codigo
                         resultado['articulo_nombre'] = articulo.nombre
-                    except Articulo.DoesNotExist:
-                        pass
                 
                 resultados.append(resultado)
             
@@ -428,6 +901,58 @@ class PedidoCalculoViewSet(viewsets.ViewSet):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=False, methods=['post'])
+    def confirmar(self, request):
+        """
+        Cotiza un pedido completo y guarda todas sus líneas en
+        DetalleOrdenCompraCliente en una sola inserción.
+        
+        Es idempotente por numero_orden: si la orden ya fue confirmada responde
+        200 con las líneas guardadas; si se crea, 201.
+        
+        Request body example:
+        {
+            "numero_orden": "OC-2024-0001",
+            "empresa_id": 1,
+            "sucursal_id": 1,
+            "canal": "TIENDA",
+            "items": [
+                {"articulo_id": 1, "cantidad": 5},
+                {"articulo_id": 2, "cantidad": 3}
+            ]
+        }
+        """
+        request_serializer = ConfirmarPedidoRequestSerializer(data=request.data)
+        if not request_serializer.is_valid():
+            return Response(request_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        datos = request_serializer.validated_data
+        
+        try:
+            detalles, creada = confirmar_orden(
+                datos['numero_orden'],
+                datos['empresa_id'],
+                datos.get('sucursal_id'),
+                datos['canal'],
+                datos['items'],
+                datos.get('monto_pedido_total')
+            )
+        except ErrorOrden as error:
+            return Response(
+                {'error': str(error), 'lineas': error.errores},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        lineas = DetalleOrdenCompraClienteSerializer(detalles, many=True).data
+        return Response({
+            'numero_orden': datos['numero_orden'],
+            'creada': creada,
+            'lineas': lineas,
+            'resumen': {
+                'total_items': len(lineas),
+                'monto_total': sum(detalle.subtotal for detalle in detalles),
+            }
+        }, status=status.HTTP_201_CREATED if creada else status.HTTP_200_OK)
 
 def calcular_pedido_view(request):
     """Vista para calcular pedidos completos"""
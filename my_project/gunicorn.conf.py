@@ -0,0 +1,27 @@
+"""
+Configuración de gunicorn (se carga sola al arrancar desde este directorio).
+
+Con PROMETHEUS_MULTIPROC_DIR definido, las métricas de core.metricas se
+escriben en ese directorio para que GET /metrics sume las de todos los workers:
+se vacía al arrancar el master y se descartan los archivos de cada worker que
+termina.
+"""
+import glob
+import os
+
+
+def on_starting(server):
+    directorio = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+        for archivo in glob.glob(os.path.join(directorio, '*.db')):
+            os.remove(archivo)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
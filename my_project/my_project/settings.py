@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que la latencia incluya al resto (requiere prometheus_client; ver core.metricas)
+    'core.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +89,45 @@ DATABASES = {
 }
 
 
+# Caché
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Caché del motor de precios (resolución de listas vigentes).
+    # Para compartirla entre varios procesos usar un backend compartido, p. ej.:
+    # 'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    # 'LOCATION': 'redis://127.0.0.1:6379/1',
+    'precios': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'precios',
+        'TIMEOUT': 86400,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+PRECIOS_CACHE = 'precios'
+
+# Si todos los procesos comparten PRECIOS_CACHE (Redis, Memcached...). Con la
+# caché locmem de arriba cada worker tiene la suya y la resolución de la lista
+# vigente se valida con una consulta en cada cálculo (core.services.cache_listas).
+# None: se deduce del backend
+PRECIOS_CACHE_COMPARTIDA = None
+
+# Cotizaciones guardadas en memoria por proceso (ver core.services.cache_cotizaciones);
+# ajustar con la tasa de aciertos y los desalojos de GET /api/precios/cache/
+PRECIOS_COTIZACIONES_MAX = 20000
+
+# Tiempos por etapa del cálculo de precios: header Server-Timing en
+# /api/precios/calcular/ y /api/pedidos/calcular_pedido/ e histogramas en
+# GET /api/precios/tiempos/ (ver core.services.tiempos)
+PRECIOS_TIEMPOS = False
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 